@@ -1,17 +1,17 @@
 # app/agents/decision_agent.py
+import json
+import time
 import random
-from typing import Dict
-from langchain_openai import ChatOpenAI
-from langchain.agents import AgentExecutor, create_openai_functions_agent
-from langchain_core.prompts import ChatPromptTemplate
-from langchain.tools import tool
+import threading
+from typing import Dict, Optional
 from app.tools.operations_api import create_exchange
+from app.telemetry import metrics, span
 
 
-@tool
 def operations_create_exchange(payload: dict, idempotency_key: str) -> Dict:
     """Chama a API de operações para criar a troca/exchange."""
-    return create_exchange(payload, idempotency_key)
+    with span("tool", "operations_create_exchange"):
+        return create_exchange(payload, idempotency_key)
 
 
 DECISION_PROMPT = """
@@ -43,17 +43,149 @@ DECISION_POLICY = {
 }
 
 
-def build_decision_agent(model: str = "gpt-4o-mini", mock: bool = True):
+def _as_dict(value) -> Dict:
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return {}
+    return value if isinstance(value, dict) else {}
+
+
+def combined_confidence(data: Dict) -> float:
+    """Confiança combinada: a menor confiança entre as etapas que informaram uma."""
+    values = [
+        float(_as_dict(data.get(stage)).get("confidence"))
+        for stage in ("document", "ocr", "rules", "inventory")
+        if isinstance(_as_dict(data.get(stage)).get("confidence"), (int, float))
+    ]
+    return min(values) if values else 0.0
+
+
+def evaluate_policy(data: Dict) -> Optional[Dict]:
+    """
+    Aplica o DECISION_POLICY localmente, sem efeitos colaterais. Retorna a decisão para
+    casos claros ou None para a zona cinzenta, que deve seguir para o LLM. Em "aprovado",
+    action_payload é o payload da troca a ser criada na API de operações.
+    """
+    stages = {stage: _as_dict(data.get(stage)) for stage in ("document", "ocr", "rules", "inventory")}
+    # Saída de fallback (etapa falhou) não é evidência confiável: deixa para o LLM
+    if any("raw" in output for output in stages.values()):
+        return None
+
+    document, rules, inventory = stages["document"], stages["rules"], stages["inventory"]
+    confidence = combined_confidence(data)
+
+    def decision(name, explanation, action_payload=None):
+        return {
+            "decision": name,
+            "action_payload": action_payload,
+            "confidence": round(confidence, 4),
+            "explanation": explanation,
+            "audit_refs": ["DECISION-POLICY"] + list(rules.get("citations", [])),
+            "decided_by": "policy",
+        }
+
+    if document.get("customer_match") is False or document.get("order_match") is False:
+        return decision("escalado", "Dados do cliente/pedido não conferem com a solicitação")
+    if rules.get("eligible") is False:
+        return decision("escalado", "Produto inelegível pelas regras")
+    if confidence < DECISION_POLICY["low_confidence_threshold"]:
+        return decision("escalado", "Confiança combinada baixa")
+    if rules.get("eligible") is True and confidence >= DECISION_POLICY["auto_approve_threshold"]:
+        if inventory.get("available") is True:
+            payload = {
+                "protocol_id": data.get("protocol_id"),
+                "id_item_pedido": rules.get("id_item_pedido") or inventory.get("id_item_pedido"),
+                "reservation_id": inventory.get("reservation_id"),
+                "qty": inventory.get("qty", 1),
+            }
+            return decision("aprovado", "Troca aprovada automaticamente", payload)
+        if inventory.get("available") is False and rules.get("allow_credit", True):
+            return decision("proposta_credito", "Produto elegível, mas sem estoque — sugerir crédito",
+                            {"type": "credit", "protocol_id": data.get("protocol_id")})
+    return None
+
+
+class HybridDecisionAgent:
+    """
+    Decide localmente os casos claros pelo DECISION_POLICY e envia ao LLM só a zona cinzenta.
+    stats() informa a fração de casos em cada caminho e a latência economizada
+    (casos locais x latência média observada no LLM).
+    """
+
+    def __init__(self, llm_agent):
+        self.llm_agent = llm_agent
+        self._lock = threading.Lock()
+        self._counters = {"policy": 0, "llm": 0, "policy_s": 0.0, "llm_s": 0.0}
+
+    def _record(self, path: str, elapsed: float):
+        with self._lock:
+            self._counters[path] += 1
+            self._counters[f"{path}_s"] += elapsed
+
+    @staticmethod
+    def _execute(result: Dict, data: Dict) -> Dict:
+        # Mesma chamada que o LLM faria via operations_create_exchange (fora da medição de latência)
+        if result["decision"] == "aprovado":
+            with span("tool", "operations_create_exchange"):
+                result["action_payload"] = create_exchange(result["action_payload"], data.get("idempotency_key"))
+        return result
+
+    def invoke(self, inputs):
+        data = inputs.get("input", {})
+        t0 = time.perf_counter()
+        result = evaluate_policy(data)
+        if result is not None:
+            self._record("policy", time.perf_counter() - t0)
+            return self._execute(result, data)
+        resp = self.llm_agent.invoke(inputs)
+        self._record("llm", time.perf_counter() - t0)
+        return resp
+
+    async def ainvoke(self, inputs):
+        data = inputs.get("input", {})
+        t0 = time.perf_counter()
+        result = evaluate_policy(data)
+        if result is not None:
+            self._record("policy", time.perf_counter() - t0)
+            return self._execute(result, data)
+        resp = await self.llm_agent.ainvoke(inputs)
+        self._record("llm", time.perf_counter() - t0)
+        return resp
+
+    def stats(self) -> Dict:
+        with self._lock:
+            c = dict(self._counters)
+        total = c["policy"] + c["llm"]
+        avg_llm = c["llm_s"] / c["llm"] if c["llm"] else None
+        return {
+            "total": total,
+            "policy": c["policy"],
+            "llm": c["llm"],
+            "policy_fraction": round(c["policy"] / total, 4) if total else 0.0,
+            "llm_fraction": round(c["llm"] / total, 4) if total else 0.0,
+            "avg_llm_latency_s": round(avg_llm, 4) if avg_llm is not None else None,
+            "avg_policy_latency_s": round(c["policy_s"] / c["policy"], 6) if c["policy"] else None,
+            "latency_saved_s": round(c["policy"] * avg_llm - c["policy_s"], 3) if avg_llm is not None else None,
+        }
+
+
+def build_decision_agent(model: str = "gpt-4o-mini", mock: bool = True, cache=None, hybrid: bool = True,
+                         seed=None):
     """
     Constrói o DecisionAgent.
-    Se mock=True, retorna um agente de teste com lógica simulada.
+    Se mock=True, retorna um agente de teste com lógica simulada (reproduzível com seed).
+    Com hybrid=True (padrão) o agente real decide os casos claros pela política local
+    e só usa o LLM na zona cinzenta.
     """
 
     if mock:
         class MockDecisionAgent:
             def invoke(self, inputs):
                 data = inputs.get("input", {})
-                
+                rng = random if seed is None else random.Random(f"{seed}:{data.get('protocol_id')}")
+
                 # Extrai dados principais
                 rules = data.get("rules", {})
                 inventory = data.get("inventory", {})
@@ -63,7 +195,7 @@ def build_decision_agent(model: str = "gpt-4o-mini", mock: bool = True):
                 estoque_disponivel = inventory.get("available", True)
 
                 # Pequena chance de encaminhar para revisão humana
-                if random.random() < 0.2:
+                if rng.random() < 0.2:
                     return {
                         "decision": "revisao_humana",
                         "action_payload": None,
@@ -101,24 +233,30 @@ def build_decision_agent(model: str = "gpt-4o-mini", mock: bool = True):
 
         return MockDecisionAgent()
 
-    # Versão real com LLM
-    llm = ChatOpenAI(model=model, temperature=0)
+    from langchain.agents import AgentExecutor, create_openai_functions_agent
+    from langchain.tools import tool
+    from app.agents.llm import AGENT_VERBOSE, build_agent_prompt, build_llm
 
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", DECISION_PROMPT),
-        ("user", "{input}")
-    ])
+    llm = build_llm(model, cache, agent="decision_agent")
+    prompt = build_agent_prompt(DECISION_PROMPT)
+    tools = [tool(operations_create_exchange)]
 
     agent = create_openai_functions_agent(
         llm=llm,
-        tools=[operations_create_exchange],
+        tools=tools,
         prompt=prompt
     )
 
     agent_executor = AgentExecutor(
         agent=agent,
-        tools=[operations_create_exchange],
-        verbose=True
+        tools=tools,
+        verbose=AGENT_VERBOSE
     )
 
+    if hybrid:
+        hybrid_agent = HybridDecisionAgent(agent_executor)
+        # Frações por caminho e latência economizada em /stats e --metrics (o último agente construído)
+        metrics.register_stats("decision_agent", hybrid_agent.stats)
+        return hybrid_agent
+
     return agent_executor
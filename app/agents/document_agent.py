@@ -1,18 +1,16 @@
 import json
 from typing import Dict
-from langchain_openai import ChatOpenAI
-from langchain.agents import AgentExecutor, create_openai_functions_agent
-from langchain_core.prompts import ChatPromptTemplate
-from langchain.tools import tool
 
-from app.tools.portal_api import dados_protocolo
+from app.tools.protocol_cache import dados_protocolo_cached
+from app.agents.structured import CONFIDENCE, STRUCTURED_AGENTS, StructuredAgent, json_schema
+from app.telemetry import span
 
 
 # Tool no formato novo
-@tool
 def fetch_protocol(protocol_id: str) -> Dict:
     """Busca informações do protocolo no portal"""
-    return dados_protocolo(protocol_id)
+    with span("tool", "fetch_protocol"):
+        return dados_protocolo_cached(protocol_id)
 
 
 # Prompt / instruções do agent
@@ -27,10 +25,36 @@ Compare dados do pedido com os dados da solicitação e retorne um JSON com:
 Retorne SOMENTE JSON.
 """
 
-def build_document_agent(model: str = "gpt-4o-mini", mock: bool = True):
+# Modo structured: fetch_protocol já executado; pedido e anexos do portal entram na saída sem passar pelo LLM
+DOCUMENT_STRUCTURED_PROMPT = """
+Você é o Document Analyzer. Compare os dados do pedido com os dados da solicitação (portal em tools.fetch_protocol)
+e informe customer_match, order_match, issues (divergências encontradas) e confidence.
+"""
+
+DOCUMENT_SCHEMA = json_schema("document_result", {
+    "customer_match": {"type": "boolean"},
+    "order_match": {"type": "boolean"},
+    "confidence": CONFIDENCE,
+    "issues": {"type": "array", "items": {"type": "string"}},
+})
+
+
+def prepare_document(inputs):
+    protocol_id = inputs.get("input")
+    portal = fetch_protocol(protocol_id)
+    facts = {
+        "extracted_order": {"protocol_id": protocol_id, **(portal.get("order") or {})},
+        "attachments": portal.get("attachments") or {},
+    }
+    return {"fetch_protocol": portal}, facts
+
+
+def build_document_agent(model: str = "gpt-4o-mini", mock: bool = True, cache=None,
+                         structured: bool = STRUCTURED_AGENTS):
     
     """
     Se o Mock estiver true, deve retornar os dados apenas para iteração do fluxo.
+    Com structured=True (AGENT_MODE=structured) a tool roda antes e o LLM é chamado uma única vez.
     """
 
     if(mock):
@@ -52,31 +76,32 @@ def build_document_agent(model: str = "gpt-4o-mini", mock: bool = True):
         
         return MockAgent()
 
-    # Modelo
-    llm = ChatOpenAI(model=model, temperature=0)
+    # O LangChain só é importado no modo real: com mock o cold start não paga esse custo
+    from app.agents.llm import AGENT_VERBOSE, build_agent_prompt, build_llm
+
+    llm = build_llm(model, cache, agent="document_agent")
+    if structured:
+        return StructuredAgent(llm, DOCUMENT_STRUCTURED_PROMPT, DOCUMENT_SCHEMA, prepare_document,
+                               name="document_agent", usable_fields=("customer_match", "order_match"))
+
+    from langchain.agents import AgentExecutor, create_openai_functions_agent
+    from langchain.tools import tool
 
-    # # Monta o prompt no formato novo
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", DOCUMENT_PROMPT),
-        ("user", "{input}")  # entrada dinâmica
-    ])
+    prompt = build_agent_prompt(DOCUMENT_PROMPT)
+    tools = [tool(fetch_protocol)]
 
     # criando o agente
     agent = create_openai_functions_agent(
         llm=llm,
-        tools=[
-            fetch_protocol
-        ],
+        tools=tools,
         prompt=prompt
     )
 
     #Executor que roda o agente
     agent_executor = AgentExecutor(
         agent=agent,
-        tools=[
-            fetch_protocol
-        ], 
-        verbose=True,
+        tools=tools, 
+        verbose=AGENT_VERBOSE,
     )
 
     return agent_executor
\ No newline at end of file
@@ -1,16 +1,15 @@
 # app/agents/inventory_agent.py
 from typing import Dict
-from langchain_openai import ChatOpenAI
-from langchain.agents import AgentExecutor, create_openai_functions_agent
-from langchain_core.prompts import ChatPromptTemplate
-from langchain.tools import tool
+
+from app.agents.structured import CONFIDENCE, STRUCTURED_AGENTS, StructuredAgent, input_data, json_schema
 from app.tools.inventory_api import check_and_reserve
+from app.telemetry import span
 
 
-@tool
 def check_reserve(id_item_pedido: str, qty: int, idempotency_key: str) -> Dict:
     """Verifica e reserva estoque do ID_ITEM_PEDIDO solicitado."""
-    return check_and_reserve(id_item_pedido, qty, idempotency_key)
+    with span("tool", "check_reserve"):
+        return check_and_reserve(id_item_pedido, qty, idempotency_key)
 
 
 INVENTORY_PROMPT = """
@@ -19,11 +18,31 @@ Você é Inventory Agent. Receba ID_ITEM_PEDIDO e quantidade, chame check_reserv
 Retorne SOMENTE JSON.
 """
 
+# Modo structured: a reserva já foi feita; disponibilidade e reservation_id vêm da tool, não do LLM
+INVENTORY_STRUCTURED_PROMPT = """
+Você é Inventory Agent. Avalie o resultado da reserva (tools.check_reserve) para o ID_ITEM_PEDIDO e a
+quantidade pedidos e informe a confidence (0.0-1.0).
+"""
+
+INVENTORY_SCHEMA = json_schema("inventory_result", {"confidence": CONFIDENCE})
+
 
-def build_inventory_agent(model: str = "gpt-4o-mini", mock: bool = True):
+def prepare_inventory(inputs):
+    data = input_data(inputs)
+    id_item_pedido = data.get("id_item_pedido")
+    qty = data.get("qty", 1)
+    result = check_reserve(id_item_pedido, qty, data.get("idempotency_key"))
+    facts = {"id_item_pedido": id_item_pedido, "available": result.get("available"),
+             "reservation_id": result.get("reservation_id"), "qty": qty}
+    return {"check_reserve": result}, facts
+
+
+def build_inventory_agent(model: str = "gpt-4o-mini", mock: bool = True, cache=None,
+                          structured: bool = STRUCTURED_AGENTS):
     
     """
     Se o Mock estiver true, deve retornar os dados apenas para iteração do fluxo.
+    Com structured=True (AGENT_MODE=structured) a tool roda antes e o LLM é chamado uma única vez.
     """
 
     if(mock):
@@ -42,24 +61,29 @@ def build_inventory_agent(model: str = "gpt-4o-mini", mock: bool = True):
             
         return MockInventoryAgent()
 
-    # Executando processo sem Mock 
-    llm = ChatOpenAI(model=model, temperature=0)
+    from app.agents.llm import AGENT_VERBOSE, build_agent_prompt, build_llm
+
+    llm = build_llm(model, cache, agent="inventory_agent")
+    if structured:
+        return StructuredAgent(llm, INVENTORY_STRUCTURED_PROMPT, INVENTORY_SCHEMA, prepare_inventory,
+                               name="inventory_agent")
+
+    from langchain.agents import AgentExecutor, create_openai_functions_agent
+    from langchain.tools import tool
 
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", INVENTORY_PROMPT),
-        ("user", "{input}")
-    ])
+    prompt = build_agent_prompt(INVENTORY_PROMPT)
+    tools = [tool(check_reserve)]
 
     agent = create_openai_functions_agent(
         llm=llm,
-        tools=[check_reserve],
+        tools=tools,
         prompt=prompt
     )
 
     agent_executor = AgentExecutor(
         agent=agent,
-        tools=[check_reserve],
-        verbose=True
+        tools=tools,
+        verbose=AGENT_VERBOSE
     )
 
     return agent_executor
\ No newline at end of file
@@ -0,0 +1,258 @@
+# app/agents/llm.py
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Dict, Optional
+import openai
+from langchain_openai import ChatOpenAI
+from langchain_core.caches import BaseCache
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import SystemMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+from app.context_projection import count_tokens
+from app.llm_limiter import (DEFAULT_PRIORITY, LLM_ERROR_RETRIES, LLM_MAX_RETRIES, LLM_PRIORITY, LLM_RATE_LIMIT_ENABLED,
+                             get_llm_limiter)
+from app.telemetry import TELEMETRY_ENABLED, metrics, record
+
+
+class TelemetryCallbackHandler(BaseCallbackHandler):
+    """Mede latência e tokens de cada chamada de LLM feita pelos agentes."""
+
+    # Executa no mesmo contexto da chamada (necessário para encontrar o trace do protocolo)
+    run_inline = True
+
+    def __init__(self):
+        self._starts: Dict[object, tuple] = {}
+
+    def _start(self, serialized, run_id, kwargs):
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model_name") or params.get("model") or (serialized or {}).get("name", "llm")
+        self._starts[run_id] = (time.perf_counter(), model)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        if TELEMETRY_ENABLED:
+            self._start(serialized, run_id, kwargs)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        if TELEMETRY_ENABLED:
+            self._start(serialized, run_id, kwargs)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        started = self._starts.pop(run_id, None)
+        if started is None:
+            return
+        start, model = started
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+        metrics.add_tokens(model, "prompt", prompt_tokens)
+        metrics.add_tokens(model, "completion", completion_tokens)
+        record("llm", model, start, time.perf_counter() - start,
+               prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        started = self._starts.pop(run_id, None)
+        if started is not None:
+            record("llm", started[1], started[0], time.perf_counter() - started[0], error=type(error).__name__)
+
+
+telemetry_handler = TelemetryCallbackHandler()
+
+# verbose dos AgentExecutors: imprime cada passo do agente no stdout (só para depuração)
+AGENT_VERBOSE = os.getenv("AGENT_VERBOSE", "0") == "1"
+
+
+# Reserva de tokens de resposta na estimativa, quando max_tokens não é definido
+LLM_COMPLETION_RESERVE = 512
+
+
+def _retry_after(error: openai.RateLimitError) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after") is not None:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+# Falhas transitórias que o cliente openai repetiria (com max_retries=0 ele não repete nada)
+_TRANSIENT_ERRORS = (openai.APIConnectionError, openai.InternalServerError)
+
+
+def _error_backoff(retry: int) -> float:
+    """Espera antes da retry-ésima repetição de uma falha transitória: 0,5 s dobrando até 8 s, com jitter."""
+    return min(0.5 * 2 ** (retry - 1), 8.0) * (1 - 0.25 * random.random())
+
+
+class RateLimitedChatOpenAI(ChatOpenAI):
+    """
+    ChatOpenAI cujas chamadas passam pelo limitador do processo (app/llm_limiter.py).
+    Os 429 voltam para a fila (até LLM_MAX_RETRIES vezes) em vez de serem repetidos pelo cliente openai,
+    para que o backoff e a janela de concorrência sejam os mesmos para todos os agentes. Como o cliente
+    roda com max_retries=0, 5xx e falhas de conexão são repetidos aqui (até LLM_ERROR_RETRIES vezes,
+    com backoff exponencial), também passando de novo pelo limitador.
+    """
+
+    priority: int = DEFAULT_PRIORITY
+
+    def _estimate(self, messages, kwargs) -> int:
+        text = "".join(m.content if isinstance(m.content, str) else json.dumps(m.content) for m in messages)
+        schemas = kwargs.get("functions") or kwargs.get("tools") or kwargs.get("response_format")
+        if schemas:
+            text += json.dumps(schemas, default=str)
+        return count_tokens(text, self.model_name) + (self.max_tokens or LLM_COMPLETION_RESERVE)
+
+    @staticmethod
+    def _usage(result) -> Optional[int]:
+        usage = (result.llm_output or {}).get("token_usage") or {}
+        return usage.get("total_tokens")
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        limiter, estimate = get_llm_limiter(), self._estimate(messages, kwargs)
+        limited = errors = 0
+        while True:
+            ticket = limiter.acquire(self.priority, estimate)
+            try:
+                result = super()._generate(messages, stop, run_manager, **kwargs)
+            except openai.RateLimitError as e:
+                limiter.release(ticket, rate_limited=True, retry_after=_retry_after(e))
+                limited += 1
+                if limited > LLM_MAX_RETRIES:
+                    raise
+                continue
+            except _TRANSIENT_ERRORS:
+                limiter.release(ticket, failed=True)
+                errors += 1
+                if errors > LLM_ERROR_RETRIES:
+                    raise
+                time.sleep(_error_backoff(errors))
+                continue
+            except BaseException:
+                limiter.release(ticket, failed=True)
+                raise
+            limiter.release(ticket, tokens_used=self._usage(result))
+            return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        limiter, estimate = get_llm_limiter(), self._estimate(messages, kwargs)
+        limited = errors = 0
+        while True:
+            ticket = await limiter.aacquire(self.priority, estimate)
+            try:
+                result = await super()._agenerate(messages, stop, run_manager, **kwargs)
+            except openai.RateLimitError as e:
+                limiter.release(ticket, rate_limited=True, retry_after=_retry_after(e))
+                limited += 1
+                if limited > LLM_MAX_RETRIES:
+                    raise
+                continue
+            except _TRANSIENT_ERRORS:
+                limiter.release(ticket, failed=True)
+                errors += 1
+                if errors > LLM_ERROR_RETRIES:
+                    raise
+                await asyncio.sleep(_error_backoff(errors))
+                continue
+            except BaseException:
+                limiter.release(ticket, failed=True)
+                raise
+            limiter.release(ticket, tokens_used=self._usage(result))
+            return result
+
+    # AgentExecutor chama o modelo via stream(): 429 e falhas transitórias só são repetidos se nenhum
+    # chunk foi entregue
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        limiter, estimate = get_llm_limiter(), self._estimate(messages, kwargs)
+        limited = errors = 0
+        while True:
+            ticket = limiter.acquire(self.priority, estimate)
+            used, started = None, False
+            try:
+                for chunk in super()._stream(messages, stop, run_manager, **kwargs):
+                    usage = getattr(chunk.message, "usage_metadata", None)
+                    if usage:
+                        used = usage.get("total_tokens")
+                    started = True
+                    yield chunk
+            except openai.RateLimitError as e:
+                limiter.release(ticket, rate_limited=True, retry_after=_retry_after(e))
+                limited += 1
+                if started or limited > LLM_MAX_RETRIES:
+                    raise
+                continue
+            except _TRANSIENT_ERRORS:
+                limiter.release(ticket, failed=True)
+                errors += 1
+                if started or errors > LLM_ERROR_RETRIES:
+                    raise
+                time.sleep(_error_backoff(errors))
+                continue
+            except BaseException:
+                limiter.release(ticket, failed=True)
+                raise
+            limiter.release(ticket, tokens_used=used)
+            return
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        limiter, estimate = get_llm_limiter(), self._estimate(messages, kwargs)
+        limited = errors = 0
+        while True:
+            ticket = await limiter.aacquire(self.priority, estimate)
+            used, started = None, False
+            try:
+                async for chunk in super()._astream(messages, stop, run_manager, **kwargs):
+                    usage = getattr(chunk.message, "usage_metadata", None)
+                    if usage:
+                        used = usage.get("total_tokens")
+                    started = True
+                    yield chunk
+            except openai.RateLimitError as e:
+                limiter.release(ticket, rate_limited=True, retry_after=_retry_after(e))
+                limited += 1
+                if started or limited > LLM_MAX_RETRIES:
+                    raise
+                continue
+            except _TRANSIENT_ERRORS:
+                limiter.release(ticket, failed=True)
+                errors += 1
+                if started or errors > LLM_ERROR_RETRIES:
+                    raise
+                await asyncio.sleep(_error_backoff(errors))
+                continue
+            except BaseException:
+                limiter.release(ticket, failed=True)
+                raise
+            limiter.release(ticket, tokens_used=used)
+            return
+
+
+def build_llm(model: str, cache: Optional[BaseCache] = None, agent: Optional[str] = None):
+    """
+    Modelo usado por todos os agentes (temperature=0), instrumentado pela telemetria.
+    Com cache, respostas idênticas são servidas do cache; sem cache, o cache global do LangChain também fica desligado.
+    Com LLM_RATE_LIMIT=1 (padrão) as chamadas passam pelo limitador compartilhado, com a prioridade de `agent`.
+    """
+    cache = cache if cache is not None else False
+    if not LLM_RATE_LIMIT_ENABLED:
+        return ChatOpenAI(model=model, temperature=0, cache=cache, callbacks=[telemetry_handler])
+    return RateLimitedChatOpenAI(model=model, temperature=0, cache=cache, callbacks=[telemetry_handler],
+                                 max_retries=0, stream_usage=True,
+                                 priority=LLM_PRIORITY.get(agent, DEFAULT_PRIORITY))
+
+
+def build_agent_prompt(system_prompt: str) -> ChatPromptTemplate:
+    """
+    Prompt dos agentes de tools: instruções como mensagem fixa (os exemplos de JSON têm chaves,
+    que não podem passar pela interpolação do template), entrada do usuário e o scratchpad do agente.
+    """
+    return ChatPromptTemplate.from_messages([
+        SystemMessage(content=system_prompt),
+        ("user", "{input}"),
+        MessagesPlaceholder("agent_scratchpad"),
+    ])
@@ -1,27 +1,23 @@
 # app/agents/ocr_vision_agent.py
 from typing import Dict
-from app.tools.ocr_extract_text import ocr_extract_text
-from app.tools.vision_service import classify_damage
-from langchain_openai import ChatOpenAI
-from langchain.agents import AgentExecutor, create_openai_functions_agent
-from langchain_core.prompts import ChatPromptTemplate
-from langchain.tools import tool
+import copy
 
-@tool
-def run_ocr(image_path: str) -> Dict:
-    """Extrai texto de uma imagem (OCR)."""
-    return ocr_extract_text(image_path)
+from app.agents.structured import CONFIDENCE, STRUCTURED_AGENTS, StructuredAgent, input_data, json_schema
+from app.tools.image_executor import get_image_executor
+from app.telemetry import span
 
-
-@tool
-def run_vision(image_path: str) -> Dict:
-    """Classifica danos em uma imagem."""
-    return classify_damage(image_path)
+def run_ocr_vision(invoice_image: str, product_image: str) -> Dict:
+    """Extrai o texto da nota (OCR) e classifica danos na foto do produto, em paralelo."""
+    executor = get_image_executor()
+    with span("tool", "run_ocr+run_vision"):
+        ocr = executor.submit("ocr", invoice_image or "")
+        vision = executor.submit("vision", product_image or "")
+        return {"ocr": copy.deepcopy(ocr.result()), "vision": copy.deepcopy(vision.result())}
 
 
 OCR_VISION_PROMPT = """
 Você é OCR/Vision Agent. Recebe caminhos das imagens (invoice, product).
-Utilize tools run_ocr e run_vision e retorne JSON com:
+Utilize a tool run_ocr_vision (OCR da nota e visão do produto numa única chamada) e retorne JSON com:
 {
   "ocr": {...},
   "vision": {...},
@@ -30,10 +26,28 @@ Utilize tools run_ocr e run_vision e retorne JSON com:
 Retorne SOMENTE JSON.
 """
 
-def build_ocr_vision_agent(model: str = "gpt-4o-mini", mock: bool = True):
+# Modo structured: OCR e visão já executados (em paralelo); o LLM avalia só a confiança do conjunto
+OCR_VISION_STRUCTURED_PROMPT = """
+Você é OCR/Vision Agent. Avalie o OCR da nota (tools.run_ocr) e a classificação de danos do produto
+(tools.run_vision): legibilidade, campos extraídos coerentes entre si e com a imagem do produto.
+Informe a confidence do conjunto (0.0-1.0).
+"""
+
+OCR_VISION_SCHEMA = json_schema("ocr_vision_result", {"confidence": CONFIDENCE})
+
+
+def prepare_ocr_vision(inputs):
+    data = input_data(inputs)
+    output = run_ocr_vision(data.get("invoice_image"), data.get("product_image"))
+    return {"run_ocr": output["ocr"], "run_vision": output["vision"]}, output
+
+
+def build_ocr_vision_agent(model: str = "gpt-4o-mini", mock: bool = True, cache=None,
+                           structured: bool = STRUCTURED_AGENTS):
     
     """
     Se o Mock estiver true, deve retornar os dados apenas para iteração do fluxo.
+    Com structured=True (AGENT_MODE=structured) as tools rodam antes e o LLM é chamado uma única vez.
     """
 
     if(mock):
@@ -49,23 +63,29 @@ def build_ocr_vision_agent(model: str = "gpt-4o-mini", mock: bool = True):
             
         return MockOCRVisionAgent()
 
-    llm = ChatOpenAI(model=model, temperature=0)
+    from app.agents.llm import AGENT_VERBOSE, build_agent_prompt, build_llm
+
+    llm = build_llm(model, cache, agent="ocr_agent")
+    if structured:
+        return StructuredAgent(llm, OCR_VISION_STRUCTURED_PROMPT, OCR_VISION_SCHEMA, prepare_ocr_vision,
+                               name="ocr_agent")
+
+    from langchain.agents import AgentExecutor, create_openai_functions_agent
+    from langchain.tools import tool
 
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", OCR_VISION_PROMPT),
-        ("user", "{input}")
-    ])
+    prompt = build_agent_prompt(OCR_VISION_PROMPT)
+    tools = [tool(run_ocr_vision)]
 
     agent = create_openai_functions_agent(
         llm=llm,
-        tools=[run_ocr, run_vision],
+        tools=tools,
         prompt=prompt
     )
 
     agent_executor = AgentExecutor(
         agent=agent,
-        tools=[run_ocr, run_vision],
-        verbose=True
+        tools=tools,
+        verbose=AGENT_VERBOSE
     )
 
     return agent_executor
\ No newline at end of file
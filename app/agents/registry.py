@@ -0,0 +1,144 @@
+# app/agents/registry.py
+"""
+Registro preguiçoso dos agentes.
+
+O módulo de cada agente só é importado, e o agente só é construído, no primeiro acesso
+(`registry["decision_agent"]`); no modo mock o LangChain nunca chega a ser importado.
+Agentes prontos são compartilhados por todos os protocolos/threads do processo, e
+`prewarm()` constrói os selecionados numa thread em segundo plano.
+"""
+from typing import Dict, Iterable, List, Optional
+from collections.abc import Mapping
+import importlib
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# MOCK_AGENTS=0 usa os agentes reais (LLM)
+MOCK_AGENTS = os.getenv("MOCK_AGENTS", "1") == "1"
+
+# Agentes construídos em segundo plano logo após init_agents (ex.: "rules_agent,decision_agent")
+AGENTS_PREWARM = [name for name in os.getenv("AGENTS_PREWARM", "").split(",") if name]
+
+# nome do agente -> (módulo, função construtora)
+AGENT_BUILDERS = {
+    "document_agent": ("app.agents.document_agent", "build_document_agent"),
+    "ocr_agent": ("app.agents.ocr_agent", "build_ocr_vision_agent"),
+    "rules_agent": ("app.agents.rules_agent", "build_rules_agent"),
+    "inventory_agent": ("app.agents.inventory_agent", "build_inventory_agent"),
+    "decision_agent": ("app.agents.decision_agent", "build_decision_agent"),
+}
+
+# Construtores cujo mock aceita semente
+SEEDED_AGENTS = ("rules_agent", "decision_agent")
+
+
+class AgentRegistry(Mapping):
+    """Mapping nome -> agente que importa e constrói cada agente sob demanda, uma única vez."""
+
+    def __init__(self, model: str = "gpt-4o-mini", mock: bool = MOCK_AGENTS, llm_cache=None, seed=None,
+                 builders: Dict[str, tuple] = AGENT_BUILDERS):
+        self.model = model
+        self.mock = mock
+        self.seed = seed
+        self._builders = dict(builders)
+        self._llm_cache = llm_cache
+        self._agents: Dict[str, object] = {}
+        self._build_s: Dict[str, float] = {}
+        self._locks = {name: threading.Lock() for name in self._builders}
+        self._cache_lock = threading.Lock()
+
+    def __getitem__(self, name: str):
+        agent = self._agents.get(name)
+        if agent is None:
+            if name not in self._builders:
+                raise KeyError(name)
+            with self._locks[name]:
+                agent = self._agents.get(name)
+                if agent is None:
+                    agent = self._agents[name] = self._build(name)
+        return agent
+
+    def __contains__(self, name) -> bool:
+        # Sem construir o agente (o __contains__ padrão do Mapping chamaria __getitem__)
+        return name in self._builders
+
+    def __iter__(self):
+        return iter(self._builders)
+
+    def __len__(self) -> int:
+        return len(self._builders)
+
+    def _cache_for(self, name: str):
+        """Cache de respostas do LLM compartilhado (SQLiteLLMCache), só no modo real e para os agentes habilitados."""
+        if self.mock:
+            return None
+        from app.llm_cache import LLM_CACHE_AGENTS, SQLiteLLMCache
+
+        if not LLM_CACHE_AGENTS.get(name):
+            return None
+        with self._cache_lock:
+            if self._llm_cache is None:
+                self._llm_cache = SQLiteLLMCache()
+            return self._llm_cache
+
+    def _build(self, name: str):
+        module_name, builder_name = self._builders[name]
+        t0 = time.perf_counter()
+        builder = getattr(importlib.import_module(module_name), builder_name)
+        kwargs = {"mock": self.mock, "cache": self._cache_for(name)}
+        if name in SEEDED_AGENTS:
+            kwargs["seed"] = self.seed
+        agent = builder(self.model, **kwargs)
+        self._build_s[name] = time.perf_counter() - t0
+        logger.debug(f"Agente {name} construído em {self._build_s[name]:.3f}s")
+        return agent
+
+    def prewarm(self, names: Optional[Iterable[str]] = None, background: bool = True) -> Optional[threading.Thread]:
+        """Constrói os agentes indicados (todos por padrão); em segundo plano devolve a thread."""
+        names = list(names or self._builders)
+        if not background:
+            for name in names:
+                self[name]
+            return None
+
+        def run():
+            for name in names:
+                try:
+                    self[name]
+                except Exception as e:
+                    # O erro volta a aparecer (e é tratado pelo orquestrador) no primeiro uso do agente
+                    logger.warning(f"Pré-aquecimento de {name} falhou: {e}")
+
+        thread = threading.Thread(target=run, name="agents-prewarm", daemon=True)
+        thread.start()
+        return thread
+
+    def built(self) -> List[str]:
+        return [name for name in self._builders if name in self._agents]
+
+    def stats(self) -> Dict:
+        return {
+            "mock": self.mock,
+            "built": self.built(),
+            "build_s": {name: round(s, 4) for name, s in self._build_s.items()},
+            # Cache de respostas do LLM (None até o primeiro agente real habilitado ser construído)
+            "llm_cache": self._llm_cache.stats() if hasattr(self._llm_cache, "stats") else None,
+        }
+
+
+_registry: Optional[AgentRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry(**kwargs) -> AgentRegistry:
+    """Registro compartilhado pelo processo; os argumentos só valem na primeira chamada."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = AgentRegistry(**kwargs)
+    return _registry
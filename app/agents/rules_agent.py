@@ -1,23 +1,40 @@
 # app/agents/rules_agent.py
+import json
+import os
 import random
 from typing import Dict
-from langchain_openai import ChatOpenAI
-from langchain.agents import AgentExecutor, create_openai_functions_agent
-from langchain_core.prompts import ChatPromptTemplate
-from langchain.tools import tool
 
+from app.agents.structured import CONFIDENCE, STRUCTURED_AGENTS, StructuredAgent, input_data, json_schema
+from app.tools.protocol_cache import ProtocolCache
 from app.tools.rules_store import lookup_rules_for_id_item_pedido
+from app.tools.rules_engine import rules_engine
+from app.tools.policy_index import search_policy_clauses
+from app.telemetry import metrics, span
+
+RULES_LOOKUP_CACHE_TTL_S = float(os.getenv("RULES_LOOKUP_CACHE_TTL_S", "60"))
+
+
+def _lookup(id_item_pedido: str) -> Dict:
+    rules = lookup_rules_for_id_item_pedido(id_item_pedido)
+    query = " ".join(rule.get("description", "") for rule in rules) or id_item_pedido
+    return {"rules": rules, "clauses": search_policy_clauses(query)}
+
+
+# Single-flight + TTL: a consulta antecipada (RulesEngineAgent.prefetch) e a do agente compartilham a busca
+_lookup_cache = ProtocolCache(fetch=_lookup, ttl_s=RULES_LOOKUP_CACHE_TTL_S)
+metrics.register_stats("rules_lookup_cache", _lookup_cache.stats)
 
 
-@tool
 def rules_lookup(id_item_pedido: str) -> Dict:
-    """Consulta as regras aplicáveis para um ID_ITEM_PEDIDO específico."""
-    return lookup_rules_for_id_item_pedido(id_item_pedido)
+    """Consulta as regras aplicáveis para um ID_ITEM_PEDIDO específico e as cláusulas de política relacionadas."""
+    with span("tool", "rules_lookup"):
+        return _lookup_cache.get(id_item_pedido)
 
 
 RULES_PROMPT = """
 Você é Rules Agent. Recebe ID_ITEM_PEDIDO, data, visão do estado do produto e resultado do OCR.
-Use tool rules_lookup e avalie rule-by-rule se o caso passa. Retorne JSON:
+Use tool rules_lookup e avalie rule-by-rule se o caso passa. Em citations use os clause_id das clauses retornadas.
+Retorne JSON:
 {
   "id_item_pedido": "...",
   "checks": [ { "rule_id": "...", "pass": true/false, "evidence": "..." } ],
@@ -28,46 +45,167 @@ Use tool rules_lookup e avalie rule-by-rule se o caso passa. Retorne JSON:
 Retorne SOMENTE JSON.
 """
 
-def build_rules_agent(model: str = "gpt-4o-mini", mock: bool = True):
+# Modo structured: rules_lookup já executado; com "avaliar_somente", só essas regras entram em checks
+RULES_STRUCTURED_PROMPT = """
+Você é Rules Agent. Avalie rule-by-rule (regras em tools.rules_lookup.rules; se a entrada tiver
+avaliar_somente, apenas essas) se o caso passa, com base na visão do estado do produto e no OCR.
+Em citations use os clause_id das clauses de tools.rules_lookup.
+"""
+
+# eligible primeiro: com streaming, a etapa inventory pode começar antes das evidências (checks)
+RULES_SCHEMA = json_schema("rules_result", {
+    "eligible": {"type": "boolean"},
+    "confidence": CONFIDENCE,
+    "citations": {"type": "array", "items": {"type": "string"}},
+    "checks": {"type": "array", "items": {
+        "type": "object",
+        "properties": {"rule_id": {"type": "string"}, "pass": {"type": "boolean"}, "evidence": {"type": "string"}},
+        "required": ["rule_id", "pass", "evidence"],
+        "additionalProperties": False,
+    }},
+})
+
+
+def prepare_rules(inputs):
+    data = input_data(inputs)
+    id_item_pedido = data.get("id_item_pedido")
+    return {"rules_lookup": rules_lookup(id_item_pedido)}, {"id_item_pedido": id_item_pedido}
+
+
+class RulesEngineAgent:
+    """
+    Avalia as regras estruturadas com o RulesEngine (sem LLM) e só aciona o
+    executor LLM quando o item possui regras de texto livre não compiláveis.
+    """
+
+    def __init__(self, engine, llm_agent):
+        self.engine = engine
+        self.llm_agent = llm_agent
+
+    @property
+    def streams_fields(self) -> bool:
+        return getattr(self.llm_agent, "streams_fields", False)
+
+    def prefetch(self, id_item_pedido: str):
+        """Antecipa o rules_lookup do item quando ele tem regras de texto livre (as únicas que vão ao LLM)."""
+        if any(not rule.compilable for rule in self.engine.rules_for(id_item_pedido)):
+            _lookup_cache.get(id_item_pedido)
+
+    def invoke(self, inputs, on_field=None):
+        data = inputs.get("input", {})
+        result = self.engine.evaluate(data)
+        if not result["pending_rules"]:
+            return result
+        return self._merge(result, self.llm_agent.invoke(self._llm_inputs(data, result),
+                                                         **self._field_kwargs(result, on_field)))
+
+    async def ainvoke(self, inputs, on_field=None):
+        data = inputs.get("input", {})
+        result = self.engine.evaluate(data)
+        if not result["pending_rules"]:
+            return result
+        return self._merge(result, await self.llm_agent.ainvoke(self._llm_inputs(data, result),
+                                                                **self._field_kwargs(result, on_field)))
+
+    @staticmethod
+    def _field_kwargs(result: Dict, on_field) -> Dict:
+        """Repassa os campos parciais do LLM já combinados com o resultado do RulesEngine (como em _merge)."""
+        if on_field is None:
+            return {}
+
+        def merged(key, value):
+            if key == "eligible":
+                on_field("eligible", result["eligible"] and bool(value))
+            elif key == "id_item_pedido":
+                on_field(key, result["id_item_pedido"])
+
+        return {"on_field": merged}
+
+    @staticmethod
+    def _llm_inputs(data: Dict, result: Dict):
+        return {"input": json.dumps({
+            "id_item_pedido": result["id_item_pedido"],
+            "avaliar_somente": result["pending_rules"],
+            "ocr": data.get("ocr"),
+        }, ensure_ascii=False, default=str)}
+
+    @staticmethod
+    def _merge(result: Dict, llm_resp) -> Dict:
+        result = dict(result)
+        try:
+            output = llm_resp.get("output", llm_resp) if isinstance(llm_resp, dict) else llm_resp
+            llm_json = json.loads(output) if isinstance(output, str) else output
+            result["checks"] = result["checks"] + llm_json.get("checks", [])
+            result["citations"] = result["citations"] + llm_json.get("citations", [])
+            result["eligible"] = result["eligible"] and bool(llm_json.get("eligible", False))
+            result["confidence"] = min(result["confidence"], float(llm_json.get("confidence", 0.0)))
+        except (AttributeError, TypeError, ValueError):
+            # Sem resposta utilizável do LLM as regras de texto livre contam como não atendidas
+            result["checks"] = result["checks"] + [
+                {"rule_id": rule["rule_id"], "pass": False, "evidence": "Regra não avaliada"}
+                for rule in result["pending_rules"]
+            ]
+            result["eligible"] = False
+        result["pending_rules"] = []
+        return result
+
+
+def build_rules_agent(model: str = "gpt-4o-mini", mock: bool = True, cache=None,
+                      deterministic: bool = True, seed=None, structured: bool = STRUCTURED_AGENTS):
     
     """
     Se o Mock estiver true, deve retornar os dados apenas para iteração do fluxo.
+    Com seed definido, o sorteio do mock é derivado de (seed, entrada): reproduzível mesmo em lote concorrente.
+    Com deterministic=True (padrão) as regras estruturadas são avaliadas pelo RulesEngine
+    e o LLM fica restrito às regras de texto livre.
+    Com structured=True (AGENT_MODE=structured) a tool roda antes e o LLM é chamado uma única vez.
     """
 
     if(mock):
         class MockRulesAgent:
             def invoke(self, inputs):
-                id_item_pedido = inputs.get("input", "ID_ITEM_PEDIDO-MOCK")
+                rng = random if seed is None else random.Random(
+                    f"{seed}:{json.dumps(inputs, sort_keys=True, default=str)}")
+                id_item_pedido = inputs.get("input", {}).get("id_item_pedido", "ID_ITEM_PEDIDO-MOCK")
                 return {
                     "id_item_pedido": id_item_pedido,
                     "checks": [
                         {"rule_id": "R1", "pass": True, "evidence": "Produto em bom estado"},
                         {"rule_id": "R2", "pass": False, "evidence": "Prazo de garantia expirado"}
                     ],
-                    "eligible": random.choice([True, False]),
-                    "confidence": round(random.uniform(0.7, 0.99), 2),
+                    "eligible": rng.choice([True, False]),
+                    "confidence": round(rng.uniform(0.7, 0.99), 2),
                     "citations": ["Manual interno v2", "Política de Garantia 2025"]
                 }
         return MockRulesAgent()
     
-    # criando o agente
-    llm = ChatOpenAI(model=model, temperature=0)
+    from app.agents.llm import AGENT_VERBOSE, build_agent_prompt, build_llm
 
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", RULES_PROMPT),
-        ("user", "{input}")
-    ])
+    llm = build_llm(model, cache, agent="rules_agent")
+    if structured:
+        agent = StructuredAgent(llm, RULES_STRUCTURED_PROMPT, RULES_SCHEMA, prepare_rules,
+                                name="rules_agent", usable_fields=("eligible",))
+        return RulesEngineAgent(rules_engine, agent) if deterministic else agent
+
+    from langchain.agents import AgentExecutor, create_openai_functions_agent
+    from langchain.tools import tool
+
+    prompt = build_agent_prompt(RULES_PROMPT)
+    tools = [tool(rules_lookup)]
 
     agent = create_openai_functions_agent(
         llm=llm,
-        tools=[rules_lookup],
+        tools=tools,
         prompt=prompt
     )
 
     agent_executor = AgentExecutor(
         agent=agent,
-        tools=[rules_lookup],
-        verbose=True
+        tools=tools,
+        verbose=AGENT_VERBOSE
     )
 
+    if deterministic:
+        return RulesEngineAgent(rules_engine, agent_executor)
+
     return agent_executor
\ No newline at end of file
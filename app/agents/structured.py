@@ -0,0 +1,180 @@
+# app/agents/structured.py
+"""
+Modo "tools pré-executadas" dos agentes (AGENT_MODE=structured).
+
+O AgentExecutor gasta pelo menos duas idas ao LLM por etapa (uma para decidir chamar a tool e
+outra depois do resultado), embora a tool e os argumentos de cada etapa sejam conhecidos de
+antemão. Aqui as tools rodam direto em Python e o LLM é chamado uma única vez, com a resposta
+restrita pelo JSON schema da etapa (response_format json_schema, strict).
+
+Os fatos vindos das tools (pedido e anexos do portal, OCR/visão, reserva) entram na saída sem
+passar pelo modelo: o schema pede só os campos de julgamento (matches, checks, elegibilidade,
+confiança), o que também reduz os tokens de resposta.
+
+Com STRUCTURED_STREAMING=1 (padrão) a resposta é lida em streaming por um parser incremental
+(app/json_stream.py): cada campo de primeiro nível é entregue a `on_field(chave, valor)` assim
+que termina de chegar (os fatos das tools, antes da chamada), e o tempo até os campos úteis da
+etapa (`usable_fields`) e até a resposta completa vai para a telemetria (kind "llm_stream").
+"""
+from typing import Callable, Dict, Optional, Sequence, Tuple
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+from app.json_stream import IncrementalJSONParser
+from app.telemetry import record
+
+logger = logging.getLogger(__name__)
+
+AGENT_MODE = os.getenv("AGENT_MODE", "executor")
+STRUCTURED_AGENTS = AGENT_MODE == "structured"
+STRUCTURED_STREAMING = os.getenv("STRUCTURED_STREAMING", "1") == "1"
+
+STRUCTURED_SUFFIX = """
+As tools já foram executadas: os resultados estão em "tools" na mensagem do usuário e a entrada
+da etapa em "input". Não invente dados que não estejam neles.
+Retorne SOMENTE o JSON pedido pelo schema.
+"""
+
+
+def json_schema(name: str, properties: Dict) -> Dict:
+    """response_format strict: todos os campos obrigatórios e nenhum campo extra."""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": name,
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": properties,
+                "required": list(properties),
+                "additionalProperties": False,
+            },
+        },
+    }
+
+
+CONFIDENCE = {"type": "number", "minimum": 0, "maximum": 1}
+
+
+def input_data(inputs) -> Dict:
+    """Entrada da etapa como dict: {"input": dict|str JSON}."""
+    data = inputs.get("input")
+    if isinstance(data, str):
+        try:
+            data = json.loads(data)
+        except ValueError:
+            return {"value": data}
+    return data if isinstance(data, dict) else {}
+
+
+class _FieldStream:
+    """Alimenta o parser com os chunks do LLM e repassa os campos concluídos a on_field."""
+
+    def __init__(self, agent: "StructuredAgent", facts: Dict, on_field):
+        self.agent = agent
+        self.facts = facts
+        self.on_field = on_field
+        self.parser = IncrementalJSONParser()
+        self.chunks = []
+        self.start = time.perf_counter()
+        self.usable = set(agent.usable_fields)
+        self.usable_at = None
+        for key, value in facts.items():
+            self._deliver(key, value)
+
+    def _deliver(self, key: str, value):
+        if self.on_field is None:
+            return
+        try:
+            self.on_field(key, value)
+        except Exception as e:
+            logger.warning(f"Callback on_field falhou ({self.agent.name}.{key}): {e}")
+
+    def feed(self, text):
+        if not isinstance(text, str) or not text:
+            return
+        self.chunks.append(text)
+        for key, value in self.parser.feed(text):
+            if key not in self.facts:
+                self._deliver(key, value)
+            if self.usable_at is None and (not self.usable or self.usable <= self.parser.fields.keys()):
+                self.usable_at = time.perf_counter()
+                record("llm_stream", f"{self.agent.name}:first_usable_field", self.start, self.usable_at - self.start)
+
+    def text(self) -> str:
+        elapsed = time.perf_counter() - self.start
+        record("llm_stream", f"{self.agent.name}:full_response", self.start, elapsed)
+        return "".join(self.chunks)
+
+
+class StructuredAgent:
+    """
+    `prepare(inputs) -> (tools, facts)`: executa as tools da etapa; `tools` vai para o LLM e
+    `facts` sobrescreve os campos correspondentes da resposta. Devolve {"output": JSON}, como o
+    AgentExecutor, para que o orquestrador trate os dois modos igual.
+    `usable_fields`: campos que as etapas seguintes usam (o schema deve pedi-los primeiro).
+    """
+
+    # O orquestrador só passa on_field a agentes que entregam campos parciais
+    streams_fields = True
+
+    def __init__(self, llm, system_prompt: str, response_format: Dict,
+                 prepare: Callable[[Dict], Tuple[Dict, Dict]], name: str = "structured",
+                 usable_fields: Sequence[str] = (), stream: bool = STRUCTURED_STREAMING):
+        from langchain_core.messages import SystemMessage
+
+        self.llm = llm.bind(response_format=response_format)
+        self.system = SystemMessage(content=system_prompt + STRUCTURED_SUFFIX)
+        self.prepare = prepare
+        self.name = name
+        self.usable_fields = tuple(usable_fields)
+        self.stream = stream
+        self._lock = threading.Lock()
+        self._counters = {"calls": 0, "invalid": 0}
+
+    def _messages(self, inputs, tools: Dict):
+        from langchain_core.messages import HumanMessage
+
+        content = json.dumps({"input": input_data(inputs), "tools": tools}, ensure_ascii=False, default=str)
+        return [self.system, HumanMessage(content=content)]
+
+    def _output(self, content: str, facts: Dict) -> Dict:
+        try:
+            data = json.loads(content)
+        except (TypeError, ValueError):
+            data = None
+        with self._lock:
+            self._counters["calls"] += 1
+            self._counters["invalid"] += not isinstance(data, dict)
+        if not isinstance(data, dict):
+            # Resposta fora do schema: o orquestrador cai no fallback da etapa
+            return {"output": content}
+        return {"output": json.dumps({**data, **facts}, ensure_ascii=False, default=str)}
+
+    def invoke(self, inputs, on_field: Optional[Callable] = None):
+        tools, facts = self.prepare(inputs)
+        messages = self._messages(inputs, tools)
+        if not self.stream:
+            return self._output(self.llm.invoke(messages).content, facts)
+        fields = _FieldStream(self, facts, on_field)
+        for chunk in self.llm.stream(messages):
+            fields.feed(chunk.content)
+        return self._output(fields.text(), facts)
+
+    async def ainvoke(self, inputs, on_field: Optional[Callable] = None):
+        tools, facts = await asyncio.to_thread(self.prepare, inputs)
+        messages = self._messages(inputs, tools)
+        if not self.stream:
+            return self._output((await self.llm.ainvoke(messages)).content, facts)
+        fields = _FieldStream(self, facts, on_field)
+        async for chunk in self.llm.astream(messages):
+            fields.feed(chunk.content)
+        return self._output(fields.text(), facts)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self._counters)
@@ -0,0 +1,253 @@
+# app/api.py
+"""
+Serviço HTTP do orquestrador.
+
+    uvicorn app.api:app --host 0.0.0.0 --port 8000
+
+- POST /protocolos {"protocol_id": "..."}: enfileira o protocolo (202). Um protocol_id que já está
+  na fila ou em execução não é reprocessado: a resposta aponta para o job existente.
+- Fila limitada (SERVICE_MAX_QUEUE): quando cheia responde 429 com Retry-After estimado.
+- GET /protocolos/{id}/eventos: Server-Sent Events com o resultado de cada etapa à medida que
+  termina (event: stage) e o resultado final (event: result ou error). Aceita Last-Event-ID.
+- GET /protocolos/{id}: estado e resultado do job.
+
+Os agentes são construídos uma vez por processo (registro compartilhado) e usados por todos os workers.
+"""
+from typing import Dict, Optional
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+from app.agents.registry import get_registry
+from app.llm_limiter import llm_limiter_stats
+from app.models import to_plain
+from app.orquestrador import MODEL, orquestrador_async
+from app.telemetry import component_stats, export_metrics
+
+logger = logging.getLogger(__name__)
+
+# Protocolos processados simultaneamente pelo serviço
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", "16"))
+# Protocolos aguardando um worker; acima disso o POST responde 429
+SERVICE_MAX_QUEUE = int(os.getenv("SERVICE_MAX_QUEUE", "100"))
+# Jobs concluídos mantidos para consulta e replay dos eventos
+SERVICE_RESULTS_KEPT = int(os.getenv("SERVICE_RESULTS_KEPT", "1000"))
+
+
+class Job:
+    """Um protocolo submetido: estado, eventos publicados e resultado."""
+
+    def __init__(self, protocol_id: str):
+        self.protocol_id = protocol_id
+        self.status = "queued"
+        self.events = []
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.submitted_at = time.time()
+        self.changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "error")
+
+    def publish(self, event: str, data: Dict):
+        self.events.append((event, data))
+        # Acorda os assinantes atuais; os próximos aguardam um novo Event
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    def on_stage(self, name: str, output, timing):
+        self.publish("stage", {"stage": name, "output": to_plain(output), "timing": timing})
+
+    def to_dict(self) -> Dict:
+        return {
+            "protocol_id": self.protocol_id,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "stages_done": sum(1 for event, _ in self.events if event == "stage"),
+        }
+
+
+class QueueFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Fila cheia; tente novamente em {retry_after}s")
+        self.retry_after = retry_after
+
+
+class JobManager:
+    """Fila limitada de protocolos consumida por `workers` tasks, com coalescência por protocol_id."""
+
+    def __init__(self, agents, workers: int = SERVICE_WORKERS, max_queue: int = SERVICE_MAX_QUEUE,
+                 results_kept: int = SERVICE_RESULTS_KEPT):
+        self.agents = agents
+        self.workers = workers
+        self.results_kept = results_kept
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._tasks = []
+        self._avg_duration_s = 1.0
+        self._counters = {"submitted": 0, "coalesced": 0, "rejected": 0, "done": 0, "errors": 0}
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def get(self, protocol_id: str) -> Optional[Job]:
+        return self._jobs.get(protocol_id)
+
+    def submit(self, protocol_id: str):
+        """Devolve (job, coalesced); levanta QueueFull se não há espaço na fila."""
+        job = self._jobs.get(protocol_id)
+        if job is not None and not job.finished:
+            self._counters["coalesced"] += 1
+            return job, True
+
+        job = Job(protocol_id)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self._counters["rejected"] += 1
+            raise QueueFull(self._retry_after())
+
+        self._counters["submitted"] += 1
+        self._jobs[protocol_id] = job
+        self._jobs.move_to_end(protocol_id)
+        self._evict()
+        return job, False
+
+    def _retry_after(self) -> int:
+        # Tempo para esvaziar a fila atual com todos os workers ocupados
+        return max(1, math.ceil(self._avg_duration_s * (self._queue.qsize() + 1) / self.workers))
+
+    def _evict(self):
+        finished = [pid for pid, job in self._jobs.items() if job.finished]
+        for pid in finished[:max(0, len(self._jobs) - self.results_kept)]:
+            del self._jobs[pid]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            t0 = time.perf_counter()
+            try:
+                job.result = await orquestrador_async(job.protocol_id, self.agents, on_stage=job.on_stage)
+                job.status = "done"
+                self._counters["done"] += 1
+                job.publish("result", job.result)
+            except Exception as e:
+                logger.exception(f"Protocolo {job.protocol_id} falhou")
+                job.status, job.error = "error", str(e)
+                self._counters["errors"] += 1
+                job.publish("error", {"error": job.error})
+            finally:
+                self._avg_duration_s = 0.9 * self._avg_duration_s + 0.1 * (time.perf_counter() - t0)
+                self._queue.task_done()
+
+    def stats(self) -> Dict:
+        return {
+            **self._counters,
+            "workers": self.workers,
+            "queued": self._queue.qsize(),
+            "max_queue": self._queue.maxsize,
+            "running": sum(1 for job in self._jobs.values() if job.status == "running"),
+            "avg_duration_s": round(self._avg_duration_s, 4),
+        }
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    agents = get_registry(model=MODEL)
+    agents.prewarm()
+    app.state.jobs = JobManager(agents)
+    app.state.jobs.start()
+    yield
+    await app.state.jobs.stop()
+
+
+app = FastAPI(title="Orquestrador de Agentes", lifespan=lifespan)
+
+
+class SubmitRequest(BaseModel):
+    protocol_id: str
+
+
+def _sse(event_id: int, event: str, data: Dict) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+@app.post("/protocolos", status_code=202)
+async def submit(body: SubmitRequest, request: Request):
+    try:
+        job, coalesced = request.app.state.jobs.submit(body.protocol_id)
+    except QueueFull as e:
+        return JSONResponse(status_code=429, content={"detail": str(e)},
+                            headers={"Retry-After": str(e.retry_after)})
+    return {
+        "protocol_id": job.protocol_id,
+        "status": job.status,
+        "coalesced": coalesced,
+        "events": f"/protocolos/{job.protocol_id}/eventos",
+    }
+
+
+@app.get("/protocolos/{protocol_id}")
+async def status(protocol_id: str, request: Request):
+    job = request.app.state.jobs.get(protocol_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Protocolo não encontrado")
+    return job.to_dict()
+
+
+@app.get("/protocolos/{protocol_id}/eventos")
+async def events(protocol_id: str, request: Request):
+    job = request.app.state.jobs.get(protocol_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Protocolo não encontrado")
+    last_id = request.headers.get("last-event-id")
+    start = int(last_id) + 1 if last_id and last_id.isdigit() else 0
+
+    async def stream():
+        i = start
+        while True:
+            changed = job.changed
+            while i < len(job.events):
+                event, data = job.events[i]
+                yield _sse(i, event, data)
+                i += 1
+            if job.finished or await request.is_disconnected():
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=15)
+            except asyncio.TimeoutError:
+                # Comentário SSE mantém a conexão viva em proxies
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/stats")
+async def stats(request: Request):
+    return {"jobs": request.app.state.jobs.stats(), "agents": get_registry().stats(),
+            "llm_limiter": llm_limiter_stats(), "components": component_stats()}
+
+
+@app.get("/metrics")
+async def metrics(fmt: str = "prometheus"):
+    if fmt == "json":
+        return JSONResponse(json.loads(export_metrics("json")))
+    return PlainTextResponse(export_metrics("prometheus"))
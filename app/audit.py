@@ -0,0 +1,387 @@
+# app/audit.py
+"""
+Trilha de auditoria dos protocolos fora do caminho crítico.
+
+O orquestrador só enfileira o registro (protocolo, idempotency_key, saída de cada etapa, timings):
+submit() nunca bloqueia e, com a fila cheia, descarta e conta em "dropped". Uma thread de fundo
+serializa os registros em JSONL compacto e grava em lotes (AUDIT_BATCH_SIZE ou a cada
+AUDIT_FLUSH_S) em segmentos append-only comprimidos: cada lote é um membro gzip acrescentado ao
+segmento ativo (um .jsonl.gz com vários membros continua sendo um gzip válido). O segmento é
+rotacionado ao passar de AUDIT_SEGMENT_BYTES ou de AUDIT_SEGMENT_MAX_S.
+
+Um índice SQLite (index.sqlite, no mesmo diretório) guarda, por registro, o segmento e o
+offset/tamanho do lote: a busca por protocol_id descomprime só aquele lote. Vários processos
+(app/workers.py) podem gravar no mesmo diretório; o pid entra no nome do segmento.
+
+    python -m app.audit get PROTO-20251003-0001
+    python -m app.audit scan [--desde 2025-10-03T00:00] [--ate ...] [--decisao aprovado] [--prefixo PROTO-2025]
+    python -m app.audit segments
+"""
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+import argparse
+import atexit
+import glob
+import gzip
+import json
+import logging
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+from app.models import to_jsonable
+from app.telemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+AUDIT_ENABLED = os.getenv("AUDIT_ENABLED", "1") == "1"
+AUDIT_DIR = os.getenv("AUDIT_DIR", "auditoria")
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "256"))
+AUDIT_FLUSH_S = float(os.getenv("AUDIT_FLUSH_S", "1.0"))
+AUDIT_QUEUE_MAX = int(os.getenv("AUDIT_QUEUE_MAX", "10000"))
+AUDIT_SEGMENT_BYTES = int(os.getenv("AUDIT_SEGMENT_BYTES", str(32 * 1024 * 1024)))
+AUDIT_SEGMENT_MAX_S = float(os.getenv("AUDIT_SEGMENT_MAX_S", "3600"))
+AUDIT_COMPRESS_LEVEL = int(os.getenv("AUDIT_COMPRESS_LEVEL", "6"))
+AUDIT_FSYNC = os.getenv("AUDIT_FSYNC", "0") == "1"
+
+INDEX_FILE = "index.sqlite"
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS records (
+        protocol_id TEXT NOT NULL,
+        idempotency_key TEXT,
+        ts REAL NOT NULL,
+        segment TEXT NOT NULL,
+        offset INTEGER NOT NULL,
+        length INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS records_protocol ON records (protocol_id, ts);
+    CREATE TABLE IF NOT EXISTS segments (
+        name TEXT PRIMARY KEY,
+        first_ts REAL NOT NULL,
+        last_ts REAL NOT NULL,
+        records INTEGER NOT NULL DEFAULT 0,
+        bytes INTEGER NOT NULL DEFAULT 0
+    );
+"""
+
+
+def audit_record(ctx: Dict, result: Dict) -> Dict:
+    """
+    Registro de auditoria de um protocolo concluído. Guarda referências às saídas tipadas: a
+    serialização (to_jsonable) acontece na thread de escrita, não no orquestrador.
+    """
+    audit = result["audit"]
+    return {
+        "protocol_id": ctx["protocol_id"],
+        "idempotency_key": ctx["idempotency_key"],
+        "ts": time.time(),
+        "decision": result["decision"],
+        "stages": {name: audit[name] for name in ("document", "ocr", "rules", "inventory")},
+        "timings": result["timings"],
+        "stages_skipped": result["stages_skipped"],
+        "short_circuit": result["short_circuit"],
+        "deadline_exceeded": result["deadline_exceeded"],
+    }
+
+
+def _connect(directory: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(os.path.join(directory, INDEX_FILE), timeout=30, isolation_level=None,
+                           check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+class AuditSink:
+    """Escritor em segundo plano (uma thread por processo, iniciada no primeiro submit)."""
+
+    def __init__(self, directory: str = AUDIT_DIR, batch_size: int = AUDIT_BATCH_SIZE,
+                 flush_s: float = AUDIT_FLUSH_S, max_queue: int = AUDIT_QUEUE_MAX,
+                 segment_bytes: int = AUDIT_SEGMENT_BYTES, segment_max_s: float = AUDIT_SEGMENT_MAX_S,
+                 compress_level: int = AUDIT_COMPRESS_LEVEL, fsync: bool = AUDIT_FSYNC):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_s = flush_s
+        self.segment_bytes = segment_bytes
+        self.segment_max_s = segment_max_s
+        self.compress_level = compress_level
+        self.fsync = fsync
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._written = threading.Condition(self._lock)
+        self._thread = None
+        self._closed = False
+        self._segment = None  # (nome, arquivo, aberto em)
+        self._seq = 0
+        self._counters = {"submitted": 0, "dropped": 0, "written": 0, "errors": 0, "batches": 0,
+                          "bytes": 0, "segments": 0}
+
+    # --- produtor (caminho crítico) ---
+
+    def submit(self, record: Dict) -> bool:
+        """Enfileira o registro sem bloquear; False se foi descartado (fila cheia ou sink fechado)."""
+        if self._thread is None:
+            self._start()
+        try:
+            if self._closed:
+                raise queue.Full
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self._counters["dropped"] += 1
+                dropped = self._counters["dropped"]
+            if dropped == 1 or dropped % 1000 == 0:
+                logger.warning(f"Auditoria: fila cheia, {dropped} registro(s) descartado(s)")
+            return False
+        with self._lock:
+            self._counters["submitted"] += 1
+        return True
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+        atexit.register(self.close)
+
+    # --- escritor ---
+
+    def _run(self):
+        conn = _connect(self.directory)
+        try:
+            while True:
+                batch = self._next_batch()
+                if batch is None:
+                    return
+                if batch:
+                    self._write_batch(conn, batch)
+        finally:
+            if self._segment is not None:
+                self._segment[1].close()
+            conn.close()
+
+    def _next_batch(self) -> Optional[List[Dict]]:
+        """Até batch_size registros, esperando no máximo flush_s pelo primeiro e pelos seguintes; None encerra."""
+        try:
+            first = self._queue.get(timeout=self.flush_s)
+        except queue.Empty:
+            return None if self._closed else []
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.flush_s
+        while len(batch) < self.batch_size:
+            try:
+                record = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if record is None:
+                self._queue.put(None)  # encerra depois de gravar este lote
+                break
+            batch.append(record)
+        return batch
+
+    def _segment_file(self, now: float):
+        if self._segment is not None:
+            name, handle, opened_at = self._segment
+            if handle.tell() < self.segment_bytes and now - opened_at < self.segment_max_s:
+                return name, handle
+            handle.close()
+        self._seq += 1
+        stamp = datetime.fromtimestamp(now).strftime("%Y%m%dT%H%M%S")
+        name = f"audit-{stamp}-{os.getpid()}-{self._seq:04d}.jsonl.gz"
+        handle = open(os.path.join(self.directory, name), "ab")
+        self._segment = (name, handle, now)
+        with self._lock:
+            self._counters["segments"] += 1
+        return name, handle
+
+    def _write_batch(self, conn: sqlite3.Connection, batch: List[Dict]):
+        start = time.perf_counter()
+        try:
+            lines = "".join(json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=to_jsonable)
+                            + "\n" for record in batch)
+            member = gzip.compress(lines.encode("utf-8"), compresslevel=self.compress_level)
+            name, handle = self._segment_file(time.time())
+            offset = handle.tell()
+            handle.write(member)
+            handle.flush()
+            if self.fsync:
+                os.fsync(handle.fileno())
+            first_ts, last_ts = min(r["ts"] for r in batch), max(r["ts"] for r in batch)
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO records (protocol_id, idempotency_key, ts, segment, offset, length) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(r["protocol_id"], r.get("idempotency_key"), r["ts"], name, offset, len(member)) for r in batch],
+            )
+            conn.execute(
+                "INSERT INTO segments (name, first_ts, last_ts, records, bytes) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET first_ts = MIN(first_ts, excluded.first_ts), "
+                "last_ts = MAX(last_ts, excluded.last_ts), records = records + excluded.records, "
+                "bytes = excluded.bytes",
+                (name, first_ts, last_ts, len(batch), offset + len(member)),
+            )
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            logger.warning(f"Auditoria: lote de {len(batch)} registro(s) não gravado: {e}")
+            with self._written:
+                self._counters["errors"] += len(batch)
+                self._written.notify_all()
+            return
+        metrics.histogram("audit", "batch_write").observe(time.perf_counter() - start)
+        with self._written:
+            self._counters["written"] += len(batch)
+            self._counters["batches"] += 1
+            self._counters["bytes"] += len(member)
+            self._written.notify_all()
+
+    # --- controle ---
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Espera os registros já aceitos chegarem ao disco; False se o timeout vencer antes."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._written:
+            while self._counters["written"] + self._counters["errors"] < self._counters["submitted"]:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._written.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 5.0):
+        """Grava o que estiver na fila e encerra a thread (registrado no atexit)."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                pass  # a thread esvazia a fila e encerra ao encontrá-la vazia com o sink fechado
+            self._thread.join(timeout)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._counters)
+        stats["queued"] = self._queue.qsize()
+        return stats
+
+
+audit_sink = AuditSink()
+
+
+class AuditReader:
+    """Leitura dos segmentos: busca por protocol_id pelo índice e varredura com filtros."""
+
+    def __init__(self, directory: str = AUDIT_DIR):
+        self.directory = directory
+        self._conn = _connect(directory) if os.path.exists(os.path.join(directory, INDEX_FILE)) else None
+
+    def get(self, protocol_id: str) -> List[Dict]:
+        """Registros do protocolo (um por execução), em ordem de gravação."""
+        if self._conn is None:
+            return list(self.scan(protocol_prefix=protocol_id, exact=True))
+        rows = self._conn.execute(
+            "SELECT DISTINCT segment, offset, length FROM records WHERE protocol_id = ? ORDER BY ts", (protocol_id,)
+        ).fetchall()
+        needle = json.dumps(protocol_id, ensure_ascii=False)
+        found = []
+        for segment, offset, length in rows:
+            with open(os.path.join(self.directory, segment), "rb") as handle:
+                handle.seek(offset)
+                member = gzip.decompress(handle.read(length)).decode("utf-8")
+            for line in member.splitlines():
+                # Só decodifica as linhas que citam o protocolo (o lote tem outros)
+                if needle in line:
+                    record = json.loads(line)
+                    if record.get("protocol_id") == protocol_id:
+                        found.append(record)
+        return found
+
+    def segments(self, since: Optional[float] = None, until: Optional[float] = None) -> List[Dict]:
+        """Segmentos com registros no intervalo [since, until] (todos, se o índice não existir)."""
+        if self._conn is None:
+            names = sorted(os.path.basename(p) for p in glob.glob(os.path.join(self.directory, "audit-*.jsonl.gz")))
+            return [{"name": name} for name in names]
+        rows = self._conn.execute(
+            "SELECT name, first_ts, last_ts, records, bytes FROM segments "
+            "WHERE (? IS NULL OR last_ts >= ?) AND (? IS NULL OR first_ts <= ?) ORDER BY first_ts",
+            (since, since, until, until),
+        ).fetchall()
+        return [dict(zip(("name", "first_ts", "last_ts", "records", "bytes"), row)) for row in rows]
+
+    def scan(self, since: Optional[float] = None, until: Optional[float] = None, decision: Optional[str] = None,
+             protocol_prefix: Optional[str] = None, exact: bool = False) -> Iterator[Dict]:
+        """
+        Percorre em streaming os segmentos do intervalo (descarta os demais pelo índice) e devolve
+        os registros que passam nos filtros. Linhas que não podem casar são descartadas por busca
+        de substring antes do json.loads.
+        """
+        prefix = None
+        if protocol_prefix is not None:
+            prefix = '"protocol_id":' + json.dumps(protocol_prefix, ensure_ascii=False)
+            prefix = prefix if exact else prefix[:-1]
+        needle = f'"decision":"{decision}"' if decision else None
+        for segment in self.segments(since, until):
+            with gzip.open(os.path.join(self.directory, segment["name"]), "rt", encoding="utf-8") as lines:
+                for line in lines:
+                    if prefix is not None and not line.startswith("{" + prefix):
+                        continue
+                    if needle is not None and needle not in line:
+                        continue
+                    record = json.loads(line)
+                    if (since is not None and record["ts"] < since) or (until is not None and record["ts"] > until):
+                        continue
+                    if decision is not None and (record.get("decision") or {}).get("decision") != decision:
+                        continue
+                    yield record
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+
+
+def _timestamp(value: Optional[str]) -> Optional[float]:
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Consulta a trilha de auditoria (segmentos JSONL comprimidos)")
+    parser.add_argument("--dir", default=AUDIT_DIR, help="diretório dos segmentos (padrão: AUDIT_DIR)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    get = commands.add_parser("get", help="registros de um protocol_id (pelo índice)")
+    get.add_argument("protocol_id")
+
+    scan = commands.add_parser("scan", help="varre os segmentos com filtros e imprime JSONL")
+    scan.add_argument("--desde", help="data/hora ISO inicial")
+    scan.add_argument("--ate", help="data/hora ISO final")
+    scan.add_argument("--decisao", help="ex.: aprovado, escalado, revisao_humana")
+    scan.add_argument("--prefixo", help="prefixo do protocol_id")
+
+    commands.add_parser("segments", help="segmentos, intervalo de datas e quantidade de registros")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    reader = AuditReader(args.dir)
+    if args.command == "get":
+        for record in reader.get(args.protocol_id):
+            print(json.dumps(record, ensure_ascii=False))
+    elif args.command == "scan":
+        for record in reader.scan(_timestamp(args.desde), _timestamp(args.ate), args.decisao, args.prefixo):
+            sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+    else:
+        print(json.dumps(reader.segments(), ensure_ascii=False, indent=2))
+    reader.close()
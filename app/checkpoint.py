@@ -0,0 +1,128 @@
+# app/checkpoint.py
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+CHECKPOINT_DB = os.getenv("CHECKPOINT_DB", "checkpoints.sqlite")
+
+
+class CheckpointStore(ABC):
+    """
+    Interface do armazenamento de checkpoints por protocol_id: a idempotency_key estável
+    do protocolo e a saída de cada etapa já concluída.
+    """
+
+    @abstractmethod
+    def idempotency_key(self, protocol_id: str) -> str:
+        """Retorna a chave do protocolo, criando-a na primeira execução."""
+
+    @abstractmethod
+    def load_stages(self, protocol_id: str) -> Dict[str, object]:
+        """Saídas das etapas já concluídas, por nome da etapa."""
+
+    @abstractmethod
+    def save_stage(self, protocol_id: str, stage: str, output) -> None:
+        """Persiste a saída (já em tipos JSON) da etapa concluída."""
+
+    @abstractmethod
+    def clear(self, protocol_id: str) -> None:
+        """Descarta chave e etapas do protocolo."""
+
+    @staticmethod
+    def new_key(protocol_id: str) -> str:
+        return f"{protocol_id}-{uuid.uuid4()}"
+
+
+class MemoryCheckpointStore(CheckpointStore):
+    """Checkpoints em memória (um único processo)."""
+
+    def __init__(self):
+        self._keys: Dict[str, str] = {}
+        self._stages: Dict[str, Dict[str, object]] = {}
+        self._lock = threading.Lock()
+
+    def idempotency_key(self, protocol_id: str) -> str:
+        with self._lock:
+            return self._keys.setdefault(protocol_id, self.new_key(protocol_id))
+
+    def load_stages(self, protocol_id: str) -> Dict[str, object]:
+        with self._lock:
+            return json.loads(json.dumps(self._stages.get(protocol_id, {})))
+
+    def save_stage(self, protocol_id: str, stage: str, output) -> None:
+        with self._lock:
+            self._stages.setdefault(protocol_id, {})[stage] = json.loads(json.dumps(output, default=str))
+
+    def clear(self, protocol_id: str) -> None:
+        with self._lock:
+            self._keys.pop(protocol_id, None)
+            self._stages.pop(protocol_id, None)
+
+
+class SQLiteCheckpointStore(CheckpointStore):
+    """Checkpoints persistidos em um arquivo SQLite local (padrão)."""
+
+    def __init__(self, path: str = CHECKPOINT_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS protocols (
+                protocol_id TEXT PRIMARY KEY,
+                idempotency_key TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS stages (
+                protocol_id TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                output TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (protocol_id, stage)
+            );
+        """)
+
+    def idempotency_key(self, protocol_id: str) -> str:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO protocols (protocol_id, idempotency_key, created_at) VALUES (?, ?, ?)",
+                (protocol_id, self.new_key(protocol_id), time.time()),
+            )
+            row = self._conn.execute(
+                "SELECT idempotency_key FROM protocols WHERE protocol_id = ?", (protocol_id,)
+            ).fetchone()
+        return row[0]
+
+    def load_stages(self, protocol_id: str) -> Dict[str, object]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT stage, output FROM stages WHERE protocol_id = ?", (protocol_id,)
+            ).fetchall()
+        return {stage: json.loads(output) for stage, output in rows}
+
+    def save_stage(self, protocol_id: str, stage: str, output) -> None:
+        payload = json.dumps(output, ensure_ascii=False, default=str)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO stages (protocol_id, stage, output, updated_at) VALUES (?, ?, ?, ?)",
+                (protocol_id, stage, payload, time.time()),
+            )
+
+    def clear(self, protocol_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM stages WHERE protocol_id = ?", (protocol_id,))
+            self._conn.execute("DELETE FROM protocols WHERE protocol_id = ?", (protocol_id,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def open_checkpoint_store(path: Optional[str] = None) -> CheckpointStore:
+    return SQLiteCheckpointStore(path or CHECKPOINT_DB)
@@ -0,0 +1,147 @@
+# app/context_projection.py
+"""
+Projeção da entrada do Decision agent com orçamento de tokens.
+
+Do contexto completo (saídas de document, OCR/visão, rules e inventory) só seguem os campos
+que o DECISION_PROMPT e o DECISION_POLICY usam; textos longos (OCR, evidências, issues) são
+truncados até o JSON caber em DECISION_CONTEXT_TOKENS. Assim o prompt do LLM não cresce com
+o tamanho do documento.
+
+Tokens contados com tiktoken quando disponível (e com o vocabulário carregável); senão, len/4.
+"""
+from typing import Dict, Optional, Tuple
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+DECISION_CONTEXT_TOKENS = int(os.getenv("DECISION_CONTEXT_TOKENS", "600"))
+# Conta também os tokens do contexto completo (custo de tiktoken proporcional ao documento; só para medição)
+DECISION_CONTEXT_COUNT_ORIGINAL = os.getenv("DECISION_CONTEXT_COUNT_ORIGINAL", "0") == "1"
+
+# Campos de cada etapa enviados ao Decision agent ("raw" sinaliza fallback para o DECISION_POLICY)
+DECISION_CONTEXT_FIELDS = {
+    "document": ("customer_match", "order_match", "issues", "confidence", "raw"),
+    "ocr": ("ocr", "vision", "confidence", "raw"),
+    "rules": ("id_item_pedido", "eligible", "confidence", "checks", "citations", "allow_credit", "raw"),
+    "inventory": ("id_item_pedido", "available", "reservation_id", "qty", "confidence", "raw"),
+}
+
+# Dentro de "ocr", só o texto e os campos extraídos
+OCR_FIELDS = ("text", "raw_text", "extracted")
+
+# Identificadores nunca truncados
+PROTECTED_KEYS = frozenset({"protocol_id", "idempotency_key", "id_item_pedido", "reservation_id", "rule_id"})
+
+# Limites aplicados antes do orçamento
+MAX_LIST_ITEMS = 20
+MIN_TRUNCATED_CHARS = 32
+ELLIPSIS = "…"
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding(model: str):
+    """Encoding do tiktoken para o modelo, carregado uma vez; False quando indisponível."""
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+
+                    try:
+                        _encoding = tiktoken.encoding_for_model(model)
+                    except KeyError:
+                        _encoding = tiktoken.get_encoding("o200k_base")
+                except Exception as e:
+                    # Sem tiktoken ou sem acesso ao vocabulário: estimativa por caracteres
+                    logger.info(f"tiktoken indisponível ({type(e).__name__}); contando tokens por len/4")
+                    _encoding = False
+    return _encoding
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    encoding = _get_encoding(model)
+    if encoding:
+        return len(encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def _dumps(data) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _copy(value):
+    """Cópia dos dicts/listas: a truncagem não pode alterar as saídas originais (auditoria)."""
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_copy(v) for v in value]
+    return value
+
+
+def _select(stage: str, output) -> Dict:
+    output = output if isinstance(output, dict) else {}
+    selected = {k: _copy(output[k]) for k in DECISION_CONTEXT_FIELDS[stage] if k in output}
+    if isinstance(selected.get("ocr"), dict):
+        selected["ocr"] = {k: selected["ocr"][k] for k in OCR_FIELDS if k in selected["ocr"]}
+    for key, value in selected.items():
+        if isinstance(value, list) and len(value) > MAX_LIST_ITEMS:
+            selected[key] = value[:MAX_LIST_ITEMS] + [f"+{len(value) - MAX_LIST_ITEMS} itens omitidos"]
+    return selected
+
+
+def _longest_string(node, path=()) -> Tuple[int, Optional[tuple]]:
+    """(tamanho, caminho) da maior string do JSON."""
+    best = (0, None)
+    items = node.items() if isinstance(node, dict) else enumerate(node) if isinstance(node, list) else ()
+    for key, value in items:
+        if key in PROTECTED_KEYS:
+            continue
+        if isinstance(value, str):
+            candidate = (len(value), path + (key,))
+        else:
+            candidate = _longest_string(value, path + (key,))
+        if candidate[0] > best[0]:
+            best = candidate
+    return best
+
+
+def truncate_to_budget(data: Dict, budget: int, model: str = "gpt-4o-mini") -> Tuple[Dict, int]:
+    """
+    Reduz pela metade a maior string até o JSON caber em `budget` tokens; devolve (dados, tokens).
+    O JSON é tokenizado uma vez; a cada corte só a string alterada é recontada (antes e depois).
+    """
+    tokens = count_tokens(_dumps(data), model)
+    while tokens > budget:
+        size, path = _longest_string(data)
+        if path is None or size <= MIN_TRUNCATED_CHARS:
+            break
+        parent = data
+        for key in path[:-1]:
+            parent = parent[key]
+        old = parent[path[-1]]
+        new = parent[path[-1]] = old[:max(MIN_TRUNCATED_CHARS, size // 2)] + ELLIPSIS
+        tokens += count_tokens(_dumps(new), model) - count_tokens(_dumps(old), model)
+    return data, tokens
+
+
+def project_decision_input(data: Dict, budget: int = DECISION_CONTEXT_TOKENS, model: str = "gpt-4o-mini",
+                           count_original: bool = DECISION_CONTEXT_COUNT_ORIGINAL) -> Tuple[Dict, Dict]:
+    """
+    Entrada do Decision agent reduzida aos campos necessários e ao orçamento de tokens.
+    Retorna (entrada projetada, {"input_tokens", "budget"}); com count_original, também
+    "original_tokens" (tokeniza o contexto completo: só para telemetria e benchmarks).
+    """
+    projected = {stage: _select(stage, data.get(stage)) for stage in DECISION_CONTEXT_FIELDS}
+    projected["protocol_id"] = data.get("protocol_id")
+    projected["idempotency_key"] = data.get("idempotency_key")
+    projected, tokens = truncate_to_budget(projected, budget, model)
+    meta = {"input_tokens": tokens, "budget": budget}
+    if count_original:
+        meta["original_tokens"] = count_tokens(_dumps(data), model)
+    return projected, meta
@@ -0,0 +1,70 @@
+# app/deadlines.py
+"""
+Prazos de ponta a ponta por protocolo, divididos em orçamentos por etapa.
+
+O prazo do protocolo (PROTOCOL_DEADLINE_S) é repartido conforme STAGE_BUDGET_SHARE: cada etapa
+recebe do tempo restante a sua fração do caminho que ainda falta até a decisão, de modo que a
+folga deixada por etapas rápidas passa para as seguintes. O prazo da etapa em execução fica num
+contextvar: as tools o consultam (time_left/check_deadline) para abortar ou limitar timeouts de
+I/O, e o orquestrador cancela a etapa que estoura o orçamento.
+"""
+from typing import Dict, Optional
+from contextlib import contextmanager
+import contextvars
+import os
+import time
+
+# Prazo total por protocolo, em segundos (0 = sem prazo)
+PROTOCOL_DEADLINE_S = float(os.getenv("PROTOCOL_DEADLINE_S", "60"))
+
+# Fração do prazo de cada etapa (rules e inventory rodam em paralelo no orquestrador_async)
+STAGE_BUDGET_SHARE = {
+    "document": 0.15,
+    "ocr": 0.25,
+    "rules": 0.25,
+    "inventory": 0.15,
+    "decision": 0.2,
+}
+
+
+class DeadlineExceeded(TimeoutError):
+    """O prazo da etapa (ou do protocolo) acabou."""
+
+
+_deadline: contextvars.ContextVar = contextvars.ContextVar("orquestrador_deadline", default=None)
+
+
+def time_left() -> Optional[float]:
+    """Segundos até o prazo da etapa em execução; None sem prazo."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.perf_counter()
+
+
+def check_deadline(what: str = "operação"):
+    left = time_left()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(f"Prazo excedido antes de {what}")
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[float]):
+    """Define o prazo absoluto (perf_counter) no contexto atual; herdado por tasks e asyncio.to_thread."""
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def _path_share(name: str, deps: Dict[str, tuple]) -> float:
+    """Fração da etapa mais o maior caminho de etapas que dependem dela."""
+    children = [child for child, parents in deps.items() if name in parents]
+    return STAGE_BUDGET_SHARE.get(name, 0.0) + max((_path_share(child, deps) for child in children), default=0.0)
+
+
+def stage_budget(name: str, remaining: float, deps: Dict[str, tuple]) -> float:
+    """Orçamento da etapa `name` dado o tempo `remaining` do protocolo."""
+    path = _path_share(name, deps)
+    if remaining <= 0 or path <= 0:
+        return max(remaining, 0.0)
+    return remaining * STAGE_BUDGET_SHARE.get(name, 0.0) / path
@@ -0,0 +1,241 @@
+# app/job_queue.py
+"""
+Fila durável de protocolos em SQLite (sem broker externo), compartilhada por vários processos.
+
+- enqueue(): insere protocol_ids (repetidos são ignorados enquanto o job existir).
+- claim(): entrega jobs com lease (JOB_LEASE_S); heartbeat() renova o lease dos jobs em execução.
+  Leases vencidos (worker morto ou travado) voltam a ser entregues; após JOB_MAX_ATTEMPTS
+  entregas o job é marcado como "failed".
+- complete()/fail(): só o dono do lease atual grava o resultado (um worker que perdeu o lease
+  não sobrescreve o job já entregue a outro).
+- stats(): profundidade por status, idade dos leases e vazão por worker.
+"""
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import json
+import os
+import sqlite3
+import threading
+import time
+
+JOB_QUEUE_DB = os.getenv("JOB_QUEUE_DB", "fila.sqlite")
+JOB_LEASE_S = float(os.getenv("JOB_LEASE_S", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        protocol_id TEXT PRIMARY KEY,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        lease_owner TEXT,
+        lease_expires REAL,
+        leased_at REAL,
+        enqueued_at REAL NOT NULL,
+        finished_at REAL,
+        result TEXT,
+        error TEXT
+    );
+    CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, enqueued_at);
+    CREATE TABLE IF NOT EXISTS workers (
+        worker_id TEXT PRIMARY KEY,
+        pid INTEGER,
+        started_at REAL NOT NULL,
+        heartbeat_at REAL NOT NULL,
+        processed INTEGER NOT NULL DEFAULT 0,
+        failed INTEGER NOT NULL DEFAULT 0,
+        busy_s REAL NOT NULL DEFAULT 0
+    );
+"""
+
+
+class JobQueue:
+    """
+    Uma conexão SQLite por thread (WAL); as transações de claim usam BEGIN IMMEDIATE para que
+    dois processos nunca recebam o mesmo job.
+    """
+
+    def __init__(self, path: str = JOB_QUEUE_DB, lease_s: float = JOB_LEASE_S,
+                 max_attempts: int = JOB_MAX_ATTEMPTS, clock=time.time):
+        self.path = path
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self._local = threading.local()
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, fn):
+        """Executa fn(conn) numa transação de escrita (BEGIN IMMEDIATE)."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    # --- produtor ---
+
+    def enqueue(self, protocol_ids: Iterable[str]) -> int:
+        """Enfileira os ids; retorna quantos eram novos."""
+        now = self.clock()
+        rows = [(protocol_id, now) for protocol_id in protocol_ids]
+        return self._write(lambda conn: conn.executemany(
+            "INSERT OR IGNORE INTO jobs (protocol_id, status, enqueued_at) VALUES (?, 'queued', ?)", rows
+        ).rowcount)
+
+    # --- worker ---
+
+    def claim(self, worker_id: str, limit: int = 1) -> List[Tuple[str, int]]:
+        """Até `limit` jobs (protocol_id, tentativa) com lease para `worker_id`: pendentes ou com lease vencido."""
+        def claim_tx(conn):
+            now = self.clock()
+            # Leases vencidos além do limite de tentativas: job descartado como falho
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', lease_owner = NULL, finished_at = ?, "
+                "error = COALESCE(error, 'lease expirado') "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, now, self.max_attempts),
+            )
+            rows = conn.execute(
+                "SELECT protocol_id, attempts FROM jobs "
+                "WHERE status = 'queued' OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY enqueued_at LIMIT ?",
+                (now, limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET status = 'leased', attempts = attempts + 1, lease_owner = ?, "
+                "leased_at = ?, lease_expires = ? WHERE protocol_id = ?",
+                [(worker_id, now, now + self.lease_s, protocol_id) for protocol_id, _ in rows],
+            )
+            return [(protocol_id, attempts + 1) for protocol_id, attempts in rows]
+
+        return self._write(claim_tx)
+
+    def heartbeat(self, worker_id: str, protocol_ids: Iterable[str] = ()) -> int:
+        """Renova o lease dos jobs em execução do worker; retorna quantos ainda são dele."""
+        ids = list(protocol_ids)
+        now = self.clock()
+
+        def heartbeat_tx(conn):
+            conn.execute("UPDATE workers SET heartbeat_at = ? WHERE worker_id = ?", (now, worker_id))
+            return conn.executemany(
+                "UPDATE jobs SET lease_expires = ? WHERE protocol_id = ? AND lease_owner = ? AND status = 'leased'",
+                [(now + self.lease_s, protocol_id, worker_id) for protocol_id in ids],
+            ).rowcount if ids else 0
+
+        return self._write(heartbeat_tx)
+
+    def complete(self, worker_id: str, protocol_id: str, result: Dict, busy_s: float = 0.0) -> bool:
+        payload = json.dumps(result, ensure_ascii=False, default=str)
+
+        def complete_tx(conn):
+            updated = conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL, finished_at = ?, lease_owner = NULL "
+                "WHERE protocol_id = ? AND lease_owner = ? AND status = 'leased'",
+                (payload, self.clock(), protocol_id, worker_id),
+            ).rowcount
+            conn.execute("UPDATE workers SET processed = processed + ?, busy_s = busy_s + ?, heartbeat_at = ? "
+                         "WHERE worker_id = ?", (updated, busy_s, self.clock(), worker_id))
+            return updated == 1
+
+        return self._write(complete_tx)
+
+    def fail(self, worker_id: str, protocol_id: str, error: str, busy_s: float = 0.0) -> bool:
+        """Devolve o job à fila (ou marca "failed" após max_attempts tentativas)."""
+        def fail_tx(conn):
+            updated = conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+                "error = ?, lease_owner = NULL, lease_expires = NULL, "
+                "finished_at = CASE WHEN attempts >= ? THEN ? ELSE NULL END "
+                "WHERE protocol_id = ? AND lease_owner = ? AND status = 'leased'",
+                (self.max_attempts, error, self.max_attempts, self.clock(), protocol_id, worker_id),
+            ).rowcount
+            conn.execute("UPDATE workers SET failed = failed + ?, busy_s = busy_s + ?, heartbeat_at = ? "
+                         "WHERE worker_id = ?", (updated, busy_s, self.clock(), worker_id))
+            return updated == 1
+
+        return self._write(fail_tx)
+
+    def register_worker(self, worker_id: str, pid: int):
+        now = self.clock()
+        self._write(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO workers (worker_id, pid, started_at, heartbeat_at) VALUES (?, ?, ?, ?)",
+            (worker_id, pid, now, now),
+        ))
+
+    # --- consulta ---
+
+    def result(self, protocol_id: str) -> Optional[Dict]:
+        row = self._conn().execute(
+            "SELECT status, attempts, result, error FROM jobs WHERE protocol_id = ?", (protocol_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        status, attempts, result, error = row
+        return {"protocol_id": protocol_id, "status": status, "attempts": attempts,
+                "result": json.loads(result) if result else None, "error": error}
+
+    def finished(self) -> Iterator[Dict]:
+        """Resultados concluídos ("done" e "failed"), na ordem de término."""
+        rows = self._conn().execute(
+            "SELECT protocol_id FROM jobs WHERE status IN ('done', 'failed') ORDER BY finished_at"
+        ).fetchall()
+        for (protocol_id,) in rows:
+            yield self.result(protocol_id)
+
+    def pending(self) -> int:
+        """Jobs ainda não concluídos (na fila ou em execução)."""
+        return self._conn().execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'leased')").fetchone()[0]
+
+    def stats(self) -> Dict:
+        conn = self._conn()
+        now = self.clock()
+        depth = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        oldest_queued = conn.execute("SELECT MIN(enqueued_at) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        lease = conn.execute(
+            "SELECT COUNT(*), MAX(? - leased_at), AVG(? - leased_at), SUM(lease_expires < ?) "
+            "FROM jobs WHERE status = 'leased'", (now, now, now)
+        ).fetchone()
+        redelivered = conn.execute("SELECT COUNT(*) FROM jobs WHERE attempts > 1").fetchone()[0]
+        workers = []
+        for worker_id, pid, started_at, heartbeat_at, processed, failed, busy_s in conn.execute(
+                "SELECT worker_id, pid, started_at, heartbeat_at, processed, failed, busy_s FROM workers "
+                "ORDER BY worker_id"):
+            uptime = max(heartbeat_at - started_at, 1e-9)
+            workers.append({
+                "worker_id": worker_id,
+                "pid": pid,
+                "processed": processed,
+                "failed": failed,
+                "throughput_per_s": round(processed / uptime, 2),
+                "busy_s": round(busy_s, 3),
+                "heartbeat_age_s": round(now - heartbeat_at, 3),
+            })
+        return {
+            "depth": {status: depth.get(status, 0) for status in ("queued", "leased", "done", "failed")},
+            "oldest_queued_age_s": round(now - oldest_queued, 3) if oldest_queued is not None else None,
+            "leases": {
+                "active": lease[0],
+                "max_age_s": round(lease[1], 3) if lease[1] is not None else None,
+                "avg_age_s": round(lease[2], 3) if lease[2] is not None else None,
+                "expired": lease[3] or 0,
+            },
+            "redelivered": redelivered,
+            "workers": workers,
+        }
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
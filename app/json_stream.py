@@ -0,0 +1,90 @@
+# app/json_stream.py
+"""
+Parser incremental de um objeto JSON recebido em pedaços (streaming do LLM).
+
+feed() devolve os campos de primeiro nível cujo valor já terminou de chegar, na ordem em que
+aparecem: com o schema da etapa pedindo primeiro os campos de decisão (ex.: eligible) e por
+último os textos longos (evidence, explanation), o orquestrador pode agir antes do fim da resposta.
+Cada caractere é examinado uma única vez; só o trecho do valor concluído passa por json.loads.
+"""
+from typing import Any, Dict, List, Tuple
+import json
+
+_WHITESPACE = " \t\r\n"
+
+
+class IncrementalJSONParser:
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        self._buffer = ""
+        self._pos = 0  # próximo caractere a examinar
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key = None  # chave do valor em leitura no primeiro nível
+        self._key_start = None
+        self._value_start = None
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """Acrescenta `text` e devolve [(chave, valor)] dos campos concluídos neste pedaço."""
+        if self.done or not text:
+            return []
+        self._buffer += text
+        emitted = []
+        buffer = self._buffer
+        for pos in range(self._pos, len(buffer)):
+            char = buffer[pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._string_closed(pos, emitted)
+                continue
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._key is None and self._key_start is None:
+                    self._key_start = pos
+                elif self._depth == 1 and self._value_start is None:
+                    self._value_start = pos
+            elif char in "{[":
+                if self._depth == 1 and self._value_start is None:
+                    self._value_start = pos
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._value_start is not None:
+                    self._emit(pos + 1, emitted)
+                elif self._depth == 0:
+                    # Fim do objeto: escalar pendente (ex.: último campo numérico)
+                    if self._value_start is not None:
+                        self._emit(pos, emitted)
+                    self.done = True
+                    break
+            elif self._depth == 1:
+                if char == ",":
+                    if self._value_start is not None:
+                        self._emit(pos, emitted)
+                elif char not in _WHITESPACE and char != ":" and self._key is not None \
+                        and self._value_start is None:
+                    self._value_start = pos  # número, true, false, null
+        self._pos = len(buffer)
+        return emitted
+
+    def _string_closed(self, pos: int, emitted: list):
+        if self._key is None and self._key_start is not None:
+            self._key = json.loads(self._buffer[self._key_start:pos + 1])
+            self._key_start = None
+        elif self._value_start is not None and self._buffer[self._value_start] == '"':
+            self._emit(pos + 1, emitted)
+
+    def _emit(self, end: int, emitted: list):
+        value = json.loads(self._buffer[self._value_start:end])
+        self.fields[self._key] = value
+        emitted.append((self._key, value))
+        self._key = None
+        self._value_start = None
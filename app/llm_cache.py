@@ -0,0 +1,155 @@
+# app/llm_cache.py
+from typing import Dict, Optional, Sequence
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from langchain_core.caches import BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB", "llm_cache.sqlite")
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+LLM_CACHE_TTL_S = float(os.getenv("LLM_CACHE_TTL_S", str(7 * 24 * 3600)))
+
+# Agentes que usam o cache (temperature=0: mesmo prompt -> mesma resposta)
+LLM_CACHE_AGENTS = {
+    "document_agent": True,
+    "ocr_agent": True,
+    "rules_agent": True,
+    "inventory_agent": True,
+    "decision_agent": True,
+}
+
+
+def _encode(generations: Sequence[Generation]) -> str:
+    items = []
+    for gen in generations:
+        if isinstance(gen, ChatGeneration):
+            items.append({"message": message_to_dict(gen.message), "info": gen.generation_info})
+        else:
+            items.append({"text": gen.text, "info": gen.generation_info})
+    return json.dumps(items, ensure_ascii=False, default=str)
+
+
+def _decode(payload: str):
+    generations = []
+    for item in json.loads(payload):
+        if "message" in item:
+            message = messages_from_dict([item["message"]])[0]
+            generations.append(ChatGeneration(message=message, generation_info=item["info"]))
+        else:
+            generations.append(Generation(text=item["text"], generation_info=item["info"]))
+    return generations
+
+
+class SQLiteLLMCache(BaseCache):
+    """
+    Cache persistente de respostas de LLM para o LangChain.
+
+    A chave é o hash de (llm_string, prompt): o llm_string já inclui modelo, parâmetros e o
+    schema das tools/functions vinculadas; o prompt é a serialização das mensagens.
+    Entradas expiram após ttl_s e, acima de max_bytes, as menos usadas recentemente são removidas.
+    A conexão só é aberta no primeiro uso; o tamanho total é somado uma vez nesse momento e depois
+    mantido a cada escrita/remoção deste processo (outros processos no mesmo arquivo não entram na conta).
+    """
+
+    def __init__(self, path: str = LLM_CACHE_DB, max_bytes: int = LLM_CACHE_MAX_BYTES,
+                 ttl_s: float = LLM_CACHE_TTL_S, clock=time.time):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self._clock = clock
+        self._conn: Optional[sqlite3.Connection] = None
+        self._size_bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "expirations": 0}
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_access ON llm_cache (last_access)")
+            self._size_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str):
+        key = self._key(prompt, llm_string)
+        now = self._clock()
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT value, created_at, size FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._counters["misses"] += 1
+                return None
+            if row[1] + self.ttl_s <= now:
+                db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._size_bytes -= row[2]
+                self._counters["expirations"] += 1
+                self._counters["misses"] += 1
+                return None
+            db.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+            self._counters["hits"] += 1
+        return _decode(row[0])
+
+    def update(self, prompt: str, llm_string: str, return_val) -> None:
+        payload = _encode(return_val)
+        key = self._key(prompt, llm_string)
+        now = self._clock()
+        with self._lock:
+            db = self._db()
+            replaced = db.execute("SELECT size FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now, now),
+            )
+            self._size_bytes += len(payload) - (replaced[0] if replaced else 0)
+            self._counters["writes"] += 1
+            self._evict_locked(db)
+
+    def _evict_locked(self, db: sqlite3.Connection):
+        # Sem varredura da tabela: o total corrente decide, e só as entradas a remover são lidas (pelo índice)
+        while self._size_bytes > self.max_bytes:
+            oldest = db.execute("SELECT key, size FROM llm_cache ORDER BY last_access LIMIT 32").fetchall()
+            if not oldest:
+                self._size_bytes = 0
+                return
+            for key, size in oldest:
+                db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._counters["evictions"] += 1
+                self._size_bytes -= size
+                if self._size_bytes <= self.max_bytes:
+                    return
+
+    def clear(self, **kwargs) -> None:
+        with self._lock:
+            self._db().execute("DELETE FROM llm_cache")
+            self._size_bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._counters)
+            if self._conn is not None:
+                stats["entries"] = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+                stats["size_bytes"] = self._size_bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,282 @@
+# app/llm_limiter.py
+"""
+Limitador adaptativo compartilhado por todas as chamadas de LLM do processo.
+
+- Orçamentos de requisições e de tokens por minuto (LLM_RPM, LLM_TPM) em token buckets com
+  rajada de LLM_BURST_S segundos; o custo em tokens é estimado antes da chamada e acertado
+  com o uso real ao final (o saldo pode ficar negativo e é pago pelas próximas chamadas).
+- Concorrência AIMD: a janela cresce 1/janela por chamada bem-sucedida quando está saturada e
+  cai pela metade em um 429 — uma vez por rodada: 429s de chamadas iniciadas antes da última
+  redução são ignorados. Um 429 também pausa o despacho por retry-after (ou LLM_BACKOFF_S).
+- Fila por prioridade (menor valor sai primeiro; mesma prioridade, ordem de chegada): as
+  chamadas do decision_agent, que concluem um protocolo, passam à frente das etapas anteriores.
+"""
+from typing import Dict, Optional
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+
+from app.telemetry import Histogram, metrics
+
+LLM_RATE_LIMIT_ENABLED = os.getenv("LLM_RATE_LIMIT", "1") == "1"
+LLM_RPM = float(os.getenv("LLM_RPM", "500"))            # 0 = sem limite
+LLM_TPM = float(os.getenv("LLM_TPM", "200000"))         # 0 = sem limite
+LLM_BURST_S = float(os.getenv("LLM_BURST_S", "1.0"))
+LLM_MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "64"))
+LLM_INITIAL_CONCURRENCY = int(os.getenv("LLM_INITIAL_CONCURRENCY", "8"))
+LLM_BACKOFF_S = float(os.getenv("LLM_BACKOFF_S", "1.0"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_ERROR_RETRIES = int(os.getenv("LLM_ERROR_RETRIES", "2"))   # 5xx e falhas de conexão, como o cliente openai
+
+# Prioridade das chamadas de cada agente (menor = primeiro)
+LLM_PRIORITY = {
+    "decision_agent": 0,
+    "inventory_agent": 1,
+    "rules_agent": 1,
+    "ocr_agent": 1,
+    "document_agent": 1,
+}
+DEFAULT_PRIORITY = 1
+
+# Espera máxima entre reavaliações da fila (segurança contra wake-ups perdidos)
+_MAX_IDLE_WAIT_S = 1.0
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "tokens", "enqueued", "started", "granted", "cancelled", "event", "loop", "future")
+
+    def __init__(self, priority: int, seq: int, tokens: int, enqueued: float, loop=None):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.enqueued = enqueued
+        self.started = None
+        self.granted = False
+        self.cancelled = False
+        self.loop = loop
+        self.event = None if loop is not None else threading.Event()
+        self.future = loop.create_future() if loop is not None else None
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def wake(self):
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class AdaptiveLimiter:
+    """
+    acquire()/aacquire() devolvem um ticket quando a chamada pode ser feita; release(ticket, ...)
+    informa o resultado (tokens usados, 429 com retry-after ou erro) e libera a vaga.
+    """
+
+    def __init__(self, rpm: float = LLM_RPM, tpm: float = LLM_TPM, burst_s: float = LLM_BURST_S,
+                 min_concurrency: int = LLM_MIN_CONCURRENCY, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 initial_concurrency: int = LLM_INITIAL_CONCURRENCY, backoff_s: float = LLM_BACKOFF_S,
+                 clock=time.monotonic):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.backoff_s = backoff_s
+        self.clock = clock
+        self._request_capacity = max(1.0, rpm * burst_s / 60)
+        self._token_capacity = max(1.0, tpm * burst_s / 60)
+        self._requests = self._request_capacity
+        self._tokens = self._token_capacity
+        self._refilled_at = clock()
+        self._limit = float(max(min_concurrency, min(initial_concurrency, max_concurrency)))
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._last_decrease = float("-inf")
+        self._heap = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._waiting: Dict[int, int] = {}
+        self._queue_wait_ms: Dict[int, Histogram] = {}
+        self._counters = {"granted": 0, "completed": 0, "failed": 0, "rate_limited": 0,
+                          "rate_limited_ignored": 0, "decreases": 0, "max_queue_depth": 0,
+                          "tokens_estimated": 0, "tokens_used": 0}
+
+    # --- fila ---
+
+    def _enqueue(self, priority: int, tokens: int, loop=None) -> _Waiter:
+        with self._lock:
+            waiter = _Waiter(priority, next(self._seq), max(0, int(tokens)), self.clock(), loop)
+            heapq.heappush(self._heap, waiter)
+            self._waiting[priority] = self._waiting.get(priority, 0) + 1
+            depth = sum(self._waiting.values())
+            if depth > self._counters["max_queue_depth"]:
+                self._counters["max_queue_depth"] = depth
+        return waiter
+
+    def _refill(self, now: float):
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        if self.rpm > 0:
+            self._requests = min(self._request_capacity, self._requests + elapsed * self.rpm / 60)
+        if self.tpm > 0:
+            self._tokens = min(self._token_capacity, self._tokens + elapsed * self.tpm / 60)
+
+    def _delay(self, waiter: _Waiter, now: float) -> float:
+        delay = self._paused_until - now
+        if self.rpm > 0 and self._requests < 1:
+            delay = max(delay, (1 - self._requests) * 60 / self.rpm)
+        if self.tpm > 0:
+            # Chamadas maiores que a rajada esperam o bucket cheio e deixam saldo negativo
+            cost = min(waiter.tokens, self._token_capacity)
+            if self._tokens < cost:
+                delay = max(delay, (cost - self._tokens) * 60 / self.tpm)
+        return delay
+
+    def _dispatch(self) -> Optional[float]:
+        """Libera o topo da fila enquanto houver vaga e orçamento; devolve a espera até o próximo (ou None). Com o lock."""
+        now = self.clock()
+        self._refill(now)
+        while self._heap:
+            waiter = self._heap[0]
+            if waiter.cancelled:
+                heapq.heappop(self._heap)
+                continue
+            if self._in_flight >= int(self._limit):
+                return None
+            delay = self._delay(waiter, now)
+            if delay > 0:
+                return delay
+            heapq.heappop(self._heap)
+            if self.rpm > 0:
+                self._requests -= 1
+            if self.tpm > 0:
+                self._tokens -= waiter.tokens
+            self._in_flight += 1
+            self._waiting[waiter.priority] -= 1
+            self._counters["granted"] += 1
+            self._counters["tokens_estimated"] += waiter.tokens
+            waiter.granted = True
+            waiter.started = now
+            wait_s = now - waiter.enqueued
+            self._histogram(waiter.priority).observe(wait_s * 1000)
+            metrics.histogram("llm_queue", f"priority_{waiter.priority}").observe(wait_s)
+            waiter.wake()
+        return None
+
+    def _histogram(self, priority: int) -> Histogram:
+        hist = self._queue_wait_ms.get(priority)
+        if hist is None:
+            hist = self._queue_wait_ms[priority] = Histogram([1, 5, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000])
+        return hist
+
+    def _abandon(self, waiter: _Waiter):
+        """Chamador desistiu (cancelamento/exceção) enquanto esperava."""
+        with self._lock:
+            if waiter.granted:
+                self._in_flight -= 1
+            elif not waiter.cancelled:
+                waiter.cancelled = True
+                self._waiting[waiter.priority] -= 1
+            self._dispatch()
+
+    # --- API ---
+
+    def acquire(self, priority: int = DEFAULT_PRIORITY, tokens: int = 0) -> _Waiter:
+        waiter = self._enqueue(priority, tokens)
+        try:
+            while True:
+                with self._lock:
+                    delay = self._dispatch()
+                if waiter.granted:
+                    return waiter
+                waiter.event.wait(min(delay, _MAX_IDLE_WAIT_S) if delay is not None else _MAX_IDLE_WAIT_S)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+    async def aacquire(self, priority: int = DEFAULT_PRIORITY, tokens: int = 0) -> _Waiter:
+        waiter = self._enqueue(priority, tokens, asyncio.get_running_loop())
+        try:
+            while True:
+                with self._lock:
+                    delay = self._dispatch()
+                if waiter.granted:
+                    return waiter
+                await asyncio.wait({waiter.future},
+                                   timeout=min(delay, _MAX_IDLE_WAIT_S) if delay is not None else _MAX_IDLE_WAIT_S)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+    def release(self, ticket: _Waiter, tokens_used: Optional[int] = None, rate_limited: bool = False,
+                retry_after: Optional[float] = None, failed: bool = False):
+        with self._lock:
+            now = self.clock()
+            self._in_flight -= 1
+            if tokens_used is not None:
+                self._counters["tokens_used"] += tokens_used
+                if self.tpm > 0:
+                    self._tokens -= tokens_used - ticket.tokens
+            if rate_limited:
+                self._counters["rate_limited"] += 1
+                self._paused_until = max(self._paused_until,
+                                         now + (retry_after if retry_after is not None else self.backoff_s))
+                if ticket.started >= self._last_decrease:
+                    self._limit = max(float(self.min_concurrency), self._limit / 2)
+                    self._last_decrease = now
+                    self._counters["decreases"] += 1
+                else:
+                    self._counters["rate_limited_ignored"] += 1
+            elif failed:
+                self._counters["failed"] += 1
+            else:
+                self._counters["completed"] += 1
+                # Só cresce quando a janela é o gargalo (todas as vagas estavam em uso)
+                if self._in_flight + 1 >= int(self._limit):
+                    self._limit = min(float(self.max_concurrency), self._limit + 1 / self._limit)
+            self._dispatch()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            return {
+                **self._counters,
+                "concurrency_limit": round(self._limit, 2),
+                "in_flight": self._in_flight,
+                "queue_depth": sum(self._waiting.values()),
+                "queue_depth_by_priority": {str(p): n for p, n in sorted(self._waiting.items())},
+                "paused_for_s": round(max(0.0, self._paused_until - now), 3),
+                "requests_available": round(self._requests, 2) if self.rpm > 0 else None,
+                "tokens_available": round(self._tokens, 1) if self.tpm > 0 else None,
+                "queue_wait_ms": {str(p): {k: v for k, v in hist.snapshot().items() if k != "buckets"}
+                                  for p, hist in sorted(self._queue_wait_ms.items())},
+            }
+
+
+_limiter: Optional[AdaptiveLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_llm_limiter(**kwargs) -> AdaptiveLimiter:
+    """Limitador compartilhado pelo processo; os argumentos só valem na primeira chamada."""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = AdaptiveLimiter(**kwargs)
+    return _limiter
+
+
+def llm_limiter_stats() -> Optional[Dict]:
+    """stats() do limitador, ou None se nenhuma chamada de LLM o criou ainda."""
+    return _limiter.stats() if _limiter is not None else None
@@ -0,0 +1,87 @@
+# app/lote.py
+import time
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Iterable, Iterator, Optional, TextIO
+
+from app.checkpoint import CheckpointStore
+from app.orquestrador import orquestrador
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENCY = 8
+
+
+def ler_protocolos(stream: TextIO) -> Iterator[str]:
+    """Lê um protocol_id por linha, ignorando linhas vazias e comentários (#)."""
+    for line in stream:
+        protocol_id = line.strip()
+        if protocol_id and not protocol_id.startswith("#"):
+            yield protocol_id
+
+
+def orquestrar_lote(
+    protocol_ids: Iterable[str],
+    agents: dict,
+    max_concurrency: int = MAX_CONCURRENCY,
+    resumo: Optional[Dict] = None,
+    checkpoint: Optional[CheckpointStore] = None,
+    resume: bool = False,
+) -> Iterator[Dict]:
+    """
+    Processa um lote de protocolos reaproveitando o mesmo conjunto de agentes.
+
+    No máximo `max_concurrency` protocolos ficam em execução ao mesmo tempo; os ids são
+    consumidos sob demanda (o iterável pode ser um arquivo ou stdin) e cada resultado é
+    entregue assim que o protocolo termina, fora da ordem de entrada.
+    Se `resumo` for informado, é preenchido ao final com vazão e contagem de erros.
+    `checkpoint`/`resume` são repassados ao orquestrador de cada protocolo.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency deve ser >= 1")
+
+    stats = resumo if resumo is not None else {}
+    decisions = Counter()
+    total = errors = skipped = 0
+    ids = iter(protocol_ids)
+    t0 = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="lote") as pool:
+        pending = {}
+
+        def submit_next():
+            for protocol_id in ids:
+                pending[pool.submit(orquestrador, protocol_id, agents, checkpoint, resume)] = protocol_id
+                return
+
+        for _ in range(max_concurrency):
+            submit_next()
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                protocol_id = pending.pop(future)
+                total += 1
+                try:
+                    result = future.result()
+                    skipped += len(result.get("stages_skipped", []))
+                    decisions[str((result.get("decision") or {}).get("decision"))] += 1
+                except Exception as e:
+                    errors += 1
+                    result = {"protocol": protocol_id, "error": str(e)}
+                    logger.warning(f"Protocolo {protocol_id} falhou: {e}")
+                submit_next()
+                yield result
+
+    elapsed = time.perf_counter() - t0
+    stats.update({
+        "total": total,
+        "ok": total - errors,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(total / elapsed, 2) if elapsed > 0 else 0.0,
+        "max_concurrency": max_concurrency,
+        "decisions": dict(decisions),
+        "stages_skipped": skipped,
+    })
@@ -0,0 +1,284 @@
+# app/models.py
+"""
+Resultados tipados das etapas (mesmos esquemas de DOCUMENT_PROMPT, OCR_VISION_PROMPT,
+RULES_PROMPT, INVENTORY_PROMPT e DECISION_PROMPT).
+
+Classes com __slots__ (sem __dict__ por instância), validadas campo a campo por uma tabela
+declarativa. `parse()` aceita a resposta do agente (string JSON, {"output": ...} ou dict) e
+levanta StageParseError apontando a etapa e o campo inválido; `to_dict()` devolve o JSON da etapa.
+Campos fora do esquema são preservados em `extra`; `raw` guarda a resposta original nos fallbacks.
+"""
+from typing import Dict, Optional, Tuple
+import json
+
+REQUIRED = object()
+_MISSING = object()
+
+_NUMBER = (int, float)
+_NONE = type(None)
+
+
+class StageParseError(ValueError):
+    """Resposta do agente fora do esquema da etapa."""
+
+    def __init__(self, stage: str, field: Optional[str], message: str):
+        super().__init__(f"{stage}.{field}: {message}" if field else f"{stage}: {message}")
+        self.stage = stage
+        self.field = field
+
+
+def _check(stage: str, key: str, value, types):
+    if not isinstance(value, types) or (isinstance(value, bool) and bool not in types):
+        expected = "/".join("null" if t is _NONE else t.__name__ for t in types)
+        raise StageParseError(stage, key, f"esperado {expected}, recebido {type(value).__name__}")
+    return value
+
+
+def _confidence(stage: str, value):
+    if value is None:
+        return None
+    if not 0.0 <= value <= 1.0:
+        raise StageParseError(stage, "confidence", f"fora do intervalo 0-1: {value}")
+    return float(value)
+
+
+def _loads(stage: str, resp):
+    """Extrai o objeto JSON da resposta de um agente (dict, {"output": ...} ou string JSON)."""
+    if isinstance(resp, dict) and "output" in resp:
+        resp = resp["output"]
+    if isinstance(resp, (str, bytes)):
+        try:
+            resp = json.loads(resp)
+        except json.JSONDecodeError as e:
+            raise StageParseError(stage, None, f"JSON inválido ({e.msg}, posição {e.pos})") from None
+    if not isinstance(resp, dict):
+        raise StageParseError(stage, None, f"esperado objeto JSON, recebido {type(resp).__name__}")
+    return resp
+
+
+class StageResult:
+    """Base: SPEC = ((atributo, chave JSON, tipos aceitos, padrão ou REQUIRED), ...)."""
+
+    __slots__ = ("extra", "raw")
+    STAGE = ""
+    SPEC: Tuple = ()
+    # Valores usados quando a etapa falha e o orquestrador segue com um resultado degradado
+    FALLBACK: Dict = {}
+
+    def __init__(self, extra: Optional[Dict] = None, raw: Optional[str] = None, **values):
+        for attr, _, _, default in self.SPEC:
+            setattr(self, attr, values.get(attr, None if default is REQUIRED else default))
+        self.extra = extra
+        self.raw = raw
+
+    @classmethod
+    def from_dict(cls, data: Dict):
+        if not isinstance(data, dict):
+            raise StageParseError(cls.STAGE, None, f"esperado objeto JSON, recebido {type(data).__name__}")
+        obj = cls.__new__(cls)
+        found = 0
+        for attr, key, types, default in cls.SPEC:
+            value = data.get(key, _MISSING)
+            if value is _MISSING:
+                if default is REQUIRED:
+                    raise StageParseError(cls.STAGE, key, "campo obrigatório ausente")
+                value = default
+            else:
+                found += 1
+                # Caminho rápido: tipo exato (também separa bool de int); subclasses passam por _check
+                if type(value) not in types:
+                    _check(cls.STAGE, key, value, types)
+                if attr == "confidence":
+                    value = _confidence(cls.STAGE, value)
+            setattr(obj, attr, value)
+        obj.extra = None if found == len(data) else {k: v for k, v in data.items() if k not in cls._keys()}
+        obj.raw = None
+        return obj
+
+    @classmethod
+    def _keys(cls):
+        keys = cls.__dict__.get("_KEYS")
+        if keys is None:
+            keys = frozenset(key for _, key, _, _ in cls.SPEC)
+            setattr(cls, "_KEYS", keys)
+        return keys
+
+    @classmethod
+    def parse(cls, resp):
+        return cls.from_dict(_loads(cls.STAGE, resp))
+
+    @classmethod
+    def fallback(cls, resp):
+        return cls(raw=str(resp), **cls.FALLBACK)
+
+    def to_dict(self) -> Dict:
+        data = {key: getattr(self, attr) for attr, key, _, _ in self.SPEC}
+        if self.extra:
+            data.update(self.extra)
+        if self.raw is not None:
+            data["raw"] = self.raw
+        return data
+
+    def __eq__(self, other):
+        return type(other) is type(self) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        fields = ", ".join(f"{attr}={getattr(self, attr)!r}" for attr, _, _, _ in self.SPEC)
+        return f"{type(self).__name__}({fields})"
+
+
+class DocumentResult(StageResult):
+    STAGE = "document"
+    SPEC = (
+        ("customer_match", "customer_match", (bool,), REQUIRED),
+        ("order_match", "order_match", (bool,), REQUIRED),
+        ("extracted_order", "extracted_order", (dict,), None),
+        ("issues", "issues", (list,), ()),
+        ("confidence", "confidence", _NUMBER, REQUIRED),
+    )
+    __slots__ = tuple(attr for attr, _, _, _ in SPEC)
+    FALLBACK = {"confidence": 0.6}
+
+    @property
+    def attachments(self) -> Dict:
+        """Anexos do protocolo (fora do esquema do prompt: vêm em extra ou dentro de extracted_order)."""
+        return (self.extra or {}).get("attachments") or (self.extracted_order or {}).get("attachments") or {}
+
+    @property
+    def first_item(self) -> Dict:
+        items = (self.extracted_order or {}).get("items") or (self.extra or {}).get("order", {}).get("items")
+        return items[0] if items else {}
+
+
+class OcrVisionResult(StageResult):
+    STAGE = "ocr"
+    SPEC = (
+        ("ocr", "ocr", (dict,), REQUIRED),
+        ("vision", "vision", (dict,), REQUIRED),
+        ("confidence", "confidence", _NUMBER, REQUIRED),
+    )
+    __slots__ = tuple(attr for attr, _, _, _ in SPEC)
+    FALLBACK = {"confidence": 0.6}
+
+    @property
+    def id_item_pedido(self) -> Optional[str]:
+        return ((self.ocr or {}).get("extracted") or {}).get("id_item_pedido")
+
+
+class RuleCheck:
+    __slots__ = ("rule_id", "passed", "evidence")
+
+    def __init__(self, rule_id: str, passed: bool, evidence: Optional[str] = None):
+        self.rule_id = rule_id
+        self.passed = passed
+        self.evidence = evidence
+
+    @classmethod
+    def from_dict(cls, data, index: int) -> "RuleCheck":
+        field = f"checks[{index}]"
+        if not isinstance(data, dict):
+            raise StageParseError("rules", field, f"esperado objeto, recebido {type(data).__name__}")
+        for key in ("rule_id", "pass"):
+            if key not in data:
+                raise StageParseError("rules", f"{field}.{key}", "campo obrigatório ausente")
+        return cls(
+            _check("rules", f"{field}.rule_id", data["rule_id"], (str,)),
+            _check("rules", f"{field}.pass", data["pass"], (bool,)),
+            _check("rules", f"{field}.evidence", data.get("evidence"), (str, _NONE)),
+        )
+
+    def to_dict(self) -> Dict:
+        return {"rule_id": self.rule_id, "pass": self.passed, "evidence": self.evidence}
+
+
+class RulesResult(StageResult):
+    STAGE = "rules"
+    SPEC = (
+        ("id_item_pedido", "id_item_pedido", (str, _NONE), None),
+        ("checks", "checks", (list,), ()),
+        ("eligible", "eligible", (bool,), REQUIRED),
+        ("confidence", "confidence", _NUMBER, REQUIRED),
+        ("citations", "citations", (list,), ()),
+    )
+    __slots__ = tuple(attr for attr, _, _, _ in SPEC)
+    FALLBACK = {"eligible": True, "confidence": 0.7}
+
+    @classmethod
+    def from_dict(cls, data: Dict):
+        result = super().from_dict(data)
+        result.checks = tuple(RuleCheck.from_dict(check, i) for i, check in enumerate(result.checks))
+        return result
+
+    def to_dict(self) -> Dict:
+        data = super().to_dict()
+        data["checks"] = [check.to_dict() for check in self.checks]
+        return data
+
+
+class InventoryResult(StageResult):
+    STAGE = "inventory"
+    SPEC = (
+        ("id_item_pedido", "id_item_pedido", (str, _NONE), None),
+        ("available", "available", (bool,), REQUIRED),
+        ("reservation_id", "reservation_id", (str, _NONE), None),
+        ("qty", "qty", (int, _NONE), None),
+        ("confidence", "confidence", _NUMBER + (_NONE,), None),
+    )
+    __slots__ = tuple(attr for attr, _, _, _ in SPEC)
+    FALLBACK = {"available": False, "confidence": 0.5}
+
+
+class DecisionResult(StageResult):
+    STAGE = "decision"
+    SPEC = (
+        ("decision", "decision", (str,), REQUIRED),
+        ("action_payload", "action_payload", (dict, _NONE), None),
+        ("confidence", "confidence", _NUMBER + (_NONE,), None),
+        ("explanation", "explanation", (str, _NONE), None),
+        ("audit_refs", "audit_refs", (list,), ()),
+    )
+    __slots__ = tuple(attr for attr, _, _, _ in SPEC)
+    FALLBACK = {"decision": "escalate", "confidence": 0.4}
+
+
+class Skipped:
+    """Etapa não executada por uma regra de short-circuit."""
+
+    __slots__ = ("reason", "rule")
+
+    def __init__(self, reason: str, rule: str):
+        self.reason = reason
+        self.rule = rule
+
+    def to_dict(self) -> Dict:
+        return {"skipped": True, "reason": self.reason, "rule": self.rule}
+
+
+STAGE_MODELS = {
+    "document": DocumentResult,
+    "ocr": OcrVisionResult,
+    "rules": RulesResult,
+    "inventory": InventoryResult,
+    "decision": DecisionResult,
+}
+
+
+def to_jsonable(value):
+    """`default` para json.dumps: serializa resultados tipados sem passar por str()."""
+    to_dict = getattr(value, "to_dict", None)
+    if to_dict is not None:
+        return to_dict()
+    return str(value)
+
+
+def to_plain(value):
+    return value.to_dict() if isinstance(value, (StageResult, Skipped)) else value
+
+
+def result_to_dict(result: Dict) -> Dict:
+    """Resultado do orquestrador apenas com tipos JSON (para respostas HTTP, JSONL etc.)."""
+    return {
+        **result,
+        "decision": to_plain(result["decision"]),
+        "audit": {name: to_plain(value) for name, value in result["audit"].items()},
+    }
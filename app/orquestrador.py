@@ -1,12 +1,23 @@
-import json
+import os
+import time
 import uuid
+import asyncio
 import logging
+import threading
+import contextvars
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Optional
 
-from app.agents.document_agent import build_document_agent
-from app.agents.ocr_agent import build_ocr_vision_agent
-from app.agents.rules_agent import build_rules_agent
-from app.agents.inventory_agent import build_inventory_agent
-from app.agents.decision_agent import build_decision_agent
+from app.checkpoint import CheckpointStore
+from app.context_projection import DECISION_CONTEXT_TOKENS, project_decision_input
+from app.deadlines import PROTOCOL_DEADLINE_S, DeadlineExceeded, deadline_scope, stage_budget
+from app.models import STAGE_MODELS, DecisionResult, InventoryResult, Skipped, StageParseError, result_to_dict
+from app.speculation import SPECULATIVE_INVENTORY, InventorySpeculator, inventory_speculator
+from app.telemetry import record, span, start_trace, end_trace
+from app.agents.registry import AGENTS_PREWARM, MOCK_AGENTS, AgentRegistry
+from app.audit import AUDIT_ENABLED, AuditSink, audit_record, audit_sink
+from app.tools.inventory_api import release_reservation
+from app.tools.latency import bind_protocol, unbind_protocol
 from app.tools.portal_api import dados_protocolo
 
 # Configuração do logger
@@ -16,121 +27,591 @@ logger = logging.getLogger(__name__)
 # Configuração padrão do modelo
 MODEL = "gpt-4o-mini"
 
+# Grafo de dependências entre as etapas (DAG), em ordem topológica.
+# Etapas sem dependência entre si (ex.: rules e inventory) rodam em paralelo no orquestrador_async.
+STAGE_DEPS = {
+    "document": (),
+    "ocr": ("document",),
+    "rules": ("document", "ocr"),
+    "inventory": ("document", "ocr"),
+    "decision": ("document", "ocr", "rules", "inventory"),
+}
 
-def init_agents(model: str = MODEL):
-    """Inicializa todos os agentes e retorna um dicionário."""
+# rules depende do OCR, mas a consulta de regras do item do pedido não: ela é disparada ao fim de
+# document e corre junto com o OCR (RULES_PREFETCH=0 desativa); ver _prefetch_rules
+RULES_PREFETCH = os.getenv("RULES_PREFETCH", "1") == "1"
+
+# Etapas com efeito colateral (reserva de estoque, criação da troca) nunca são abandonadas ao estourar
+# o orçamento: a chamada abandonada seguiria rodando e deixaria uma reserva ou troca sem dono. Elas
+# recebem o prazo da etapa (as tools limitam o I/O por ele) e o orquestrador espera o resultado.
+SIDE_EFFECT_STAGES = frozenset({"inventory", "decision"})
+
+
+def init_agents(model: str = MODEL, llm_cache=None, seed=None, mock: bool = MOCK_AGENTS, lazy: bool = True):
+    """
+    Inicializa os agentes e retorna um AgentRegistry (mapping nome -> agente).
+    Com lazy=True (padrão) cada agente é importado e construído no primeiro uso e os listados em
+    AGENTS_PREWARM são construídos em segundo plano; lazy=False constrói todos imediatamente.
+    No modo real, um único cache de respostas do LLM (SQLiteLLMCache por padrão) é compartilhado
+    pelos agentes habilitados em LLM_CACHE_AGENTS. `seed` torna os sorteios dos mocks reproduzíveis.
+    """
+    agents = AgentRegistry(model, mock=mock, llm_cache=llm_cache, seed=seed)
+    if not lazy:
+        agents.prewarm(background=False)
+    elif AGENTS_PREWARM:
+        agents.prewarm(AGENTS_PREWARM)
+    return agents
+
+
+def _id_item_pedido(ctx: dict):
+    """Identificador do item: extraído pelo OCR ou, na falta, o primeiro item do pedido."""
+    return getattr(ctx["ocr"], "id_item_pedido", None) \
+        or ctx["document"].first_item.get("id_item_pedido", "ID_ITEM_PEDIDO-MOCK")
+
+
+# ========================================================================================================================
+# 1️⃣ Document Agent
+# ========================================================================================================================
+def _document_inputs(ctx: dict):
+    return {"input": ctx["protocol_id"]}
+
+
+# ========================================================================================================================
+# 2️⃣ OCR/Vision Agent
+# ========================================================================================================================
+def _ocr_inputs(ctx: dict):
+    attachments = ctx["document"].attachments
     return {
-        "document_agent": build_document_agent(True),
-        "ocr_agent": build_ocr_vision_agent(model),
-        "rules_agent": build_rules_agent(model),
-        "inventory_agent": build_inventory_agent(model),
-        "decision_agent": build_decision_agent(model)
+        "input": {
+            "invoice_image": attachments.get("invoice_image_path"),
+            "product_image": attachments.get("product_image_path")
+        }
     }
 
 
-def orquestrador(protocol_id: str, agents: dict):
-    logger.info(f"Recebendo protocolo para iniciar validação: {protocol_id}")
+# ========================================================================================================================
+# 3️⃣ Rules Agent
+# ========================================================================================================================
+def _rules_inputs(ctx: dict):
+    return {"input": {"id_item_pedido": _id_item_pedido(ctx), "ocr": ctx["ocr"].to_dict(),
+                      "document": ctx["document"].to_dict()}}
 
-    idempotency_key = f"{protocol_id}-{uuid.uuid4()}"
-    logger.info(f"Identificador único gerado: {idempotency_key}")
 
-    # ========================================================================================================================
-    # 1️⃣ Document Agent
-    # ========================================================================================================================
-    doc_json = {}
+# ========================================================================================================================
+# 4️⃣ Inventory Agent
+# ========================================================================================================================
+def _inventory_inputs(ctx: dict):
+    return {"input": {"id_item_pedido": _id_item_pedido(ctx), "qty": 1, "idempotency_key": ctx["idempotency_key"]}}
+
+
+# ========================================================================================================================
+# 5️⃣ Decision Agent
+# ========================================================================================================================
+def _decision_inputs(ctx: dict):
+    data = {
+        "document": ctx["document"].to_dict(),
+        "ocr": ctx["ocr"].to_dict(),
+        "rules": ctx["rules"].to_dict(),
+        "inventory": ctx["inventory"].to_dict(),
+        "protocol_id": ctx["protocol_id"],
+        "idempotency_key": ctx["idempotency_key"]
+    }
+    if DECISION_CONTEXT_TOKENS <= 0:
+        return {"input": data}
+
+    # Só os campos usados na decisão, dentro do orçamento de tokens; contagens ficam no span
+    start = time.perf_counter()
+    projected, tokens = project_decision_input(data, DECISION_CONTEXT_TOKENS, MODEL)
+    record("projection", "decision", start, time.perf_counter() - start, **tokens)
+    return {"input": projected}
+
+
+# etapa -> (agente, montagem da entrada, nome no log); o resultado tipado de cada etapa está em STAGE_MODELS
+STAGES = {
+    "document": ("document_agent", _document_inputs, "Document Agent"),
+    "ocr": ("ocr_agent", _ocr_inputs, "OCR Agent"),
+    "rules": ("rules_agent", _rules_inputs, "Rules Agent"),
+    "inventory": ("inventory_agent", _inventory_inputs, "Inventory Agent"),
+    "decision": ("decision_agent", _decision_inputs, "Decision Agent"),
+}
+
+
+# ========================================================================================================================
+# ⏭️ Short-circuit entre etapas
+# ========================================================================================================================
+def _document_mismatch(ctx: dict) -> bool:
+    document = ctx["document"]
+    return getattr(document, "customer_match", None) is False or getattr(document, "order_match", None) is False
+
+
+def _ineligible(ctx: dict) -> bool:
+    return getattr(ctx["rules"], "eligible", None) is False
+
+
+# Avaliadas ao fim da etapa "after": se "when" for verdadeiro, as etapas em "skip" não são executadas
+# (ficam marcadas na auditoria) e, com "decision", o protocolo é encerrado com essa decisão.
+# Uma regra que pula uma etapa faz essa etapa aguardar "after" também no orquestrador_async.
+SHORT_CIRCUIT_RULES = [
+    {
+        "name": "document_mismatch",
+        "after": "document",
+        "when": _document_mismatch,
+        "skip": ("ocr", "rules", "inventory", "decision"),
+        "decision": "escalado",
+        "reason": "Dados do cliente/pedido não conferem com a solicitação",
+    },
+    {
+        "name": "ineligible",
+        "after": "rules",
+        "when": _ineligible,
+        "skip": ("inventory", "decision"),
+        "decision": "escalado",
+        "reason": "Produto inelegível pelas regras — reserva de estoque não realizada",
+    },
+]
+
+
+# Etapas que começam antes do fim de "after", assim que os campos parciais já recebidos do agente em
+# streaming (AGENT_MODE=structured) satisfazem "when". "when" deve garantir que o short-circuit de
+# "after" não vai pular a etapa; se ainda assim pular (ex.: fallback), a saída antecipada é descartada.
+EARLY_START = {
+    "inventory": {"after": "rules", "when": lambda fields: fields.get("eligible") is True},
+}
+
+
+def _stage_deps(name: str, short_circuit) -> tuple:
+    extra = tuple(
+        rule["after"] for rule in short_circuit
+        if name in rule["skip"] and rule["after"] not in STAGE_DEPS[name] and rule["after"] != name
+    )
+    return STAGE_DEPS[name] + extra
+
+
+def _apply_short_circuit(after: str, ctx: dict, short_circuit):
+    for rule in short_circuit:
+        if rule["after"] != after or not rule["when"](ctx):
+            continue
+        skipped = [name for name in rule["skip"] if name not in ctx]
+        for name in skipped:
+            ctx[name] = Skipped(rule["reason"], rule["name"])
+        if rule.get("decision") and "decision" in skipped:
+            ctx["decision"] = DecisionResult(
+                decision=rule["decision"],
+                action_payload=None,
+                confidence=getattr(ctx[after], "confidence", None),
+                explanation=rule["reason"],
+                audit_refs=[f"SHORT-CIRCUIT:{rule['name']}"]
+            )
+        if skipped:
+            ctx["short_circuit"].append({"rule": rule["name"], "after": after, "stages": skipped})
+            logger.info(f"Short-circuit '{rule['name']}' após {after}: etapas puladas {skipped}")
+
+
+def _parse_stage(name: str, label: str, resp):
+    """Converte a resposta no resultado tipado da etapa; resposta fora do esquema vira fallback."""
+    model = STAGE_MODELS[name]
     try:
-        doc_resp = agents["document_agent"].invoke({"input": protocol_id})
-        doc_json = json.loads(doc_resp.get("output", doc_resp)) if isinstance(doc_resp, dict) else json.loads(doc_resp)
-    except Exception as e:
-        doc_json = {"raw": str(doc_resp), "confidence": 0.6}
-        logger.warning(f"Document Agent falhou: {e}")
+        return model.parse(resp), True
+    except StageParseError as e:
+        logger.warning(f"{label} retornou resposta inválida: {e}")
+        return model.fallback(resp), False
 
-    # ========================================================================================================================
-    # 2️⃣ OCR/Vision Agent
-    # ========================================================================================================================
-    ocr_json = {}
+
+def _stage_budget(name: str, deadline: float) -> float:
+    budget = stage_budget(name, deadline - time.perf_counter(), STAGE_DEPS)
+    if budget <= 0:
+        raise DeadlineExceeded("Prazo do protocolo esgotado")
+    return budget
+
+
+def _deadline_fallback(name: str, label: str, ctx: dict, budget: Optional[float]):
+    """Etapa cancelada por estourar o orçamento: segue com o fallback, marcada no resultado."""
+    logger.warning(f"{label} excedeu o prazo da etapa ({budget or 0:.2f}s)")
+    ctx["deadline_exceeded"].append(name)
+    return STAGE_MODELS[name].fallback("prazo da etapa excedido"), False
+
+
+def _background(fn, *args, thread_name: str = "stage") -> Future:
+    """Executa fn(*args) numa thread própria, com uma cópia do contexto atual (trace e prazo)."""
+    future = Future()
+
+    def target():
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=contextvars.copy_context().run, args=(target,), name=thread_name, daemon=True).start()
+    return future
+
+
+def _invoke_with_timeout(agent, inputs, budget: float, **kwargs):
+    """
+    Executa agent.invoke numa thread própria (com o contexto atual e o prazo da etapa) e desiste após `budget`.
+    A thread não é interrompida e a chamada segue até o fim em segundo plano: as tools só limitam pelo
+    prazo o próprio I/O. Por isso as etapas de SIDE_EFFECT_STAGES não passam por aqui.
+    """
+    deadline = time.perf_counter() + budget
+
+    def call():
+        with deadline_scope(deadline):
+            return agent.invoke(inputs, **kwargs)
+
+    return _background(call).result(timeout=budget)
+
+
+def _field_kwargs(agent, on_field) -> dict:
+    """on_field só vai para agentes que entregam campos parciais (StructuredAgent em streaming)."""
+    return {"on_field": on_field} if on_field is not None and getattr(agent, "streams_fields", False) else {}
+
+
+def _field_listener(name: str, ctx: dict, early_start, start_early):
+    """on_field da etapa `name`: chama start_early(etapa) para cada etapa de early_start liberada pelos campos."""
+    targets = [target for target, rule in early_start.items() if rule["after"] == name and target not in ctx]
+    if not targets:
+        return None
+    fields, fired = {}, set()
+    lock = threading.Lock()
+
+    def on_field(key, value):
+        with lock:
+            fields[key] = value
+            ready = [t for t in targets if t not in fired and early_start[t]["when"](fields)]
+            fired.update(ready)
+        for target in ready:
+            logger.info(f"Etapa {target} iniciada antes do fim de {name} ({key} recebido)")
+            start_early(target)
+
+    return on_field
+
+
+def _discard_early(name: str, output):
+    """Saída de etapa antecipada que o short-circuit acabou pulando: desfaz a reserva, se houver."""
+    reservation_id = getattr(output, "reservation_id", None)
+    if reservation_id and release_reservation(reservation_id):
+        logger.info(f"Etapa {name} antecipada descartada; reserva {reservation_id} liberada")
+
+
+def _run_stage(name: str, agents: dict, ctx: dict, deadline: Optional[float] = None, on_field=None):
+    """
+    Executa a etapa e retorna (saída, sucesso); em caso de falha ou de prazo excedido a saída é o fallback.
+    `on_field(chave, valor)` recebe os campos da saída à medida que chegam (agentes em streaming).
+    """
+    agent_name, build_inputs, label = STAGES[name]
+    resp = budget = None
     try:
-        ocr_inputs = {
-            "input": {
-                "invoice_image": doc_json.get("attachments", {}).get("invoice_image_path"),
-                "product_image": doc_json.get("attachments", {}).get("product_image_path")
-            }
-        }
-        ocr_resp = agents["ocr_agent"].invoke(ocr_inputs)
-        ocr_json = ocr_resp.get("output", ocr_resp) if isinstance(ocr_resp, dict) else ocr_resp
+        with span("stage", name):
+            agent = agents[agent_name]
+            kwargs = _field_kwargs(agent, on_field)
+            if deadline is None:
+                resp = agent.invoke(build_inputs(ctx), **kwargs)
+            elif name in SIDE_EFFECT_STAGES:
+                budget = _stage_budget(name, deadline)
+                with deadline_scope(time.perf_counter() + budget):
+                    resp = agent.invoke(build_inputs(ctx), **kwargs)
+            else:
+                budget = _stage_budget(name, deadline)
+                resp = _invoke_with_timeout(agent, build_inputs(ctx), budget, **kwargs)
+    except (DeadlineExceeded, FutureTimeoutError):
+        return _deadline_fallback(name, label, ctx, budget)
     except Exception as e:
-        ocr_json = {"raw": str(ocr_resp), "confidence": 0.6}
-        logger.warning(f"OCR Agent falhou: {e}")
+        logger.warning(f"{label} falhou: {e}")
+        return STAGE_MODELS[name].fallback(resp), False
+    return _parse_stage(name, label, resp)
 
-    # ========================================================================================================================
-    # 3️⃣ Rules Agent
-    # ========================================================================================================================
-    
-    rules_json = {}
+
+async def _ainvoke(agent, inputs, on_field=None):
+    # Executores do LangChain expõem ainvoke; os mocks síncronos rodam numa thread do executor padrão.
+    kwargs = _field_kwargs(agent, on_field)
+    if hasattr(agent, "ainvoke"):
+        return await agent.ainvoke(inputs, **kwargs)
+    return await asyncio.to_thread(agent.invoke, inputs, **kwargs)
+
+
+async def _run_stage_async(name: str, agents: dict, ctx: dict, deadline: Optional[float] = None, on_field=None):
+    agent_name, build_inputs, label = STAGES[name]
+    agent = agents[agent_name]
+    resp = budget = None
     try:
-        code_product = ocr_json.get("ocr", {}).get("extracted", {}).get("code_product") \
-              or doc_json.get("order", {}).get("items", [{}])[0].get("code_product", "code_product-MOCK")
-        rules_inputs = {"input": {"code_product": code_product, "ocr": ocr_json}}
-        rules_resp = agents["rules_agent"].invoke(rules_inputs)
-        rules_json = rules_resp.get("output", rules_resp) if isinstance(rules_resp, dict) else rules_resp
+        inputs = build_inputs(ctx)
+        with span("stage", name):
+            if deadline is None:
+                resp = await _ainvoke(agent, inputs, on_field)
+            else:
+                budget = _stage_budget(name, deadline)
+                with deadline_scope(time.perf_counter() + budget):
+                    if name in SIDE_EFFECT_STAGES:
+                        # Sem wait_for: cancelar a task não interrompe a thread de asyncio.to_thread
+                        resp = await _ainvoke(agent, inputs, on_field)
+                    else:
+                        # Ao estourar o orçamento, wait_for cancela a task (e a chamada de LLM em andamento)
+                        resp = await asyncio.wait_for(_ainvoke(agent, inputs, on_field), budget)
+    except (DeadlineExceeded, asyncio.TimeoutError):
+        return _deadline_fallback(name, label, ctx, budget)
     except Exception as e:
-        rules_json = {"raw": str(rules_resp), "eligible": True, "confidence": 0.7}
-        logger.warning(f"Rules Agent falhou: {e}")
+        logger.warning(f"{label} falhou: {e}")
+        return STAGE_MODELS[name].fallback(resp), False
+    return _parse_stage(name, label, resp)
 
-    # ========================================================================================================================
-    # 4️⃣ Inventory Agent
-    # ========================================================================================================================
 
-    inventory_json = {"available": False, "reservation_id": None, "confidence": 0.0}
-    try:
-        need_reserve = True
-        if need_reserve:
-            inv_inputs = {"messages": [{"role": "user", "content": json.dumps({
-                "code_product": code_product, "qty": 1, "idempotency_key": idempotency_key
-            })}]}
+def _speculative_inventory(speculator: InventorySpeculator, hold, ctx: dict):
+    """Saída da etapa inventory a partir da reserva especulativa, ou None para executar o agente."""
+    held = speculator.resolve(hold, _id_item_pedido(ctx))
+    return (InventoryResult.from_dict(held), True) if held is not None else None
 
-            inv_resp = agents["inventory_agent"].invoke(inv_inputs)
-            inventory_json = json.loads(inv_resp) if isinstance(inv_resp, str) else inv_resp
 
-    except Exception as e:
-        inventory_json = {"raw": str(inv_resp), "available": False, "confidence": 0.5}
-        logger.warning(f"Inventory Agent falhou: {e}")
+async def _speculative_inventory_async(speculator: InventorySpeculator, hold, ctx: dict):
+    held = await speculator.aresolve(hold, _id_item_pedido(ctx))
+    return (InventoryResult.from_dict(held), True) if held is not None else None
+
+
+def _start_speculation(speculator: Optional[InventorySpeculator], name: str, ctx: dict):
+    """Ao fim de document, reserva o item do pedido se a etapa inventory ainda vai rodar."""
+    if speculator is None or name != "document" or "inventory" in ctx or isinstance(ctx["document"], Skipped):
+        return None
+    return speculator.start(ctx)
+
+
+def _prefetch_rules(agents, name: str, ctx: dict):
+    """
+    Ao fim de document, antecipa a consulta de regras do item do pedido (agentes com `prefetch`,
+    ex.: RulesEngineAgent) numa thread, junto com o OCR; o Rules agent reaproveita a busca.
+    Se o OCR extrair outro item, o agente consulta o item extraído normalmente.
+    """
+    if not RULES_PREFETCH or name != "document" or "rules" in ctx or isinstance(ctx["document"], Skipped):
+        return
+    id_item_pedido = ctx["document"].first_item.get("id_item_pedido")
+    if id_item_pedido:
+        _background(_prefetch_rules_lookup, agents, id_item_pedido, thread_name="rules-prefetch")
+
+
+def _prefetch_rules_lookup(agents, id_item_pedido: str):
+    prefetch = getattr(agents["rules_agent"], "prefetch", None)
+    if prefetch is not None:
+        prefetch(id_item_pedido)
+
+
+def _settle_speculation(speculator: Optional[InventorySpeculator], hold, ctx: dict):
+    # Sem decisão (protocolo interrompido por erro) a reserva é liberada
+    if hold is not None:
+        speculator.settle(hold, getattr(ctx.get("decision"), "decision", None))
+
+
+def _new_context(protocol_id: str, checkpoint: Optional[CheckpointStore] = None, resume: bool = False) -> dict:
+    logger.info(f"Recebendo protocolo para iniciar validação: {protocol_id}")
+
+    if checkpoint is not None:
+        # Chave estável entre execuções: replays não geram nova reserva/troca
+        idempotency_key = checkpoint.idempotency_key(protocol_id)
+    else:
+        idempotency_key = f"{protocol_id}-{uuid.uuid4()}"
+    logger.info(f"Identificador único gerado: {idempotency_key}")
 
+    ctx = {"protocol_id": protocol_id, "idempotency_key": idempotency_key, "skipped": [], "short_circuit": [],
+           "deadline_exceeded": []}
+    if checkpoint is not None and resume:
+        done = checkpoint.load_stages(protocol_id)
+        for name in STAGE_DEPS:
+            if name in done:
+                try:
+                    ctx[name] = STAGE_MODELS[name].from_dict(done[name])
+                except StageParseError as e:
+                    logger.warning(f"Checkpoint de {name} descartado: {e}")
+                    continue
+                ctx["skipped"].append(name)
+        logger.info(f"Retomando protocolo {protocol_id}: {len(ctx['skipped'])} etapa(s) reaproveitada(s) do checkpoint")
+    return ctx
+
+
+def _save_stage(checkpoint: Optional[CheckpointStore], ctx: dict, name: str, ok: bool):
+    # Saídas de fallback não são gravadas: a etapa volta a ser executada na próxima tentativa.
+    # A saída especulativa também não: a reserva só é confirmada em _settle_speculation, e uma retomada
+    # após a queda do processo roda o Inventory agent (a reserva provisória expira pelo TTL).
+    if checkpoint is not None and ok and not (ctx[name].extra or {}).get("speculative"):
+        checkpoint.save_stage(ctx["protocol_id"], name, ctx[name].to_dict())
+
+
+def _result(ctx: dict, timings: dict, spans: list, audit: Optional[AuditSink] = None) -> dict:
     # ========================================================================================================================
-    # 5️⃣ Decision Agent
+    # 6️⃣ Logging final / Auditoria
     # ========================================================================================================================
-    decision_json = {}
+    result = {
+        "protocol": ctx["protocol_id"],
+        "decision": ctx["decision"],
+        "audit": {
+            "document": ctx["document"],
+            "ocr": ctx["ocr"],
+            "rules": ctx["rules"],
+            "inventory": ctx["inventory"],
+            "spans": spans
+        },
+        "timings": timings,
+        "stages_skipped": ctx["skipped"],
+        "short_circuit": ctx["short_circuit"],
+        "deadline_exceeded": ctx["deadline_exceeded"]
+    }
+    logger.info(f"Protocolo {ctx['protocol_id']}: decisão {getattr(ctx['decision'], 'decision', None)}")
+    # O registro completo vai para a trilha de auditoria (serializado e gravado em segundo plano)
+    if audit is not None:
+        audit.submit(audit_record(ctx, result))
+    # Os modelos tipados ficam internos: quem chama recebe só tipos JSON, como antes
+    return result_to_dict(result)
+
+
+def _notify(on_stage, name: str, ctx: dict, timings: dict):
+    """Entrega ao callback o resultado da etapa (executada, retomada do checkpoint ou pulada)."""
+    if on_stage is None:
+        return
     try:
-        decision_inputs = {
-            "input": {
-                "document": doc_json,
-                "ocr": ocr_json,
-                "rules": rules_json,
-                "inventory": inventory_json,
-                "protocol_id": protocol_id,
-                "idempotency_key": idempotency_key
-            }
-        }
-        decision_resp = agents["decision_agent"].invoke(decision_inputs)
-        decision_json = decision_resp.get("output", decision_resp) if isinstance(decision_resp, dict) else decision_resp
+        on_stage(name, ctx[name], timings.get(name))
     except Exception as e:
-        decision_json = {"raw": str(decision_resp), "decision": "escalate", "confidence": 0.4}
-        logger.warning(f"Decision Agent falhou: {e}")
+        logger.warning(f"Callback on_stage falhou na etapa {name}: {e}")
 
-    # ========================================================================================================================
-    # 6️⃣ Logging final / Auditoria
-    # ========================================================================================================================
-    logger.info("=== Resultado da Análise ===")
-    logger.info(f"Protocol: {protocol_id}")
-    logger.info(f"Decision: {json.dumps(decision_json, indent=2, ensure_ascii=False)}")
 
-    return {
-        "protocol": protocol_id,
-        "decision": decision_json,
-        "audit": {
-            "document": doc_json,
-            "ocr": ocr_json,
-            "rules": rules_json,
-            "inventory": inventory_json
-        }
-    }
\ No newline at end of file
+def orquestrador(protocol_id: str, agents: dict, checkpoint: Optional[CheckpointStore] = None, resume: bool = False,
+                 short_circuit=SHORT_CIRCUIT_RULES, on_stage=None, deadline_s: Optional[float] = PROTOCOL_DEADLINE_S,
+                 speculator: Optional[InventorySpeculator] = inventory_speculator if SPECULATIVE_INVENTORY else None,
+                 early_start=EARLY_START, audit: Optional[AuditSink] = audit_sink if AUDIT_ENABLED else None):
+    """
+    Executa o fluxo completo de um protocolo.
+    Com `checkpoint`, a saída de cada etapa concluída é persistida e a idempotency_key é estável;
+    com `resume=True`, etapas já concluídas são carregadas do checkpoint em vez de reexecutadas.
+    `short_circuit` define as regras de encerramento antecipado (use () para desativar).
+    `on_stage(nome, saída, timing)` é chamado assim que cada etapa tem resultado.
+    `deadline_s` é o prazo de ponta a ponta (None/0 = sem prazo), repartido entre as etapas por
+    STAGE_BUDGET_SHARE; a etapa que estoura o orçamento é abandonada e segue com o fallback (exceto as de
+    SIDE_EFFECT_STAGES, que só terminam antes se as tools esgotarem o prazo).
+    Com `speculator` (SPECULATIVE_INVENTORY=1), o item do pedido é reservado logo após document,
+    em paralelo com OCR e rules; ver app/speculation.py.
+    `early_start` (EARLY_START; {} desativa): etapas disparadas numa thread assim que os campos
+    parciais de um agente em streaming as liberam (ex.: inventory quando rules emite eligible=true).
+    `audit` (AUDIT_ENABLED=1): recebe o registro de auditoria do protocolo sem bloquear; ver app/audit.py.
+    """
+    ctx = _new_context(protocol_id, checkpoint, resume)
+    timings = {}
+    trace = start_trace()
+    latency_scope = bind_protocol(protocol_id)
+    t0 = time.perf_counter()
+    deadline = t0 + deadline_s if deadline_s else None
+    hold = None
+    early = {}  # etapa -> Future de (saída, sucesso, início, fim) da execução antecipada
+
+    def execute(name: str, on_field=None):
+        start = time.perf_counter() - t0
+        speculative = _speculative_inventory(speculator, hold, ctx) if name == "inventory" and hold else None
+        output, ok = speculative or _run_stage(name, agents, ctx, deadline, on_field)
+        return output, ok, start, time.perf_counter() - t0
+
+    def start_early(name: str):
+        early[name] = _background(execute, name, thread_name="early-stage")
+
+    try:
+        for name in STAGE_DEPS:
+            if name not in ctx:
+                future = early.pop(name, None)
+                ctx[name], ok, start, end = future.result() if future is not None else \
+                    execute(name, _field_listener(name, ctx, early_start, start_early))
+                timings[name] = {"start": round(start, 4), "end": round(end, 4)}
+                _save_stage(checkpoint, ctx, name, ok)
+            elif name in early:
+                # Pulada pelo short-circuit depois de iniciada antecipadamente
+                _discard_early(name, early.pop(name).result()[0])
+            _notify(on_stage, name, ctx, timings)
+            if not isinstance(ctx[name], Skipped):
+                _apply_short_circuit(name, ctx, short_circuit)
+            hold = _start_speculation(speculator, name, ctx) or hold
+            _prefetch_rules(agents, name, ctx)
+    finally:
+        # Também em caso de erro: a reserva especulativa é resolvida e a thread (reutilizada em lote)
+        # não fica com o trace e o escopo de latência deste protocolo
+        _settle_speculation(speculator, hold, ctx)
+        unbind_protocol(latency_scope)
+        spans = end_trace(trace)
+    return _result(ctx, timings, spans, audit)
+
+
+async def orquestrador_async(protocol_id: str, agents: dict,
+                             checkpoint: Optional[CheckpointStore] = None, resume: bool = False,
+                             short_circuit=SHORT_CIRCUIT_RULES, on_stage=None,
+                             deadline_s: Optional[float] = PROTOCOL_DEADLINE_S,
+                             speculator: Optional[InventorySpeculator] =
+                             inventory_speculator if SPECULATIVE_INVENTORY else None,
+                             early_start=EARLY_START,
+                             audit: Optional[AuditSink] = audit_sink if AUDIT_ENABLED else None):
+    """
+    Variante assíncrona do orquestrador: cada etapa aguarda apenas as dependências
+    declaradas em STAGE_DEPS, de modo que etapas independentes rodam em paralelo.
+    Retorna o mesmo dicionário do orquestrador, com início/fim (segundos desde o
+    início do protocolo) de cada etapa em "timings" para identificar o caminho crítico.
+    `on_stage` é chamado no event loop, na ordem em que as etapas terminam.
+    `deadline_s`: como no orquestrador; a etapa que estoura o orçamento é cancelada.
+    `speculator`: como no orquestrador; a reserva roda junto com OCR e rules.
+    `early_start`: como no orquestrador; a etapa deixa de aguardar "after" quando os campos a liberam.
+    `audit`: como no orquestrador.
+    """
+    ctx = _new_context(protocol_id, checkpoint, resume)
+    timings = {}
+    tasks = {}
+    trace = start_trace()
+    latency_scope = bind_protocol(protocol_id)
+    t0 = time.perf_counter()
+    deadline = t0 + deadline_s if deadline_s else None
+    holds = {}
+    loop = asyncio.get_running_loop()
+    released = {name: asyncio.Event() for name in early_start}
+
+    def start_early(name: str):
+        # on_field pode vir de uma thread (agente sem ainvoke)
+        loop.call_soon_threadsafe(released[name].set)
+
+    async def wait_deps(name: str):
+        deps = _stage_deps(name, short_circuit)
+        after = early_start.get(name, {}).get("after")
+        if after not in deps:
+            await asyncio.gather(*(tasks[dep] for dep in deps))
+            return None
+        await asyncio.gather(*(tasks[dep] for dep in deps if dep != after))
+        waiter = asyncio.ensure_future(released[name].wait())
+        await asyncio.wait((tasks[after], waiter), return_when=asyncio.FIRST_COMPLETED)
+        waiter.cancel()
+        return after
+
+    async def run(name: str):
+        after = await wait_deps(name)
+        if name not in ctx:
+            start = time.perf_counter() - t0
+            speculative = None
+            if name == "inventory" and "hold" in holds:
+                speculative = await _speculative_inventory_async(speculator, holds["hold"], ctx)
+            output, ok = speculative or await _run_stage_async(
+                name, agents, ctx, deadline, _field_listener(name, ctx, early_start, start_early))
+            end = time.perf_counter() - t0
+            if after is not None:
+                # Iniciada antes do fim de "after": o short-circuit dele ainda pode pular a etapa
+                await tasks[after]
+            if isinstance(ctx.get(name), Skipped):
+                _discard_early(name, output)
+            else:
+                ctx[name] = output
+                timings[name] = {"start": round(start, 4), "end": round(end, 4)}
+                _save_stage(checkpoint, ctx, name, ok)
+        _notify(on_stage, name, ctx, timings)
+        if not isinstance(ctx[name], Skipped):
+            _apply_short_circuit(name, ctx, short_circuit)
+        hold = _start_speculation(speculator, name, ctx)
+        if hold is not None:
+            holds["hold"] = hold
+        _prefetch_rules(agents, name, ctx)
+
+    try:
+        for name in STAGE_DEPS:
+            tasks[name] = asyncio.create_task(run(name))
+        await asyncio.gather(*tasks.values())
+    finally:
+        # Como no orquestrador; após um erro as etapas restantes são canceladas antes de resolver a reserva
+        for task in tasks.values():
+            task.cancel()
+        _settle_speculation(speculator, holds.get("hold"), ctx)
+        spans = end_trace(trace)
+        unbind_protocol(latency_scope)
+    return _result(ctx, {name: timings[name] for name in STAGE_DEPS if name in timings}, spans, audit)
@@ -0,0 +1,176 @@
+# app/speculation.py
+"""
+Reserva especulativa de estoque, sobreposta a OCR/visão e rules.
+
+Assim que a etapa document termina, o item do pedido (extracted_order.items ou, na falta, os dados
+do portal já cacheados por dados_protocolo_cached) recebe em segundo plano uma reserva provisória
+com ttl_s. Quando o orquestrador chega à etapa inventory:
+- hit: o código extraído pelo OCR confere com o item reservado e a reserva vira a saída da etapa,
+  sem chamar o Inventory agent;
+- miss: o código diverge (ou a reserva falhou): a reserva é liberada e o agente roda normalmente.
+Ao fim do protocolo, a reserva usada é confirmada se a decisão consome estoque (STOCK_DECISIONS)
+e liberada nos demais casos (inelegível, crédito, escalado...). Se o processo cair no meio do
+caminho, a reserva expira sozinha pelo ttl_s.
+"""
+from typing import Dict, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+
+from app.telemetry import metrics
+from app.tools.inventory_api import ReservationService, reservations
+from app.tools.protocol_cache import dados_protocolo_cached
+
+logger = logging.getLogger(__name__)
+
+SPECULATIVE_INVENTORY = os.getenv("SPECULATIVE_INVENTORY", "0") == "1"
+SPECULATIVE_HOLD_TTL_S = float(os.getenv("SPECULATIVE_HOLD_TTL_S", "120"))
+SPECULATIVE_WORKERS = int(os.getenv("SPECULATIVE_WORKERS", "32"))
+
+# Decisões que consomem o estoque reservado (a reserva é confirmada)
+STOCK_DECISIONS = ("aprovado", "aprovado_com_condicoes")
+
+# Confiança informada na saída da etapa inventory quando vem da reserva especulativa
+SPECULATIVE_CONFIDENCE = 0.95
+
+
+class SpeculativeHold:
+    __slots__ = ("protocol_id", "future", "outcome")
+
+    def __init__(self, protocol_id: str, future: Future):
+        self.protocol_id = protocol_id
+        self.future = future
+        self.outcome = None  # "hit" | "miss"; None enquanto a etapa inventory não rodou
+
+
+def _order_item(document, protocol_id: str) -> Optional[str]:
+    item = document.first_item if hasattr(document, "first_item") else {}
+    item_id = item.get("id_item_pedido")
+    if item_id:
+        return item_id
+    items = (dados_protocolo_cached(protocol_id).get("order") or {}).get("items") or []
+    return items[0].get("id_item_pedido") if items else None
+
+
+class InventorySpeculator:
+    def __init__(self, service: ReservationService = reservations, ttl_s: float = SPECULATIVE_HOLD_TTL_S,
+                 workers: int = SPECULATIVE_WORKERS):
+        self.service = service
+        self.ttl_s = ttl_s
+        self.workers = workers
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._counters = {"started": 0, "hits": 0, "misses": 0, "unused": 0, "failed": 0,
+                          "confirmed": 0, "released": 0, "wasted_holds": 0}
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="speculation")
+        return self._pool
+
+    def _count(self, key: str):
+        with self._lock:
+            self._counters[key] += 1
+
+    def _hold(self, protocol_id: str, idempotency_key: str, document) -> Optional[Dict]:
+        item_id = _order_item(document, protocol_id)
+        if not item_id:
+            return None
+        # Chave própria: num miss, o Inventory agent reserva o item certo com a chave do protocolo
+        result = self.service.check_and_reserve(item_id, 1, f"{idempotency_key}:speculative", self.ttl_s)
+        return {"id_item_pedido": item_id, "qty": 1, **result}
+
+    def start(self, ctx: Dict) -> SpeculativeHold:
+        """Dispara a reserva provisória do item do pedido em segundo plano."""
+        self._count("started")
+        context = contextvars.copy_context()
+        future = self._executor().submit(context.run, self._hold, ctx["protocol_id"], ctx["idempotency_key"],
+                                         ctx["document"])
+        return SpeculativeHold(ctx["protocol_id"], future)
+
+    def _held(self, future: Future) -> Optional[Dict]:
+        try:
+            return future.result()
+        except Exception as e:
+            logger.warning(f"Reserva especulativa falhou: {e}")
+            self._count("failed")
+            return None
+
+    def _match(self, hold: SpeculativeHold, held: Optional[Dict], id_item_pedido: Optional[str]) -> Optional[Dict]:
+        if held is None:
+            hold.outcome = "miss"
+            return None
+        if held["id_item_pedido"] != id_item_pedido:
+            logger.info(f"Reserva especulativa descartada ({hold.protocol_id}): "
+                        f"pedido {held['id_item_pedido']} x OCR {id_item_pedido}")
+            hold.outcome = "miss"
+            self._count("misses")
+            self._drop(held, wasted=True)
+            return None
+        hold.outcome = "hit"
+        self._count("hits")
+        return {
+            "id_item_pedido": held["id_item_pedido"],
+            "available": held["available"],
+            "reservation_id": held["reservation_id"],
+            "qty": held["qty"],
+            "confidence": SPECULATIVE_CONFIDENCE,
+            "speculative": True,
+        }
+
+    def resolve(self, hold: SpeculativeHold, id_item_pedido: Optional[str]) -> Optional[Dict]:
+        """Saída da etapa inventory a partir da reserva (hit) ou None (miss: rodar o agente)."""
+        return self._match(hold, self._held(hold.future), id_item_pedido)
+
+    async def aresolve(self, hold: SpeculativeHold, id_item_pedido: Optional[str]) -> Optional[Dict]:
+        try:
+            held = await asyncio.wrap_future(hold.future)
+        except Exception:
+            held = self._held(hold.future)
+        return self._match(hold, held, id_item_pedido)
+
+    def _drop(self, held: Dict, wasted: bool):
+        if held.get("reservation_id") and self.service.release(held["reservation_id"]):
+            self._count("wasted_holds" if wasted else "released")
+
+    def settle(self, hold: SpeculativeHold, decision: Optional[str]):
+        """Fim do protocolo: confirma a reserva usada se a decisão consome estoque; senão, libera."""
+        def finish(future: Future):
+            if hold.outcome == "miss":
+                return
+            held = self._held(future)
+            if held is None:
+                return
+            if hold.outcome is None:
+                # Etapa inventory não chegou a rodar (short-circuit) nem houve miss
+                self._count("unused")
+                self._drop(held, wasted=True)
+            elif decision in STOCK_DECISIONS and held.get("reservation_id"):
+                if self.service.confirm(held["reservation_id"]):
+                    self._count("confirmed")
+            else:
+                self._drop(held, wasted=False)
+
+        if hold.future.done():
+            finish(hold.future)
+        else:
+            hold.future.add_done_callback(finish)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._counters)
+        stats["hit_rate"] = round(stats["hits"] / stats["started"], 4) if stats["started"] else 0.0
+        return stats
+
+
+# Instância compartilhada pelo processo
+inventory_speculator = InventorySpeculator()
+if SPECULATIVE_INVENTORY:
+    # Taxa de acerto e reservas desperdiçadas em /stats e nas métricas exportadas
+    metrics.register_stats("inventory_speculation", inventory_speculator.stats)
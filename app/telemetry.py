@@ -0,0 +1,252 @@
+# app/telemetry.py
+"""
+Instrumentação leve: spans por etapa do orquestrador, por tool e por chamada de LLM.
+
+Cada span alimenta um histograma global (p50/p95/p99, exportável em texto Prometheus e JSON)
+e, quando há um protocolo em andamento, a lista de spans do protocolo (anexada ao audit).
+Com TELEMETRY_ENABLED=0, span() devolve um context manager vazio compartilhado.
+Componentes com stats() (caches, especulação...) se registram com metrics.register_stats: os
+contadores saem no JSON ("components") e como gauges no texto Prometheus.
+"""
+from typing import Callable, Dict, List, Optional, Sequence
+from collections import deque
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+
+TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "1") == "1"
+
+# Limites (segundos) dos buckets de latência
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Amostras recentes mantidas por histograma para o cálculo dos percentis
+RESERVOIR_SIZE = 2048
+
+
+class Histogram:
+    """Histograma com buckets cumulativos (formato Prometheus) e percentis sobre as amostras recentes."""
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS, reservoir: int = RESERVOIR_SIZE):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self._recent = deque(maxlen=reservoir)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, value)] += 1
+            self.total += 1
+            self.sum += value
+            self._recent.append(value)
+
+    def percentile(self, q: float) -> float:
+        with self._lock:
+            values = sorted(self._recent)
+        if not values:
+            return 0.0
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    def cumulative(self) -> List[tuple]:
+        with self._lock:
+            counts = list(self.counts)
+        acc, out = 0, []
+        for bound, count in zip(self.bounds + [float("inf")], counts):
+            acc += count
+            out.append((bound, acc))
+        return out
+
+    def snapshot(self) -> Dict:
+        return {
+            "count": self.total,
+            "sum": round(self.sum, 6),
+            "avg": round(self.sum / self.total, 6) if self.total else 0.0,
+            "p50": round(self.percentile(0.50), 6),
+            "p95": round(self.percentile(0.95), 6),
+            "p99": round(self.percentile(0.99), 6),
+            "buckets": {("+Inf" if b == float("inf") else str(b)): c for b, c in self.cumulative()},
+        }
+
+
+def _flat_stats(stats: Dict, prefix: str = "") -> List[tuple]:
+    """(nome, valor) dos valores numéricos de um stats(), com dicts aninhados em nomes pontuados."""
+    out = []
+    for key, value in stats.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            out += _flat_stats(value, f"{name}.")
+        elif isinstance(value, (int, float)):
+            out.append((name, int(value) if isinstance(value, bool) else value))
+    return out
+
+
+class MetricsRegistry:
+    """Histogramas de latência por (kind, name), contadores de tokens por modelo e stats() de componentes."""
+
+    def __init__(self):
+        self._histograms: Dict[tuple, Histogram] = {}
+        self._tokens: Dict[tuple, int] = {}
+        self._stats: Dict[str, Callable[[], Optional[Dict]]] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, kind: str, name: str, bounds: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        """Histograma de (kind, name); `bounds` só vale na criação (ex.: tamanhos de lote em vez de segundos)."""
+        key = (kind, name)
+        hist = self._histograms.get(key)
+        if hist is None:
+            with self._lock:
+                hist = self._histograms.get(key)
+                if hist is None:
+                    hist = self._histograms[key] = Histogram(bounds)
+        return hist
+
+    def add_tokens(self, model: str, kind: str, count: int):
+        with self._lock:
+            self._tokens[(model, kind)] = self._tokens.get((model, kind), 0) + count
+
+    def register_stats(self, component: str, stats: Callable[[], Optional[Dict]]):
+        """Publica o stats() de um componente; `stats` pode devolver None enquanto ele não existe."""
+        with self._lock:
+            self._stats[component] = stats
+
+    def component_stats(self) -> Dict:
+        with self._lock:
+            sources = dict(self._stats)
+        out = {}
+        for component, stats in sorted(sources.items()):
+            value = stats()
+            if value is not None:
+                out[component] = value
+        return out
+
+    def to_json(self) -> Dict:
+        with self._lock:
+            histograms = dict(self._histograms)
+            tokens = dict(self._tokens)
+        return {
+            "latency_seconds": {f"{kind}:{name}": hist.snapshot() for (kind, name), hist in sorted(histograms.items())},
+            "llm_tokens": {f"{model}:{kind}": count for (model, kind), count in sorted(tokens.items())},
+            "components": self.component_stats(),
+        }
+
+    def prometheus_text(self) -> str:
+        with self._lock:
+            histograms = dict(self._histograms)
+            tokens = dict(self._tokens)
+        lines = [
+            "# HELP orquestrador_latency_seconds Latência por etapa, tool e chamada de LLM (kind=vision_batch_size: imagens por lote).",
+            "# TYPE orquestrador_latency_seconds histogram",
+        ]
+        for (kind, name), hist in sorted(histograms.items()):
+            labels = f'kind="{kind}",name="{name}"'
+            for bound, count in hist.cumulative():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'orquestrador_latency_seconds_bucket{{{labels},le="{le}"}} {count}')
+            lines.append(f"orquestrador_latency_seconds_sum{{{labels}}} {hist.sum:.6f}")
+            lines.append(f"orquestrador_latency_seconds_count{{{labels}}} {hist.total}")
+        lines += [
+            "# HELP orquestrador_llm_tokens_total Tokens consumidos nas chamadas de LLM.",
+            "# TYPE orquestrador_llm_tokens_total counter",
+        ]
+        for (model, kind), count in sorted(tokens.items()):
+            lines.append(f'orquestrador_llm_tokens_total{{model="{model}",type="{kind}"}} {count}')
+        lines += [
+            "# HELP orquestrador_component_stat Contadores e taxas dos componentes (stats()).",
+            "# TYPE orquestrador_component_stat gauge",
+        ]
+        for component, stats in self.component_stats().items():
+            for name, value in _flat_stats(stats):
+                lines.append(f'orquestrador_component_stat{{component="{component}",stat="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+# Spans do protocolo em andamento (propagado para tasks asyncio e asyncio.to_thread)
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("orquestrador_trace", default=None)
+
+
+class _Trace:
+    __slots__ = ("t0", "spans")
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.spans: List[Dict] = []
+
+
+def start_trace():
+    """Inicia a coleta de spans do protocolo no contexto atual; devolve o token para end_trace."""
+    if not TELEMETRY_ENABLED:
+        return None
+    return _current_trace.set(_Trace())
+
+
+def end_trace(token) -> List[Dict]:
+    """Encerra a coleta e devolve os spans do protocolo."""
+    if token is None:
+        return []
+    trace = _current_trace.get()
+    _current_trace.reset(token)
+    return trace.spans if trace is not None else []
+
+
+def record(kind: str, name: str, start: float, duration: float, **attrs):
+    """Registra um span já medido (start em perf_counter)."""
+    metrics.histogram(kind, name).observe(duration)
+    trace = _current_trace.get()
+    if trace is not None:
+        span_data = {"kind": kind, "name": name, "start": round(start - trace.t0, 4), "duration": round(duration, 4)}
+        if attrs:
+            span_data.update(attrs)
+        trace.spans.append(span_data)
+
+
+class _Span:
+    __slots__ = ("kind", "name", "start")
+
+    def __init__(self, kind: str, name: str):
+        self.kind = kind
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.kind, self.name, self.start, time.perf_counter() - self.start,
+               **({"error": exc_type.__name__} if exc_type is not None else {}))
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(kind: str, name: str):
+    """Context manager que mede o bloco como um span (kind: stage, tool, llm...)."""
+    return _Span(kind, name) if TELEMETRY_ENABLED else _NOOP
+
+
+def component_stats() -> Dict:
+    """stats() dos componentes registrados em metrics.register_stats."""
+    return metrics.component_stats()
+
+
+def export_metrics(fmt: str = "json") -> str:
+    """Métricas agregadas em "json" ou "prometheus"."""
+    if fmt == "prometheus":
+        return metrics.prometheus_text()
+    return json.dumps(metrics.to_json(), ensure_ascii=False)
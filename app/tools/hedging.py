@@ -0,0 +1,137 @@
+# app/tools/hedging.py
+"""
+Hedging de leituras idempotentes: se a chamada não responde até o p95 observado da tool,
+uma segunda chamada igual é disparada e vale a primeira resposta bem-sucedida.
+
+Só para tools remotas sem efeito colateral (portal, consulta de regras). OCR e visão ficam de fora:
+rodam no pool de processos local (image_executor), onde um segundo pedido só disputaria o mesmo
+CPU com o primeiro e o prazo do protocolo não chega ao processo filho. O atraso vem das
+latências recentes da própria tool (mínimo HEDGE_MIN_DELAY_S); até HEDGE_MIN_SAMPLES amostras
+não há hedge. As chamadas rodam num pool próprio com o contexto do chamador (trace e prazo).
+"""
+from typing import Callable, Dict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import contextvars
+import functools
+import os
+import threading
+import time
+
+from app.deadlines import DeadlineExceeded, time_left
+from app.telemetry import Histogram
+
+HEDGING_ENABLED = os.getenv("HEDGING_ENABLED", "1") == "1"
+HEDGE_QUANTILE = float(os.getenv("HEDGE_QUANTILE", "0.95"))
+HEDGE_MIN_DELAY_S = float(os.getenv("HEDGE_MIN_DELAY_S", "0.005"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_WORKERS = int(os.getenv("HEDGE_WORKERS", "128"))
+
+
+class Hedger:
+    def __init__(self, enabled: bool = HEDGING_ENABLED, quantile: float = HEDGE_QUANTILE,
+                 min_delay_s: float = HEDGE_MIN_DELAY_S, min_samples: int = HEDGE_MIN_SAMPLES,
+                 workers: int = HEDGE_WORKERS):
+        self.enabled = enabled
+        self.quantile = quantile
+        self.min_delay_s = min_delay_s
+        self.min_samples = min_samples
+        self.workers = workers
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._latency: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="hedge")
+        return self._pool
+
+    def _stats_for(self, name: str):
+        with self._lock:
+            if name not in self._latency:
+                self._latency[name] = Histogram()
+                self._counters[name] = {"calls": 0, "hedged": 0, "hedge_wins": 0, "errors": 0}
+            return self._latency[name], self._counters[name]
+
+    def delay(self, name: str):
+        """Atraso do hedge para a tool; None enquanto não há amostras suficientes."""
+        latency, _ = self._stats_for(name)
+        if latency.total < self.min_samples:
+            return None
+        return max(self.min_delay_s, latency.percentile(self.quantile))
+
+    def _submit(self, latency: Histogram, fn: Callable, args, kwargs):
+        # Latência de cada pedido, inclusive do perdedor, para o p95 não cair por causa do próprio hedge
+        context = contextvars.copy_context()
+        started = time.perf_counter()
+        future = self._executor().submit(context.run, fn, *args, **kwargs)
+        future.add_done_callback(lambda f: latency.observe(time.perf_counter() - started))
+        return future
+
+    def call(self, name: str, fn: Callable, *args, **kwargs):
+        latency, counters = self._stats_for(name)
+        delay = self.delay(name) if self.enabled else None
+        left = time_left()
+        if delay is None or (left is not None and left <= delay):
+            # Sem histórico ou sem prazo para um segundo pedido: chamada direta
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                latency.observe(time.perf_counter() - t0)
+                with self._lock:
+                    counters["calls"] += 1
+
+        primary = self._submit(latency, fn, args, kwargs)
+        futures = [primary]
+        done, _ = wait(futures, timeout=delay)
+        if not done:
+            futures.append(self._submit(latency, fn, args, kwargs))
+        pending = set(futures)
+        error = None
+        while pending:
+            left = time_left()
+            done, pending = wait(pending, timeout=left if left is None else max(left, 0), return_when=FIRST_COMPLETED)
+            if not done:
+                raise DeadlineExceeded(f"Prazo excedido aguardando {name}")
+            for future in done:
+                if future.exception() is None:
+                    with self._lock:
+                        counters["calls"] += 1
+                        counters["hedged"] += len(futures) > 1
+                        counters["hedge_wins"] += future is not primary
+                    return future.result()
+                error = future.exception()
+        with self._lock:
+            counters["calls"] += 1
+            counters["hedged"] += len(futures) > 1
+            counters["errors"] += 1
+        raise error
+
+    def stats(self) -> Dict:
+        with self._lock:
+            names = list(self._counters)
+        report = {}
+        for name in names:
+            latency, counters = self._stats_for(name)
+            delay = self.delay(name)
+            report[name] = {**counters, "hedge_delay_s": round(delay, 4) if delay is not None else None,
+                            "p95_s": round(latency.percentile(0.95), 4)}
+        return report
+
+
+hedger = Hedger()
+
+
+def hedged(name: str):
+    """Decorator para leituras idempotentes: `@hedged("portal")`."""
+    def decorator(fn: Callable):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return hedger.call(name, fn, *args, **kwargs)
+        wrapper.unhedged = fn
+        return wrapper
+    return decorator
@@ -0,0 +1,138 @@
+# app/tools/image_executor.py
+from typing import Dict, Optional
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+import copy
+import hashlib
+import mmap
+import multiprocessing
+import os
+import threading
+
+from app.tools.ocr_extract_text import ocr_extract_text
+from app.tools.vision_service import classify_damage
+from app.tools.vision_batcher import VisionBatcher
+
+IMAGE_EXECUTOR_WORKERS = int(os.getenv("IMAGE_EXECUTOR_WORKERS", str(os.cpu_count() or 1)))
+IMAGE_CACHE_MAX_ENTRIES = int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "4096"))
+# Com batching, a visão é agrupada pelo VisionBatcher e cada lote roda no pool de processos
+VISION_BATCHING = os.getenv("VISION_BATCHING", "1") == "1"
+
+_TASKS = {
+    "ocr": ocr_extract_text,
+    "vision": classify_damage,
+}
+
+
+def content_key(path: str) -> str:
+    """Hash do conteúdo da imagem (lida via mmap); caminhos inexistentes (mocks) usam o próprio caminho."""
+    try:
+        if os.path.getsize(path) == 0:
+            return "empty"
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return hashlib.blake2b(mm, digest_size=20).hexdigest()
+    except (OSError, TypeError, ValueError):
+        return f"path:{path}"
+
+
+def _run_task(kind: str, path: str) -> Dict:
+    # Só o caminho trafega entre processos: a tool abre a imagem no próprio worker
+    return _TASKS[kind](path)
+
+
+class ImageExecutor:
+    """
+    Executa OCR e visão em um pool de processos e cacheia o resultado pelo hash do conteúdo
+    da imagem: reenvios da mesma nota/foto retornam sem reprocessar. Pedidos concorrentes da
+    mesma imagem compartilham o mesmo Future. Com `vision_batcher`, as classificações de
+    dano que não estão no cache são agrupadas em lotes.
+    """
+
+    def __init__(self, max_workers: int = IMAGE_EXECUTOR_WORKERS, cache_size: int = IMAGE_CACHE_MAX_ENTRIES,
+                 vision_batcher: Optional[VisionBatcher] = None):
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self.vision_batcher = vision_batcher
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._cache: "OrderedDict[tuple, Dict]" = OrderedDict()
+        self._inflight: Dict[tuple, Future] = {}
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "shared": 0}
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    # spawn: seguro mesmo com threads ativas no processo principal
+                    self._pool = ProcessPoolExecutor(self.max_workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def pool_submit(self, fn, *args) -> Future:
+        """Envia `fn(*args)` ao pool de processos (usado como submit_fn do VisionBatcher)."""
+        return self._get_pool().submit(fn, *args)
+
+    def submit(self, kind: str, path: str) -> Future:
+        key = (kind, content_key(path))
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self._counters["hits"] += 1
+                future = Future()
+                future.set_result(self._cache[key])
+                return future
+            if key in self._inflight:
+                self._counters["shared"] += 1
+                return self._inflight[key]
+            self._counters["misses"] += 1
+            if kind == "vision" and self.vision_batcher is not None:
+                future = self.vision_batcher.submit(path)
+            else:
+                future = self._get_pool().submit(_run_task, kind, path)
+            self._inflight[key] = future
+
+        future.add_done_callback(lambda f: self._done(key, f))
+        return future
+
+    def _done(self, key: tuple, future: Future):
+        with self._lock:
+            self._inflight.pop(key, None)
+            if future.cancelled() or future.exception() is not None:
+                return
+            self._cache[key] = future.result()
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def ocr(self, path: str) -> Dict:
+        return copy.deepcopy(self.submit("ocr", path).result())
+
+    def vision(self, path: str) -> Dict:
+        return copy.deepcopy(self.submit("vision", path).result())
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self._counters, "cached": len(self._cache), "inflight": len(self._inflight),
+                    "workers": self.max_workers}
+
+    def shutdown(self, wait: bool = True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+
+
+_executor: Optional[ImageExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_image_executor() -> ImageExecutor:
+    """Executor compartilhado do processo (o pool só é criado no primeiro uso)."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                executor = ImageExecutor()
+                if VISION_BATCHING:
+                    executor.vision_batcher = VisionBatcher(submit_fn=executor.pool_submit)
+                _executor = executor
+    return _executor
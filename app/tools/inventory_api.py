@@ -1,16 +1,161 @@
 # app/tools/inventory_api.py
-from typing import Dict
+from typing import Dict, Iterable, List, Optional
+import threading
 import time
 import uuid
 
+from app.tools.latency import simulate_latency
+
 _STOCK = {"AAA111": 3, "BBB222": 0}
 
-def check_and_reserve(id_item_pedido: str, qty: int, idempotency_key: str) -> Dict:
-    time.sleep(0.15)
-    avail = _STOCK.get(id_item_pedido, 0)
-    if avail >= qty:
-        _STOCK[id_item_pedido] = avail - qty
-        reservation_id = str(uuid.uuid4())
-        return {"available": True, "reservation_id": reservation_id}
-    else:
-        return {"available": False, "reservation_id": None}
+
+
+class ReservationService:
+    """
+    Reservas de estoque seguras para uso concorrente.
+
+    - Lock striping por SKU: reservas de SKUs diferentes não disputam o mesmo lock.
+    - Tabela de idempotência: repetir a mesma idempotency_key devolve a reserva original.
+    - Reservas com ttl_s expiram e devolvem o estoque; release() devolve explicitamente.
+    """
+
+    def __init__(self, stock: Optional[Dict[str, int]] = None, stripes: int = 64,
+                 latency_s: Optional[float] = None, clock=time.monotonic):
+        self._stock = _STOCK if stock is None else stock
+        self._sku_locks = [threading.Lock() for _ in range(stripes)]
+        self._key_locks = [threading.Lock() for _ in range(stripes)]
+        self._latency_s = latency_s
+        self._clock = clock
+        self._idempotency: Dict[str, Dict] = {}
+        self._held: Dict[str, Dict[str, Dict]] = {}  # sku -> reservation_id -> reserva
+        self._by_id: Dict[str, Dict] = {}
+
+    def _round_trip(self):
+        """Latência simulada de uma chamada à API de estoque (uma por round trip, não por item)."""
+        if self._latency_s is None:
+            simulate_latency("inventory")
+        elif self._latency_s > 0:
+            time.sleep(self._latency_s)
+
+    def _sku_lock(self, sku: str) -> threading.Lock:
+        return self._sku_locks[hash(sku) % len(self._sku_locks)]
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        return self._key_locks[hash(key) % len(self._key_locks)]
+
+    def _expire_locked(self, sku: str):
+        """Devolve ao estoque as reservas expiradas do SKU (chamar com o lock do SKU)."""
+        held = self._held.get(sku)
+        if not held:
+            return
+        now = self._clock()
+        for reservation_id in [r for r, res in held.items() if res["expires_at"] is not None and res["expires_at"] <= now]:
+            self._drop_locked(held.pop(reservation_id), "expirada")
+
+    def _drop_locked(self, reservation: Dict, status: str):
+        self._stock[reservation["id_item_pedido"]] = self._stock.get(reservation["id_item_pedido"], 0) + reservation["qty"]
+        reservation["status"] = status
+        self._by_id.pop(reservation["reservation_id"], None)
+        self._idempotency.pop(reservation["idempotency_key"], None)
+
+    def _reserve(self, id_item_pedido: str, qty: int, idempotency_key: str, ttl_s: Optional[float]) -> Dict:
+        # Ordem fixa dos locks (chave -> SKU) evita deadlock
+        with self._key_lock(idempotency_key):
+            previous = self._idempotency.get(idempotency_key)
+            if previous is not None:
+                return {**previous, "replayed": True}
+
+            with self._sku_lock(id_item_pedido):
+                self._expire_locked(id_item_pedido)
+                avail = self._stock.get(id_item_pedido, 0)
+                if avail < qty:
+                    # Sem efeito colateral: não precisa entrar na tabela de idempotência
+                    return {"available": False, "reservation_id": None}
+
+                self._stock[id_item_pedido] = avail - qty
+                reservation = {
+                    "reservation_id": str(uuid.uuid4()),
+                    "id_item_pedido": id_item_pedido,
+                    "qty": qty,
+                    "idempotency_key": idempotency_key,
+                    "expires_at": self._clock() + ttl_s if ttl_s is not None else None,
+                    "status": "reservada",
+                }
+                self._held.setdefault(id_item_pedido, {})[reservation["reservation_id"]] = reservation
+                self._by_id[reservation["reservation_id"]] = reservation
+
+            result = {"available": True, "reservation_id": reservation["reservation_id"]}
+            self._idempotency[idempotency_key] = result
+            return result
+
+    def check_and_reserve(self, id_item_pedido: str, qty: int, idempotency_key: str,
+                          ttl_s: Optional[float] = None) -> Dict:
+        self._round_trip()
+        return self._reserve(id_item_pedido, qty, idempotency_key, ttl_s)
+
+    def check_and_reserve_many(self, requests: Iterable[Dict], ttl_s: Optional[float] = None) -> List[Dict]:
+        """
+        Reserva itens de vários protocolos em um único round trip.
+        Cada requisição: {"id_item_pedido", "qty", "idempotency_key"}; resultados na mesma ordem.
+        """
+        self._round_trip()
+        return [
+            {"id_item_pedido": r["id_item_pedido"],
+             **self._reserve(r["id_item_pedido"], r.get("qty", 1), r["idempotency_key"], ttl_s)}
+            for r in requests
+        ]
+
+    def release(self, reservation_id: str) -> bool:
+        """Cancela a reserva e devolve o estoque. Retorna False se ela não existe mais."""
+        reservation = self._by_id.get(reservation_id)
+        if reservation is None:
+            return False
+        sku = reservation["id_item_pedido"]
+        with self._sku_lock(sku):
+            held = self._held.get(sku, {})
+            if held.pop(reservation_id, None) is None:
+                return False
+            self._drop_locked(reservation, "liberada")
+        return True
+
+    def confirm(self, reservation_id: str) -> bool:
+        """Torna a reserva definitiva (deixa de expirar)."""
+        reservation = self._by_id.get(reservation_id)
+        if reservation is None:
+            return False
+        with self._sku_lock(reservation["id_item_pedido"]):
+            if reservation["status"] != "reservada":
+                return False
+            reservation["expires_at"] = None
+        return True
+
+    def expire_all(self) -> None:
+        """Varre todos os SKUs devolvendo reservas expiradas."""
+        for sku in list(self._held):
+            with self._sku_lock(sku):
+                self._expire_locked(sku)
+
+    def available(self, id_item_pedido: str) -> int:
+        with self._sku_lock(id_item_pedido):
+            self._expire_locked(id_item_pedido)
+            return self._stock.get(id_item_pedido, 0)
+
+
+# Instância compartilhada pelo processo
+reservations = ReservationService()
+
+
+def check_and_reserve(id_item_pedido: str, qty: int, idempotency_key: str, ttl_s: Optional[float] = None) -> Dict:
+    return reservations.check_and_reserve(id_item_pedido, qty, idempotency_key, ttl_s)
+
+
+def check_and_reserve_many(requests: Iterable[Dict], ttl_s: Optional[float] = None) -> List[Dict]:
+    return reservations.check_and_reserve_many(requests, ttl_s)
+
+
+def release_reservation(reservation_id: str) -> bool:
+    return reservations.release(reservation_id)
+
+
+def confirm_reservation(reservation_id: str) -> bool:
+    return reservations.confirm(reservation_id)
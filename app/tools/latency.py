@@ -0,0 +1,103 @@
+# app/tools/latency.py
+"""
+Latência simulada das tools mockadas (portal, OCR, visão, regras, estoque, operações).
+
+Por padrão cada tool dorme um valor fixo; para benchmarks é possível configurar, por tool,
+distribuições lognormais, picos de cauda e injeção de erros, com semente reprodutível:
+
+    configure({"portal": {"dist": "lognormal", "median": 0.2, "sigma": 0.5,
+                          "tail_prob": 0.01, "tail_factor": 10, "error_rate": 0.005}}, seed=42)
+
+Com semente, dentro de um protocolo (bind_protocol, chamado pelo orquestrador) o sorteio de cada
+chamada é derivado de (seed, tool, protocol_id, n-ésima chamada da tool no protocolo): o
+resultado não depende da ordem em que as threads concorrentes chegam ao gerador.
+"""
+from contextlib import nullcontext
+from typing import Dict, Optional
+import contextvars
+import itertools
+import math
+import random
+import threading
+import time
+
+from app.deadlines import DeadlineExceeded, time_left
+
+DEFAULT_LATENCY_S = {
+    "portal": 0.2,
+    "ocr": 0.3,
+    "vision": 0.2,
+    "rules": 0.1,
+    "inventory": 0.15,
+    "operations": 0.2,
+}
+
+
+class SimulatedToolError(RuntimeError):
+    """Erro injetado pela simulação (error_rate)."""
+
+
+_profile: Dict[str, Dict] = {}
+_seed: Optional[int] = None
+_rng = random.Random()
+_lock = threading.Lock()
+# (protocol_id, contadores de chamadas por tool) do protocolo em andamento
+_scope: contextvars.ContextVar = contextvars.ContextVar("latency_scope", default=None)
+
+
+def configure(profile: Optional[Dict[str, Dict]] = None, seed: Optional[int] = None):
+    """Define a distribuição de latência por tool (as ausentes usam DEFAULT_LATENCY_S) e a semente."""
+    global _profile, _seed
+    with _lock:
+        _profile = dict(profile or {})
+        _seed = seed
+        _rng.seed(seed)
+
+
+def bind_protocol(protocol_id: str) -> contextvars.Token:
+    """Associa as próximas chamadas deste contexto (e das threads que o copiam) ao protocolo."""
+    return _scope.set((protocol_id, {}))
+
+
+def unbind_protocol(token: contextvars.Token):
+    _scope.reset(token)
+
+
+def _generator(tool: str):
+    """(gerador, lock): derivado do protocolo quando há semente e protocolo associado; senão o compartilhado."""
+    scope = _scope.get()
+    if _seed is None or scope is None:
+        return _rng, _lock
+    protocol_id, counters = scope
+    n = next(counters.setdefault(tool, itertools.count()))
+    return random.Random(f"{_seed}:{tool}:{protocol_id}:{n}"), nullcontext()
+
+
+def sample(tool: str) -> float:
+    """Sorteia a latência de uma chamada; levanta SimulatedToolError conforme error_rate."""
+    spec = _profile.get(tool)
+    if spec is None:
+        return DEFAULT_LATENCY_S.get(tool, 0.0)
+
+    rng, lock = _generator(tool)
+    with lock:
+        if spec.get("error_rate") and rng.random() < spec["error_rate"]:
+            raise SimulatedToolError(f"Falha simulada em {tool}")
+        if spec.get("dist") == "lognormal":
+            delay = rng.lognormvariate(math.log(spec["median"]), spec.get("sigma", 0.5))
+        else:
+            delay = spec.get("value", DEFAULT_LATENCY_S.get(tool, 0.0))
+        if spec.get("tail_prob") and rng.random() < spec["tail_prob"]:
+            delay *= spec.get("tail_factor", 10)
+    return delay
+
+
+def simulate_latency(tool: str, extra_s: float = 0.0):
+    """Dorme a latência sorteada; se ela passar do prazo da etapa, dorme só até o prazo e levanta DeadlineExceeded."""
+    delay = sample(tool) + extra_s
+    left = time_left()
+    if left is not None and delay > left:
+        time.sleep(max(left, 0.0))
+        raise DeadlineExceeded(f"Prazo excedido em {tool}")
+    if delay > 0:
+        time.sleep(delay)
@@ -1,12 +1,13 @@
 from typing import Dict
-import time
+
+from app.tools.latency import simulate_latency
 
 def ocr_extract_text(image_path: str) -> Dict:
     """
     Mock OCR: retorna campos extraídos da nota.
     Substituir pela integração (Tesseract, Google Vision, Textract, etc).
     """
-    time.sleep(0.3)
+    simulate_latency("ocr")
     return {
         "raw_text": "Nota fiscal ... ID_ITEM_PEDIDO: AAA111 Quantidade: 1 Valor: 199.90 Data: 2025-09-01",
         "extracted": {
@@ -0,0 +1,211 @@
+# app/tools/policy_index.py
+"""
+Índice FAISS de cláusulas das políticas (garantia, trocas, manuais internos).
+
+Uso offline (gera o índice em disco):
+    python -m app.tools.policy_index build <pasta_com_politicas> <pasta_do_indice>
+
+Em tempo de execução o índice é aberto com memory-map (POLICY_INDEX_PATH), de modo que
+vários processos workers compartilham a mesma cópia em page cache. O texto das cláusulas não
+é carregado: só as cláusulas retornadas são lidas do JSONL, pelos offsets (também em memory-map).
+"""
+from typing import Callable, Dict, List, Optional, Sequence
+import json
+import os
+import re
+import sys
+import threading
+import zlib
+
+POLICY_INDEX_PATH = os.getenv("POLICY_INDEX_PATH")
+POLICY_TOP_K = int(os.getenv("POLICY_TOP_K", "3"))
+
+INDEX_FILE = "index.faiss"
+CLAUSES_FILE = "clauses.jsonl"
+OFFSETS_FILE = "clauses.offsets.npy"
+META_FILE = "meta.json"
+
+EMBEDDING_DIM = 256
+
+# Função de embedding plugável: recebe textos e devolve matriz float32 (n, dim) normalizada.
+EmbedFn = Callable[[Sequence[str]], "object"]
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def hash_embedding(texts: Sequence[str], dim: int = EMBEDDING_DIM):
+    """
+    Embedding local e determinístico (feature hashing de palavras e bigramas).
+    Não depende de rede nem de modelo; pode ser trocado por qualquer EmbedFn.
+    """
+    import numpy as np
+
+    vectors = np.zeros((len(texts), dim), dtype="float32")
+    for row, text in enumerate(texts):
+        tokens = _TOKEN_RE.findall(text.lower())
+        for feature in tokens + [a + " " + b for a, b in zip(tokens, tokens[1:])]:
+            h = zlib.crc32(feature.encode("utf-8"))
+            vectors[row, h % dim] += 1.0 if h & 0x80000000 else -1.0
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def chunk_text(text: str, max_chars: int = 600) -> List[str]:
+    """Quebra o documento em cláusulas por parágrafo, agrupando parágrafos curtos até max_chars."""
+    chunks, current = [], ""
+    for paragraph in (p.strip() for p in re.split(r"\n\s*\n", text)):
+        if not paragraph:
+            continue
+        if current and len(current) + len(paragraph) + 1 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n{paragraph}" if current else paragraph
+        while len(current) > max_chars:
+            chunks.append(current[:max_chars])
+            current = current[max_chars:]
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def build_index(docs_dir: str, out_dir: str, embed: EmbedFn = hash_embedding, max_chars: int = 600) -> Dict:
+    """Lê as políticas (.md/.txt), quebra em cláusulas, gera embeddings e grava o índice em out_dir."""
+    clauses = []
+    for name in sorted(os.listdir(docs_dir)):
+        if not name.endswith((".md", ".txt")):
+            continue
+        doc = os.path.splitext(name)[0]
+        with open(os.path.join(docs_dir, name), encoding="utf-8") as f:
+            for n, chunk in enumerate(chunk_text(f.read(), max_chars), start=1):
+                clauses.append({"clause_id": f"{doc}#{n}", "doc": doc, "text": chunk})
+
+    if not clauses:
+        raise ValueError(f"Nenhuma política (.md/.txt) encontrada em {docs_dir}")
+    return write_index(clauses, out_dir, embed)
+
+
+def _line_offsets(lines) -> List[int]:
+    """Offset em bytes do início de cada linha, mais o fim do arquivo (linha i = offsets[i]:offsets[i + 1])."""
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+    return offsets
+
+
+def _write_offsets(path: str, offsets: List[int]):
+    import numpy as np
+
+    np.save(path, np.asarray(offsets, dtype="<u8"))
+
+
+def write_index(clauses: List[Dict], out_dir: str, embed: EmbedFn = hash_embedding) -> Dict:
+    """Gera os embeddings das cláusulas ({"clause_id", "doc", "text"}) e grava índice, offsets e metadados."""
+    import faiss
+
+    vectors = embed([c["text"] for c in clauses])
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(vectors)
+
+    os.makedirs(out_dir, exist_ok=True)
+    faiss.write_index(index, os.path.join(out_dir, INDEX_FILE))
+    lines = [(json.dumps(clause, ensure_ascii=False) + "\n").encode("utf-8") for clause in clauses]
+    with open(os.path.join(out_dir, CLAUSES_FILE), "wb") as f:
+        f.writelines(lines)
+    _write_offsets(os.path.join(out_dir, OFFSETS_FILE), _line_offsets(lines))
+    meta = {"dim": int(vectors.shape[1]), "size": len(clauses), "embedding": getattr(embed, "__name__", "custom")}
+    with open(os.path.join(out_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return meta
+
+
+class PolicyIndex:
+    """
+    Índice de cláusulas carregado do disco (memory-mapped por padrão).
+    `embed` precisa ser o mesmo usado em write_index (nome e dimensão são conferidos com meta.json).
+    """
+
+    def __init__(self, path: str, embed: EmbedFn = hash_embedding, mmap: bool = True):
+        import faiss
+        import numpy as np
+
+        flags = 0
+        if mmap:
+            # IO_FLAG_MMAP_IFC (faiss >= 1.8) mapeia os vetores sem cópia para a memória do processo
+            flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+        self.index = faiss.read_index(os.path.join(path, INDEX_FILE), flags)
+        self.embed = embed
+        self._check_meta(path)
+
+        offsets_path = os.path.join(path, OFFSETS_FILE)
+        if os.path.exists(offsets_path):
+            self._offsets = np.load(offsets_path, mmap_mode="r" if mmap else None)
+        else:
+            # Índice gerado antes dos offsets (a pasta pode ser só leitura): calcula em memória, sem os textos
+            with open(os.path.join(path, CLAUSES_FILE), "rb") as f:
+                self._offsets = np.asarray(_line_offsets(f), dtype="<u8")
+        if len(self._offsets) != self.index.ntotal + 1:
+            raise ValueError(f"{OFFSETS_FILE} tem {len(self._offsets) - 1} cláusulas e o índice {self.index.ntotal}")
+        self._clauses = open(os.path.join(path, CLAUSES_FILE), "rb")
+        self._read_lock = threading.Lock()
+
+    def _check_meta(self, path: str):
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        name = getattr(self.embed, "__name__", "custom")
+        if meta.get("embedding") != name:
+            raise ValueError(f"Índice em {path} gerado com o embedding {meta.get('embedding')!r}, não {name!r}")
+        dim = self.embed([""]).shape[1]
+        if meta.get("dim") != dim or self.index.d != dim:
+            raise ValueError(f"Índice em {path} tem dimensão {meta.get('dim')} (faiss: {self.index.d}), "
+                             f"o embedding {name!r} gera {dim}")
+
+    def __len__(self):
+        return self.index.ntotal
+
+    def clause(self, i: int) -> Dict:
+        """Cláusula i, lida do JSONL pelo offset."""
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        with self._read_lock:
+            self._clauses.seek(start)
+            line = self._clauses.read(end - start)
+        return json.loads(line)
+
+    def search(self, query: str, k: int = POLICY_TOP_K) -> List[Dict]:
+        """Top-k cláusulas mais relevantes, com clause_id para citação."""
+        scores, ids = self.index.search(self.embed([query]), k)
+        return [
+            {**self.clause(int(i)), "score": round(float(score), 4)}
+            for score, i in zip(scores[0], ids[0]) if i >= 0
+        ]
+
+
+_index: Optional[PolicyIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_policy_index() -> Optional[PolicyIndex]:
+    """Índice compartilhado do processo, ou None se POLICY_INDEX_PATH não estiver configurado."""
+    global _index
+    if _index is None and POLICY_INDEX_PATH:
+        with _index_lock:
+            if _index is None:
+                _index = PolicyIndex(POLICY_INDEX_PATH)
+    return _index
+
+
+def search_policy_clauses(query: str, k: int = POLICY_TOP_K) -> List[Dict]:
+    index = get_policy_index()
+    return index.search(query, k) if index is not None else []
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "build":
+        print(json.dumps(build_index(sys.argv[2], sys.argv[3])))
+    elif len(sys.argv) == 4 and sys.argv[1] == "query":
+        for clause in PolicyIndex(sys.argv[2]).search(sys.argv[3]):
+            print(json.dumps(clause, ensure_ascii=False))
+    else:
+        print("uso: python -m app.tools.policy_index build <pasta_politicas> <pasta_indice>\n"
+              "     python -m app.tools.policy_index query <pasta_indice> <texto>")
+        sys.exit(2)
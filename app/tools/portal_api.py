@@ -1,13 +1,50 @@
 # app/tools/portal_api.py
 from typing import Dict
-import time
+import os
+import threading
 
+from app.deadlines import time_left
+from app.tools.hedging import hedged
+from app.tools.latency import simulate_latency
+
+# Quando definida, as chamadas vão para o portal real através de um cliente HTTP com pool de conexões.
+PORTAL_API_URL = os.getenv("PORTAL_API_URL")
+PORTAL_API_TIMEOUT = float(os.getenv("PORTAL_API_TIMEOUT", "5"))
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _http_client():
+    """Cliente HTTP compartilhado (keep-alive) criado sob demanda."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import httpx
+
+                _client = httpx.Client(
+                    base_url=PORTAL_API_URL,
+                    timeout=PORTAL_API_TIMEOUT,
+                    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+                )
+    return _client
+
+
+@hedged("portal")
 def dados_protocolo(protocol_id: str) -> Dict:
     """
     Mock Portal API: Retorna dados do protocolo (cliente, order, anexos).
     """
+    if PORTAL_API_URL:
+        left = time_left()
+        timeout = PORTAL_API_TIMEOUT if left is None else max(0.0, min(PORTAL_API_TIMEOUT, left))
+        resp = _http_client().get(f"/protocolos/{protocol_id}", timeout=timeout)
+        resp.raise_for_status()
+        return resp.json()
+
     # Simulando latência da chamada http
-    time.sleep(0.2)
+    simulate_latency("portal")
 
     # Exemplo de retorno
     return {
@@ -0,0 +1,128 @@
+# app/tools/protocol_cache.py
+from typing import Callable, Dict, Optional
+from collections import OrderedDict
+import copy
+import os
+import threading
+import time
+
+from app.telemetry import metrics
+from app.tools.portal_api import dados_protocolo
+
+PROTOCOL_CACHE_TTL_S = float(os.getenv("PROTOCOL_CACHE_TTL_S", "300"))
+PROTOCOL_CACHE_MAX_ENTRIES = int(os.getenv("PROTOCOL_CACHE_MAX_ENTRIES", "1024"))
+
+
+class _Flight:
+    """Busca em andamento compartilhada por todas as chamadas concorrentes do mesmo protocolo."""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ProtocolCache:
+    """
+    Cache dos dados de protocolo com TTL + LRU e deduplicação de buscas concorrentes
+    (single-flight): enquanto um protocol_id está sendo buscado, as demais chamadas
+    aguardam o mesmo resultado em vez de repetir a chamada ao portal.
+    Falhas não são cacheadas.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Dict] = dados_protocolo,
+        ttl_s: float = PROTOCOL_CACHE_TTL_S,
+        max_entries: int = PROTOCOL_CACHE_MAX_ENTRIES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._fetch = fetch
+        self._ttl_s = ttl_s
+        self._max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "shared": 0, "evictions": 0, "expirations": 0, "errors": 0}
+
+    def get(self, protocol_id: str) -> Dict:
+        with self._lock:
+            entry = self._entries.get(protocol_id)
+            if entry is not None:
+                expires_at, data = entry
+                if expires_at > self._clock():
+                    self._entries.move_to_end(protocol_id)
+                    self._counters["hits"] += 1
+                    return copy.deepcopy(data)
+                del self._entries[protocol_id]
+                self._counters["expirations"] += 1
+
+            flight = self._inflight.get(protocol_id)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[protocol_id] = _Flight()
+                self._counters["misses"] += 1
+            else:
+                self._counters["shared"] += 1
+
+        if leader:
+            try:
+                flight.result = self._fetch(protocol_id)
+            except Exception as e:
+                flight.error = e
+            except BaseException:
+                # KeyboardInterrupt/SystemExit seguem no líder; quem espera recebe um erro comum
+                flight.error = RuntimeError(f"Busca do protocolo {protocol_id} interrompida")
+                raise
+            finally:
+                with self._lock:
+                    del self._inflight[protocol_id]
+                    if flight.error is None:
+                        self._store(protocol_id, flight.result)
+                    else:
+                        self._counters["errors"] += 1
+                flight.done.set()
+        else:
+            flight.done.wait()
+
+        if flight.error is not None:
+            raise flight.error
+        return copy.deepcopy(flight.result)
+
+    def _store(self, protocol_id: str, data: Dict):
+        self._entries[protocol_id] = (self._clock() + self._ttl_s, data)
+        self._entries.move_to_end(protocol_id)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def invalidate(self, protocol_id: Optional[str] = None):
+        """Remove um protocolo do cache (ou todos, se protocol_id for None)."""
+        with self._lock:
+            if protocol_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(protocol_id, None)
+
+    def stats(self) -> Dict:
+        """Contadores para monitoramento (hits, misses, evictions, ...)."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["size"] = len(self._entries)
+            stats["inflight"] = len(self._inflight)
+        lookups = stats["hits"] + stats["misses"] + stats["shared"]
+        stats["hit_rate"] = round((stats["hits"] + stats["shared"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+# Instância compartilhada pelo processo
+protocol_cache = ProtocolCache()
+metrics.register_stats("protocol_cache", protocol_cache.stats)
+
+
+def dados_protocolo_cached(protocol_id: str) -> Dict:
+    """Mesmo contrato de portal_api.dados_protocolo, servido pelo cache compartilhado."""
+    return protocol_cache.get(protocol_id)
@@ -0,0 +1,189 @@
+# app/tools/rules_engine.py
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from datetime import date
+import logging
+
+from app.tools.rules_store import _RULES
+
+logger = logging.getLogger(__name__)
+
+# Um predicado recebe os fatos do caso e devolve (passou, evidência, confiança da evidência).
+Predicate = Callable[[Dict], Tuple[bool, str, float]]
+
+# Confiança atribuída a uma checagem quando o fato necessário não está disponível.
+MISSING_FACT_CONFIDENCE = 0.5
+
+
+def _parse_date(value) -> Optional[date]:
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except (TypeError, ValueError):
+        return None
+
+
+def extract_facts(data: Dict) -> Dict:
+    """
+    Normaliza a entrada do Rules Agent ({"id_item_pedido", "ocr", "document", ...})
+    nos fatos usados pelos predicados.
+    """
+    ocr_json = data.get("ocr") or {}
+    doc_json = data.get("document") or {}
+    extracted = (ocr_json.get("ocr") or {}).get("extracted") or {}
+    order = doc_json.get("order") or doc_json.get("extracted_order") or {}
+    vision = ocr_json.get("vision") or {}
+
+    purchase_date, purchase_conf = _parse_date(order.get("purchase_date")), 1.0
+    if purchase_date is None:
+        purchase_date = _parse_date(extracted.get("date"))
+        purchase_conf = (ocr_json.get("ocr") or {}).get("confidence", ocr_json.get("confidence", 0.0))
+
+    attachments = doc_json.get("attachments") or {}
+    return {
+        "id_item_pedido": data.get("id_item_pedido") or extracted.get("id_item_pedido"),
+        "purchase_date": purchase_date,
+        "purchase_date_confidence": purchase_conf,
+        "request_date": _parse_date(data.get("request_date") or doc_json.get("request_date")) or date.today(),
+        "has_photos": bool(attachments.get("product_image_path") or vision),
+        "vision_label": vision.get("label") or vision.get("damage"),
+        "vision_confidence": vision.get("confidence", ocr_json.get("confidence", 1.0)),
+    }
+
+
+def _compile_max_days(rule: Dict) -> Predicate:
+    max_days = int(rule["max_days"])
+
+    def predicate(facts: Dict):
+        if facts["purchase_date"] is None:
+            return False, "Data de compra não encontrada", MISSING_FACT_CONFIDENCE
+        days = (facts["request_date"] - facts["purchase_date"]).days
+        return days <= max_days, f"{days} dias desde a compra (limite {max_days})", facts["purchase_date_confidence"]
+
+    return predicate
+
+
+def _compile_requires_photos(rule: Dict) -> Predicate:
+    required = bool(rule["requires_photos"])
+
+    def predicate(facts: Dict):
+        if not required:
+            return True, "Fotos não exigidas", 1.0
+        if not facts["has_photos"]:
+            return False, "Fotos do produto ausentes", 1.0
+        label = facts["vision_label"]
+        evidence = f"Fotos presentes ({label})" if label else "Fotos presentes"
+        return True, evidence, facts["vision_confidence"]
+
+    return predicate
+
+
+def _compile_allow_credit(rule: Dict) -> Predicate:
+    allowed = bool(rule["allow_credit"])
+    evidence = "Crédito permitido como alternativa" if allowed else "Crédito não permitido"
+
+    def predicate(facts: Dict):
+        return True, evidence, 1.0
+
+    return predicate
+
+
+# campo estruturado da regra -> compilador do predicado
+COMPILERS: Dict[str, Callable[[Dict], Predicate]] = {
+    "max_days": _compile_max_days,
+    "requires_photos": _compile_requires_photos,
+    "allow_credit": _compile_allow_credit,
+}
+
+
+class CompiledRule:
+    """Regra compilada em predicados; sem campos estruturados ela é texto livre (não compilável)."""
+
+    __slots__ = ("rule_id", "description", "allow_credit", "predicates")
+
+    def __init__(self, rule: Dict):
+        self.rule_id = rule.get("rule_id", "?")
+        self.description = rule.get("description", "")
+        self.allow_credit = bool(rule.get("allow_credit", False))
+        self.predicates: List[Predicate] = [
+            compile_fn(rule) for field, compile_fn in COMPILERS.items() if field in rule
+        ]
+
+    @property
+    def compilable(self) -> bool:
+        return bool(self.predicates)
+
+    def evaluate(self, facts: Dict) -> Tuple[Dict, float]:
+        passed, evidence, confidence = True, [], 1.0
+        for predicate in self.predicates:
+            ok, text, conf = predicate(facts)
+            passed = passed and ok
+            evidence.append(text)
+            confidence = min(confidence, conf)
+        return {"rule_id": self.rule_id, "pass": passed, "evidence": "; ".join(evidence)}, confidence
+
+
+class RulesEngine:
+    """
+    Avaliação determinística das regras do rules_store, indexadas por id_item_pedido.
+    Produz o mesmo formato do RULES_PROMPT; regras de texto livre ficam em "pending_rules"
+    para serem avaliadas pelo LLM.
+    """
+
+    def __init__(self, rules: Optional[Dict[str, List[Dict]]] = None):
+        self.load(_RULES if rules is None else rules)
+
+    def load(self, rules: Dict[str, List[Dict]]):
+        """(Re)compila todas as regras."""
+        self._index = {
+            id_item_pedido: [CompiledRule(rule) for rule in item_rules]
+            for id_item_pedido, item_rules in rules.items()
+        }
+
+    def rules_for(self, id_item_pedido: str) -> List[CompiledRule]:
+        return self._index.get(id_item_pedido, [])
+
+    def evaluate(self, data: Dict) -> Dict:
+        """Avalia um caso a partir da mesma entrada recebida pelo Rules Agent."""
+        facts = extract_facts(data)
+        id_item_pedido = facts["id_item_pedido"]
+        rules = self.rules_for(id_item_pedido)
+
+        if not rules:
+            return {
+                "id_item_pedido": id_item_pedido,
+                "checks": [{"rule_id": "SEM-REGRA", "pass": False, "evidence": "Nenhuma regra cadastrada para o item"}],
+                "eligible": False,
+                "confidence": MISSING_FACT_CONFIDENCE,
+                "citations": [],
+                "pending_rules": [],
+            }
+
+        checks, citations, pending = [], [], []
+        confidence = 1.0
+        for rule in rules:
+            if not rule.compilable:
+                pending.append({"rule_id": rule.rule_id, "description": rule.description})
+                continue
+            check, conf = rule.evaluate(facts)
+            checks.append(check)
+            citations.append(f"{rule.rule_id}: {rule.description}" if rule.description else rule.rule_id)
+            confidence = min(confidence, conf)
+
+        return {
+            "id_item_pedido": id_item_pedido,
+            "checks": checks,
+            "eligible": all(check["pass"] for check in checks),
+            "confidence": round(confidence, 4),
+            "citations": citations,
+            "allow_credit": any(rule.allow_credit for rule in rules),
+            "pending_rules": pending,
+        }
+
+    def evaluate_many(self, cases: Iterable[Dict]) -> List[Dict]:
+        """Modo lote: avalia vários protocolos de uma vez, na ordem recebida."""
+        return [self.evaluate(data) for data in cases]
+
+
+# Instância compartilhada pelo processo
+rules_engine = RulesEngine()
@@ -1,6 +1,8 @@
 # app/tools/rules_store.py
 from typing import Dict, List
-import time
+
+from app.tools.hedging import hedged
+from app.tools.latency import simulate_latency
 
 _RULES = {
     "AAA111": [
@@ -14,6 +16,7 @@ _RULES = {
     ]
 }
 
+@hedged("rules")
 def lookup_rules_for_id_item_pedido(id_item_pedido: str) -> List[Dict]:
-    time.sleep(0.1)
+    simulate_latency("rules")
     return _RULES.get(id_item_pedido, [])
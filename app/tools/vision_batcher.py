@@ -0,0 +1,118 @@
+# app/tools/vision_batcher.py
+from typing import Callable, Dict, List, Optional
+from concurrent.futures import Future
+import os
+import queue
+import threading
+import time
+
+from app.telemetry import Histogram, metrics
+from app.tools.vision_service import classify_damage_batch
+
+VISION_MAX_BATCH_SIZE = int(os.getenv("VISION_MAX_BATCH_SIZE", "16"))
+VISION_MAX_WAIT_MS = float(os.getenv("VISION_MAX_WAIT_MS", "10"))
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class VisionBatcher:
+    """
+    Front-end de micro-batching para o classificador de danos.
+
+    Cada chamador envia uma imagem e recebe um Future; uma thread coletora agrupa os pedidos
+    pendentes até `max_batch_size` imagens ou `max_wait_ms` desde o primeiro pedido do lote
+    e chama `batch_fn` uma única vez. Com `submit_fn` (ex.: o submit do pool de processos),
+    o lote roda fora da thread coletora, que já pode agrupar o próximo.
+    """
+
+    def __init__(self, max_batch_size: int = VISION_MAX_BATCH_SIZE, max_wait_ms: float = VISION_MAX_WAIT_MS,
+                 batch_fn: Callable[[List[str]], List[Dict]] = classify_damage_batch,
+                 submit_fn: Optional[Callable[..., Future]] = None):
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.batch_fn = batch_fn
+        self.submit_fn = submit_fn
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self._queue_wait_ms = Histogram([1, 2, 5, 10, 20, 50, 100, 250, 500, 1000])
+
+    def submit(self, image_path: str) -> Future:
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._collect, name="vision-batcher", daemon=True)
+                    self._thread.start()
+        future = Future()
+        self._queue.put((image_path, future, time.perf_counter()))
+        return future
+
+    def classify(self, image_path: str) -> Dict:
+        return self.submit(image_path).result()
+
+    def _collect(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait_ms / 1000
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._run(batch)
+
+    def _run(self, batch: List[tuple]):
+        started = time.perf_counter()
+        with self._stats_lock:
+            self._batch_sizes.observe(len(batch))
+            for _, _, enqueued in batch:
+                self._queue_wait_ms.observe((started - enqueued) * 1000)
+        # Também nas métricas do processo (/metrics, --metrics), somando todos os batchers
+        metrics.histogram("vision_batch_size", "vision", BATCH_SIZE_BUCKETS).observe(len(batch))
+        queue_wait = metrics.histogram("vision_batch", "queue_wait")
+        for _, _, enqueued in batch:
+            queue_wait.observe(started - enqueued)
+        paths = [path for path, _, _ in batch]
+        try:
+            if self.submit_fn is None:
+                self._deliver(batch, self.batch_fn(paths))
+                return
+            pending = self.submit_fn(self.batch_fn, paths)
+        except Exception as e:
+            self._fail(batch, e)
+            return
+        pending.add_done_callback(lambda f: self._finish(batch, f))
+
+    def _finish(self, batch: List[tuple], pending: Future):
+        try:
+            self._deliver(batch, pending.result())
+        except Exception as e:
+            self._fail(batch, e)
+
+    @staticmethod
+    def _deliver(batch: List[tuple], results: List[Dict]):
+        if len(results) != len(batch):
+            raise ValueError(f"batch_fn retornou {len(results)} resultados para {len(batch)} imagens")
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+    @staticmethod
+    def _fail(batch: List[tuple], error: Exception):
+        for _, future, _ in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+                "pending": self._queue.qsize(),
+                "batch_size": self._batch_sizes.snapshot(),
+                "queue_wait_ms": self._queue_wait_ms.snapshot(),
+            }
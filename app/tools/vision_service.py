@@ -1,15 +1,33 @@
 # app/tools/vision_service.py
-from typing import Dict
-import time
+from typing import Dict, List, Sequence
+
+from app.tools.latency import simulate_latency
+
 
 def classify_damage(image_path: str) -> Dict:
     """
     Mock vision classifier: detecta se há dano.
     Substituir pela integração com um modelo de visão (ViT, YOLO, etc).
     """
-    time.sleep(0.2)
+    simulate_latency("vision")
     return {
         "label": "defeito_visivel",
         "confidence": 0.92,
         "notes": "Risco: rachadura na carcaça detectada."
     }
+
+
+def classify_damage_batch(image_paths: Sequence[str]) -> List[Dict]:
+    """
+    Mock da inferência em lote: um custo fixo por lote e um custo marginal pequeno por imagem,
+    como em modelos de visão executados em batch. Resultados na mesma ordem de image_paths.
+    """
+    simulate_latency("vision", extra_s=0.01 * len(image_paths))
+    return [
+        {
+            "label": "defeito_visivel",
+            "confidence": 0.92,
+            "notes": "Risco: rachadura na carcaça detectada."
+        }
+        for _ in image_paths
+    ]
@@ -0,0 +1,227 @@
+# app/workers.py
+"""
+Pool de processos que consome a fila durável (app/job_queue.py).
+
+Cada processo worker monta o próprio conjunto de agentes (init_agents ou a fábrica indicada em
+"modulo:funcao"), reivindica protocolos com lease, renova os leases em execução por heartbeat
+(a cada lease_s/3) e grava o resultado de volta na fila. Se um worker morre, os leases dele
+vencem e os jobs são entregues a outro. Os workers sempre usam um checkpoint SQLite compartilhado
+(CHECKPOINT_DB por padrão): o protocolo redelivered retoma das etapas já concluídas com a mesma
+idempotency_key, sem reservar estoque ou criar a troca de novo. Cada processo limita o próprio pool
+de imagens (IMAGE_EXECUTOR_WORKERS) à sua fatia dos núcleos. O supervisor (WorkerPool) recria
+workers que saem com erro enquanto houver jobs pendentes.
+
+    python -m app.workers enqueue --lote protocolos.txt
+    python -m app.workers run --workers 4 [--threads 8] [--until-empty] [--checkpoint-db checkpoints.sqlite]
+    python -m app.workers stats
+    python -m app.workers results [--saida resultados.jsonl]
+"""
+from typing import Callable, Dict, List, Optional
+import argparse
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+from app.checkpoint import CHECKPOINT_DB
+from app.job_queue import JOB_LEASE_S, JOB_QUEUE_DB, JobQueue
+
+logger = logging.getLogger(__name__)
+
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", str(os.cpu_count() or 1)))
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", "8"))
+WORKER_POLL_S = float(os.getenv("WORKER_POLL_S", "0.2"))
+AGENTS_FACTORY = "app.orquestrador:init_agents"
+
+
+def load_factory(path: str) -> Callable[[], Dict]:
+    """Resolve "modulo:funcao" (a fábrica de agentes roda dentro de cada processo worker)."""
+    module, _, name = path.partition(":")
+    return getattr(importlib.import_module(module), name or "init_agents")
+
+
+def image_workers_per_process(processes: int) -> int:
+    """Fatia dos núcleos para o pool de OCR/visão de cada worker (evita processes x cpu_count processos)."""
+    return max(1, (os.cpu_count() or 1) // processes)
+
+
+def run_worker(worker_id: str, db_path: str = JOB_QUEUE_DB, factory: str = AGENTS_FACTORY,
+               threads: int = WORKER_THREADS, lease_s: float = JOB_LEASE_S,
+               checkpoint_db: str = CHECKPOINT_DB, until_empty: bool = False, poll_s: float = WORKER_POLL_S,
+               image_workers: Optional[int] = None):
+    """Laço de um processo worker; retorna quando a fila esvazia (until_empty) ou nunca."""
+    if image_workers is not None:
+        # Antes de importar as tools: IMAGE_EXECUTOR_WORKERS é lido na importação (o valor do ambiente prevalece)
+        os.environ.setdefault("IMAGE_EXECUTOR_WORKERS", str(image_workers))
+
+    from app.checkpoint import SQLiteCheckpointStore
+    from app.orquestrador import orquestrador
+
+    queue = JobQueue(db_path, lease_s=lease_s)
+    agents = load_factory(factory)()
+    queue.register_worker(worker_id, os.getpid())
+    checkpoint = SQLiteCheckpointStore(checkpoint_db or CHECKPOINT_DB)
+    active = set()
+    active_lock = threading.Lock()
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(lease_s / 3):
+            with active_lock:
+                ids = list(active)
+            try:
+                renewed = queue.heartbeat(worker_id, ids)
+                if renewed < len(ids):
+                    logger.warning(f"{worker_id}: {len(ids) - renewed} lease(s) perdido(s)")
+            except Exception as e:
+                logger.warning(f"{worker_id}: heartbeat falhou: {e}")
+
+    def consume():
+        while True:
+            claimed = queue.claim(worker_id)
+            if not claimed:
+                if until_empty and queue.pending() == 0:
+                    return
+                time.sleep(poll_s)
+                continue
+            protocol_id, attempt = claimed[0]
+            with active_lock:
+                active.add(protocol_id)
+            t0 = time.perf_counter()
+            try:
+                # Redelivery (attempt > 1) retoma do checkpoint, com a mesma idempotency_key
+                result = orquestrador(protocol_id, agents, checkpoint, resume=True)
+                queue.complete(worker_id, protocol_id, result, time.perf_counter() - t0)
+            except Exception as e:
+                logger.warning(f"{worker_id}: protocolo {protocol_id} (tentativa {attempt}) falhou: {e}")
+                queue.fail(worker_id, protocol_id, str(e), time.perf_counter() - t0)
+            finally:
+                with active_lock:
+                    active.discard(protocol_id)
+
+    beat = threading.Thread(target=heartbeat, name=f"{worker_id}-heartbeat", daemon=True)
+    beat.start()
+    consumers = [threading.Thread(target=consume, name=f"{worker_id}-{n}") for n in range(threads)]
+    for thread in consumers:
+        thread.start()
+    for thread in consumers:
+        thread.join()
+    stop.set()
+    queue.heartbeat(worker_id)
+
+
+class WorkerPool:
+    """Supervisor de `processes` workers (multiprocessing spawn): recria os que saem com erro."""
+
+    def __init__(self, processes: int = WORKER_PROCESSES, db_path: str = JOB_QUEUE_DB,
+                 factory: str = AGENTS_FACTORY, threads: int = WORKER_THREADS, lease_s: float = JOB_LEASE_S,
+                 checkpoint_db: str = CHECKPOINT_DB, until_empty: bool = False, poll_s: float = WORKER_POLL_S):
+        if processes < 1:
+            raise ValueError("processes deve ser >= 1")
+        self.processes = processes
+        self.db_path = db_path
+        self.options = {"db_path": db_path, "factory": factory, "threads": threads, "lease_s": lease_s,
+                        "checkpoint_db": checkpoint_db, "until_empty": until_empty, "poll_s": poll_s,
+                        "image_workers": image_workers_per_process(processes)}
+        self.until_empty = until_empty
+        self.restarts = 0
+        self._context = multiprocessing.get_context("spawn")
+        self._workers: List = [None] * processes
+        self._generation = [0] * processes
+
+    def _spawn(self, index: int):
+        self._generation[index] += 1
+        worker_id = f"worker-{index}.{self._generation[index]}"
+        process = self._context.Process(target=run_worker, args=(worker_id,), kwargs=self.options,
+                                        name=worker_id, daemon=True)
+        process.start()
+        self._workers[index] = process
+
+    def start(self) -> "WorkerPool":
+        for index in range(self.processes):
+            self._spawn(index)
+        return self
+
+    def alive(self) -> int:
+        return sum(process is not None and process.is_alive() for process in self._workers)
+
+    def supervise(self, poll_s: float = 0.5):
+        """Acompanha os workers até todos saírem normalmente (until_empty) ou até stop()."""
+        queue = JobQueue(self.db_path, lease_s=self.options["lease_s"])
+        while any(process is not None for process in self._workers):
+            for index, process in enumerate(self._workers):
+                if process is None or process.is_alive():
+                    continue
+                if process.exitcode == 0 and (not self.until_empty or queue.pending() == 0):
+                    self._workers[index] = None
+                    continue
+                logger.warning(f"{process.name} saiu com código {process.exitcode}; recriando")
+                self.restarts += 1
+                self._spawn(index)
+            time.sleep(poll_s)
+        queue.close()
+
+    def stop(self, timeout: float = 5.0):
+        for process in self._workers:
+            if process is not None and process.is_alive():
+                process.terminate()
+        for process in self._workers:
+            if process is not None:
+                process.join(timeout)
+        self._workers = [None] * self.processes
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fila durável de protocolos e pool de workers")
+    parser.add_argument("--db", default=JOB_QUEUE_DB, help="arquivo SQLite da fila (padrão: JOB_QUEUE_DB)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = commands.add_parser("enqueue", help="enfileira protocol_ids (um por linha)")
+    enqueue.add_argument("--lote", metavar="ARQUIVO", default="-", help="arquivo de entrada ('-' para stdin)")
+
+    run = commands.add_parser("run", help="inicia o pool de workers")
+    run.add_argument("--workers", type=int, default=WORKER_PROCESSES, help="processos worker")
+    run.add_argument("--threads", type=int, default=WORKER_THREADS, help="protocolos em paralelo por processo")
+    run.add_argument("--lease", type=float, default=JOB_LEASE_S, help="duração do lease em segundos")
+    run.add_argument("--factory", default=AGENTS_FACTORY, help="fábrica de agentes (modulo:funcao)")
+    run.add_argument("--checkpoint-db", metavar="ARQUIVO", default=CHECKPOINT_DB,
+                     help="checkpoints compartilhados para retomar redeliveries (padrão: CHECKPOINT_DB)")
+    run.add_argument("--until-empty", action="store_true", help="encerra quando não houver jobs pendentes")
+
+    commands.add_parser("stats", help="profundidade da fila, idade dos leases e vazão por worker")
+
+    results = commands.add_parser("results", help="exporta os resultados concluídos em JSONL")
+    results.add_argument("--saida", metavar="ARQUIVO", help="arquivo JSONL de saída (padrão: stdout)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    from app.lote import ler_protocolos
+
+    args = parse_args()
+    if args.command == "enqueue":
+        source = sys.stdin if args.lote == "-" else open(args.lote, encoding="utf-8")
+        with source:
+            added = JobQueue(args.db).enqueue(ler_protocolos(source))
+        print(json.dumps({"enqueued": added}), file=sys.stderr)
+    elif args.command == "run":
+        pool = WorkerPool(args.workers, args.db, args.factory, args.threads, args.lease, args.checkpoint_db,
+                          args.until_empty).start()
+        try:
+            pool.supervise()
+        except KeyboardInterrupt:
+            pool.stop()
+        print(json.dumps(JobQueue(args.db).stats(), ensure_ascii=False), file=sys.stderr)
+    elif args.command == "stats":
+        print(json.dumps(JobQueue(args.db).stats(), ensure_ascii=False, indent=2))
+    else:
+        queue = JobQueue(args.db)
+        out = sys.stdout if not args.saida else open(args.saida, "w", encoding="utf-8")
+        for job in queue.finished():
+            out.write(json.dumps(job, ensure_ascii=False) + "\n")
+        if out is not sys.stdout:
+            out.close()
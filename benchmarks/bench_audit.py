@@ -0,0 +1,127 @@
+# benchmarks/bench_audit.py
+"""
+Custo da auditoria no caminho crítico e desempenho do escritor/leitor (app/audit.py).
+
+- hot_path: tempo por protocolo do log síncrono antigo (json.dumps indent=2 + handler de arquivo)
+  x AuditSink.submit (só enfileira).
+- writer: registros/s gravados pela thread de fundo, bytes por registro e taxa de compressão.
+- reader: latência de get(protocol_id) pelo índice e vazão de scan com filtro de decisão.
+
+Os registros vêm de protocolos reais do orquestrador sobre os agentes mock (perfil zero),
+replicados com protocol_ids distintos (a repetição favorece a compressão: a taxa é otimista).
+
+    python -m benchmarks.bench_audit [--records 20000] [--lookups 200] [--segment-kb 512]
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+
+from app.audit import AuditReader, AuditSink, audit_record
+from app.models import to_jsonable
+from app.orquestrador import orquestrador
+from benchmarks.mock_pipeline import build_bench_agents, configure, percentiles
+
+
+def sample_records(count: int, seed: int):
+    configure("zero", seed, 1.0)
+    agents = build_bench_agents(seed=seed)
+    base = [orquestrador(f"PROTO-AUDIT-{n:06d}", agents, audit=None, deadline_s=None) for n in range(min(count, 50))]
+    records = []
+    for n in range(count):
+        result = base[n % len(base)]
+        protocol_id = f"PROTO-AUDIT-{n:06d}"
+        records.append(audit_record({"protocol_id": protocol_id, "idempotency_key": f"{protocol_id}-key"}, result))
+    return records
+
+
+def hot_path(records, tmp: str):
+    """Log síncrono antigo x submit, por registro."""
+    legacy = logging.getLogger("bench_audit.legacy")
+    legacy.propagate = False
+    handler = logging.FileHandler(os.path.join(tmp, "legacy.log"), encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
+    legacy.addHandler(handler)
+    legacy.setLevel(logging.INFO)
+    old = []
+    for record in records:
+        t0 = time.perf_counter()
+        legacy.info("=== Resultado da Análise ===")
+        legacy.info(f"Protocol: {record['protocol_id']}")
+        legacy.info(f"Decision: {json.dumps(record['decision'], indent=2, ensure_ascii=False, default=to_jsonable)}")
+        old.append(time.perf_counter() - t0)
+    handler.close()
+
+    sink = AuditSink(os.path.join(tmp, "hot"), max_queue=len(records) + 1)
+    new = []
+    for record in records:
+        t0 = time.perf_counter()
+        sink.submit(record)
+        new.append(time.perf_counter() - t0)
+    sink.flush()
+    sink.close()
+    return {"sync_log_us": percentiles([v * 1e6 for v in old]), "submit_us": percentiles([v * 1e6 for v in new])}
+
+
+def writer(records, directory: str, segment_bytes: int):
+    sink = AuditSink(directory, max_queue=len(records) + 1, segment_bytes=segment_bytes)
+    t0 = time.perf_counter()
+    for record in records:
+        sink.submit(record)
+    sink.flush()
+    elapsed = time.perf_counter() - t0
+    sink.close()
+    stats = sink.stats()
+    raw = sum(len(json.dumps(r, ensure_ascii=False, separators=(",", ":"), default=to_jsonable)) + 1
+              for r in records[:1000]) / min(len(records), 1000)
+    return {
+        **{k: stats[k] for k in ("written", "dropped", "batches", "segments")},
+        "records_per_s": round(stats["written"] / elapsed, 1),
+        "bytes_per_record": round(stats["bytes"] / max(stats["written"], 1), 1),
+        "compression_ratio": round(raw * stats["written"] / max(stats["bytes"], 1), 2),
+    }
+
+
+def reader(directory: str, count: int, lookups: int, seed: int):
+    audit = AuditReader(directory)
+    rng = random.Random(seed)
+    latencies, found = [], 0
+    for _ in range(lookups):
+        protocol_id = f"PROTO-AUDIT-{rng.randrange(count):06d}"
+        t0 = time.perf_counter()
+        found += len(audit.get(protocol_id)) == 1
+        latencies.append(time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    matched = sum(1 for _ in audit.scan(decision="aprovado"))
+    scan_s = time.perf_counter() - t0
+    audit.close()
+    return {"get_latency_s": percentiles(latencies), "get_found": found,
+            "scan_matched": matched, "scan_records_per_s": round(count / scan_s, 1)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Auditoria em segundo plano: caminho crítico, escrita e leitura")
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--segment-kb", type=int, default=512, help="tamanho de rotação dos segmentos")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    records = sample_records(args.records, args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        report = {
+            "config": vars(args),
+            "hot_path": hot_path(records[:min(len(records), 5000)], tmp),
+            "writer": writer(records, os.path.join(tmp, "audit"), args.segment_kb * 1024),
+            "reader": reader(os.path.join(tmp, "audit"), args.records, args.lookups, args.seed),
+        }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return report
+
+
+if __name__ == "__main__":
+    main()
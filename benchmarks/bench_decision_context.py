@@ -0,0 +1,100 @@
+# benchmarks/bench_decision_context.py
+"""
+Tokens de entrada do Decision agent antes/depois da projeção com orçamento
+(app/context_projection.py), em casos gravados ou sintéticos.
+
+- Casos gravados: saídas de etapa de um banco de checkpoints (`--checkpoint-db`, gerado com
+  `python main.py --lote ... --resume`), protocolos com document/ocr/rules/inventory completos.
+- Casos sintéticos: texto de OCR e número de regras crescentes (documentos cada vez maiores).
+- `--live` (requer OPENAI_API_KEY) mede também a latência do LLM de decisão com cada entrada.
+
+    python -m benchmarks.bench_decision_context [--budget 600] [--checkpoint-db checkpoints.sqlite] [--live]
+"""
+import argparse
+import json
+import sqlite3
+import statistics
+import time
+
+from app.context_projection import count_tokens, project_decision_input
+
+UPSTREAM = ("document", "ocr", "rules", "inventory")
+
+
+def synthetic_cases():
+    for ocr_chars, n_checks in ((200, 2), (2_000, 5), (8_000, 10), (32_000, 40)):
+        raw_text = ("Nota fiscal eletrônica item AAA111 quantidade 1 valor 199,90 " * (ocr_chars // 60 + 1))[:ocr_chars]
+        yield f"synthetic-{ocr_chars}", {
+            "document": {"customer_match": True, "order_match": True,
+                         "extracted_order": {"order_id": "ORD-1001", "items": [{"id_item_pedido": "AAA111"}] * 5,
+                                             "notes": raw_text[: ocr_chars // 4]},
+                         "issues": [], "confidence": 0.95},
+            "ocr": {"ocr": {"raw_text": raw_text, "extracted": {"id_item_pedido": "AAA111", "value": 199.9}},
+                    "vision": {"damage": "arranhão leve", "location": "lateral direita"}, "confidence": 0.92},
+            "rules": {"id_item_pedido": "AAA111",
+                      "checks": [{"rule_id": f"R{i}", "pass": True, "evidence": "Evidência detalhada " * 10}
+                                 for i in range(n_checks)],
+                      "eligible": True, "confidence": 0.88, "citations": [f"POL#{i}" for i in range(n_checks)]},
+            "inventory": {"id_item_pedido": "AAA111", "available": True, "reservation_id": "RES-1", "qty": 1,
+                          "confidence": 0.95},
+            "protocol_id": f"synthetic-{ocr_chars}",
+            "idempotency_key": f"synthetic-{ocr_chars}-key",
+        }
+
+
+def recorded_cases(path: str, limit: int):
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute(
+            "SELECT p.protocol_id, p.idempotency_key FROM protocols p"
+            " WHERE (SELECT COUNT(*) FROM stages s WHERE s.protocol_id = p.protocol_id"
+            "        AND s.stage IN ('document', 'ocr', 'rules', 'inventory')) = 4 LIMIT ?", (limit,)
+        ).fetchall()
+        for protocol_id, idempotency_key in rows:
+            stages = dict(conn.execute(
+                "SELECT stage, output FROM stages WHERE protocol_id = ?", (protocol_id,)).fetchall())
+            data = {stage: json.loads(stages[stage]) for stage in UPSTREAM}
+            yield protocol_id, {**data, "protocol_id": protocol_id, "idempotency_key": idempotency_key}
+    finally:
+        conn.close()
+
+
+def live_latency(agent, data, runs: int):
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        agent.invoke({"input": json.dumps(data, ensure_ascii=False)})
+        samples.append(time.perf_counter() - t0)
+    return round(statistics.median(samples), 3)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget", type=int, default=600)
+    parser.add_argument("--checkpoint-db", help="usa os casos gravados neste banco de checkpoints")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--live", action="store_true", help="mede a latência do LLM real (OPENAI_API_KEY)")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    agent = None
+    if args.live:
+        from app.agents.decision_agent import build_decision_agent
+        agent = build_decision_agent(mock=False, hybrid=False)
+
+    count_tokens("")  # carrega o encoding fora da medição
+    cases = recorded_cases(args.checkpoint_db, args.limit) if args.checkpoint_db else synthetic_cases()
+    for name, data in cases:
+        t0 = time.perf_counter()
+        projected, tokens = project_decision_input(data, args.budget, count_original=True)
+        line = {
+            "case": name,
+            "tokens_before": tokens["original_tokens"],
+            "tokens_after": tokens["input_tokens"],
+            "budget": args.budget,
+            "projection_ms": round((time.perf_counter() - t0) * 1000, 3),
+        }
+        if agent is not None:
+            line["llm_latency_before_s"] = live_latency(agent, data, args.runs)
+            line["llm_latency_after_s"] = live_latency(agent, projected, args.runs)
+        print(json.dumps(line))
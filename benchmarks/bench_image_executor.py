@@ -0,0 +1,65 @@
+# benchmarks/bench_image_executor.py
+"""
+Vazão do ImageExecutor (OCR + visão por imagem) com 1/2/4/N workers, sem cache
+(imagens distintas) e com cache (mesmas imagens reenviadas).
+
+    python -m benchmarks.bench_image_executor [--images 32] [--workers 1,2,4,8]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from app.tools.image_executor import ImageExecutor
+
+
+def make_images(directory: str, count: int, size: int = 256 * 1024):
+    paths = []
+    for n in range(count):
+        path = os.path.join(directory, f"img_{n:04d}.jpg")
+        with open(path, "wb") as f:
+            f.write(os.urandom(size))
+        paths.append(path)
+    return paths
+
+
+def run(paths, workers: int):
+    executor = ImageExecutor(max_workers=workers)
+    try:
+        # aquece o pool (spawn dos processos) fora da medição
+        executor.submit("ocr", "warmup").result()
+
+        t0 = time.perf_counter()
+        futures = [executor.submit(kind, path) for path in paths for kind in ("ocr", "vision")]
+        for future in futures:
+            future.result()
+        cold_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        futures = [executor.submit(kind, path) for path in paths for kind in ("ocr", "vision")]
+        for future in futures:
+            future.result()
+        cached_s = time.perf_counter() - t0
+    finally:
+        executor.shutdown()
+
+    return {
+        "workers": workers,
+        "images": len(paths),
+        "images_per_s": round(len(paths) / cold_s, 2),
+        "cached_images_per_s": round(len(paths) / cached_s, 1),
+        "stats": executor.stats(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=32)
+    parser.add_argument("--workers", default=",".join(str(w) for w in sorted({1, 2, 4, os.cpu_count() or 1})))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_images(tmp, args.images)
+        for workers in (int(w) for w in args.workers.split(",")):
+            print(json.dumps(run(paths, workers)))
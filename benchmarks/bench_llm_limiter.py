@@ -0,0 +1,103 @@
+# benchmarks/bench_llm_limiter.py
+"""
+Chamadas de LLM concorrentes contra o endpoint local com limites (benchmarks/fake_openai.py):
+- direct:  ChatOpenAI sem limitador (retries do cliente openai)
+- limited: RateLimitedChatOpenAI (app/llm_limiter.py: RPM/TPM, AIMD e prioridade do decision_agent)
+
+Reporta vazão, falhas, 429s recebidos pelo servidor e latência por prioridade.
+
+    python -m benchmarks.bench_llm_limiter [--calls 300] [--threads 32] [--rpm 600] [--tpm 60000] \
+        [--server-concurrency 8] [--stream]
+"""
+import argparse
+import json
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_openai import ChatOpenAI
+
+from app.agents.llm import RateLimitedChatOpenAI
+from app.llm_limiter import LLM_PRIORITY, get_llm_limiter
+from benchmarks.fake_openai import FakeOpenAI
+from benchmarks.mock_pipeline import percentiles
+
+AGENTS = ("document_agent", "ocr_agent", "rules_agent", "inventory_agent", "decision_agent")
+
+
+def run(llms, calls: int, threads: int, stream: bool, seed: int):
+    rng = random.Random(seed)
+    plan = [rng.choice(AGENTS) for _ in range(calls)]
+    messages = [SystemMessage(content="Retorne SOMENTE JSON."),
+                HumanMessage(content=json.dumps({"protocol_id": "PROTO-1", "payload": "x" * 400}))]
+    latencies = {agent: [] for agent in AGENTS}
+    failures = 0
+
+    def call(agent):
+        t0 = time.perf_counter()
+        llm = llms[agent]
+        if stream:
+            "".join(chunk.content for chunk in llm.stream(messages))
+        else:
+            llm.invoke(messages)
+        return agent, time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = [pool.submit(call, agent) for agent in plan]
+        for future in futures:
+            try:
+                agent, elapsed = future.result()
+                latencies[agent].append(elapsed)
+            except Exception:
+                failures += 1
+    elapsed = time.perf_counter() - t0
+    decision = latencies.pop("decision_agent")
+    return {
+        "calls": calls,
+        "failures": failures,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round((calls - failures) / elapsed, 2),
+        "latency_s": {"decision": percentiles(decision), "earlier_stages": percentiles(sum(latencies.values(), []))},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--rpm", type=float, default=600)
+    parser.add_argument("--tpm", type=float, default=60_000)
+    parser.add_argument("--server-concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--stream", action="store_true", help="chama via stream(), como o AgentExecutor")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    report = {"config": vars(args)}
+    for variant in ("direct", "limited"):
+        fake = FakeOpenAI(rpm=args.rpm, tpm=args.tpm, max_concurrency=args.server_concurrency,
+                          latency_s=args.latency).start()
+        common = dict(model="gpt-4o-mini", temperature=0, api_key="fake", base_url=fake.url, cache=False)
+        if variant == "direct":
+            llms = {agent: ChatOpenAI(**common) for agent in AGENTS}
+        else:
+            limiter = get_llm_limiter(rpm=args.rpm, tpm=args.tpm)
+            llms = {agent: RateLimitedChatOpenAI(**common, max_retries=0, stream_usage=True,
+                                                 priority=LLM_PRIORITY[agent]) for agent in AGENTS}
+        try:
+            report[variant] = run(llms, args.calls, args.threads, args.stream, args.seed)
+        finally:
+            fake.stop()
+        report[variant]["server"] = dict(fake.counters)
+        if variant == "limited":
+            report[variant]["limiter"] = limiter.stats()
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return report
+
+
+if __name__ == "__main__":
+    main()
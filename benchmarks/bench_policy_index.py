@@ -0,0 +1,76 @@
+# benchmarks/bench_policy_index.py
+"""
+Latência de consulta do índice de políticas em função do tamanho do índice.
+
+    python -m benchmarks.bench_policy_index [--sizes 1000,10000,50000] [--queries 200]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from app.tools.policy_index import PolicyIndex, write_index
+
+VOCAB = (
+    "troca defeito garantia prazo dias compra nota fiscal fotos produto dano carcaça tela "
+    "crédito reembolso cliente pedido item estoque reserva política manual interno avaria "
+    "transporte embalagem lacre uso indevido assistência técnica laudo"
+).split()
+
+
+def synthetic_clauses(size: int, seed: int = 42):
+    rng = random.Random(seed)
+    return [
+        {
+            "clause_id": f"politica_{n // 1000:04d}#{n % 1000 + 1}",
+            "doc": f"politica_{n // 1000:04d}",
+            "text": " ".join(rng.choice(VOCAB) for _ in range(rng.randint(15, 40))),
+        }
+        for n in range(size)
+    ]
+
+
+def run(size: int, queries: int, k: int):
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        index_dir = os.path.join(tmp, "index")
+        clauses = synthetic_clauses(size)
+
+        t0 = time.perf_counter()
+        write_index(clauses, index_dir)
+        build_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        index = PolicyIndex(index_dir)
+        load_s = time.perf_counter() - t0
+
+        latencies = []
+        for _ in range(queries):
+            query = " ".join(rng.choice(VOCAB) for _ in range(8))
+            t0 = time.perf_counter()
+            index.search(query, k)
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    latencies.sort()
+    return {
+        "size": len(index),
+        "build_s": round(build_s, 3),
+        "load_s": round(load_s, 4),
+        "query_p50_ms": round(statistics.median(latencies), 4),
+        "query_p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))], 4),
+        "query_max_ms": round(latencies[-1], 4),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        print(json.dumps(run(size, args.queries, args.k)))
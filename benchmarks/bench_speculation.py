@@ -0,0 +1,106 @@
+# benchmarks/bench_speculation.py
+"""
+Reserva especulativa de estoque (app/speculation.py): latência por protocolo com e sem
+especulação, nos orquestradores síncrono e assíncrono, e a taxa de acerto da especulação.
+
+O document agent devolve o item do pedido e o OCR extrai o mesmo código, exceto numa fração
+`--mismatch` dos protocolos (código divergente: a reserva é descartada e o agente reserva o
+item certo). Casos inelegíveis vêm do sorteio do rules mock.
+
+    python -m benchmarks.bench_speculation [--protocols 100] [--mismatch 0.1] [--time-scale 0.2]
+"""
+import argparse
+import asyncio
+import copy
+import json
+import logging
+import random
+import time
+
+from app.orquestrador import orquestrador, orquestrador_async
+from app.speculation import InventorySpeculator
+from app.tools.inventory_api import ReservationService
+from benchmarks.mock_pipeline import build_bench_agents, configure, percentiles
+
+ITEM, OTHER_ITEM = "AAA111", "CCC333"
+
+
+class OrderItemsDocumentAgent:
+    """Saída do document agent com os itens do pedido, como a do agente real (dados do portal)."""
+
+    def __init__(self, agent):
+        self.agent = agent
+
+    def invoke(self, inputs):
+        data = json.loads(self.agent.invoke(inputs)["output"])
+        data["extracted_order"]["items"] = [{"id_item_pedido": ITEM, "qty": 1}]
+        return data
+
+
+class ExtractedCodeOcrAgent:
+    """OCR que extrai o código do item; diverge do pedido numa fração dos protocolos."""
+
+    def __init__(self, agent, mismatch: float, seed: int):
+        # Protocolos executados um a um: a sequência de sorteios é a mesma em cada variante
+        self.agent = agent
+        self.mismatch = mismatch
+        self.rng = random.Random(seed)
+
+    def invoke(self, inputs):
+        resp = copy.deepcopy(self.agent.invoke(inputs))
+        resp["ocr"]["extracted"] = {"id_item_pedido": OTHER_ITEM if self.rng.random() < self.mismatch else ITEM}
+        return resp
+
+
+def run(agents, count: int, speculator, mode: str, prefix: str):
+    latencies, decisions = [], {}
+    for n in range(count):
+        protocol_id = f"{prefix}-{n:05d}"
+        t0 = time.perf_counter()
+        if mode == "async":
+            result = asyncio.run(orquestrador_async(protocol_id, agents, speculator=speculator))
+        else:
+            result = orquestrador(protocol_id, agents, speculator=speculator)
+        latencies.append(time.perf_counter() - t0)
+        decision = result["decision"]["decision"]
+        decisions[decision] = decisions.get(decision, 0) + 1
+    return {"latency_s": percentiles(latencies), "decisions": decisions}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--protocols", type=int, default=100)
+    parser.add_argument("--mismatch", type=float, default=0.1)
+    parser.add_argument("--time-scale", type=float, default=0.2)
+    parser.add_argument("--profile", default="lognormal")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    report = {"config": vars(args)}
+    for mode in ("sync", "async"):
+        for speculate in (False, True):
+            service = ReservationService(stock={ITEM: 10 ** 9, OTHER_ITEM: 10 ** 9})
+            agents = dict(build_bench_agents(seed=args.seed, service=service))
+            agents["document_agent"] = OrderItemsDocumentAgent(agents["document_agent"])
+            agents["ocr_agent"] = ExtractedCodeOcrAgent(agents["ocr_agent"], args.mismatch, args.seed)
+            speculator = InventorySpeculator(service=service) if speculate else None
+            configure(args.profile, args.seed, args.time_scale)
+            name = f"{mode}_{'speculative' if speculate else 'baseline'}"
+            report[name] = run(agents, args.protocols, speculator, mode, name.upper())
+            if speculator is not None:
+                time.sleep(0.5)  # reservas liberadas em segundo plano
+                report[name]["speculation"] = speculator.stats()
+                # Reservas ainda pendentes (nem confirmadas nem liberadas) = vazamento
+                service.expire_all()
+                report[name]["pending_holds"] = sum(
+                    1 for held in service._held.values() for res in held.values() if res["expires_at"] is not None)
+        base = report[f"{mode}_baseline"]["latency_s"]
+        spec = report[f"{mode}_speculative"]["latency_s"]
+        report[f"{mode}_speedup"] = {q: round(base[q] / spec[q], 3) for q in ("p50", "p95", "mean")}
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return report
+
+
+if __name__ == "__main__":
+    main()
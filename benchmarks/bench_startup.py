@@ -0,0 +1,66 @@
+# benchmarks/bench_startup.py
+"""
+Tempo de cold start (processo novo): import do orquestrador, init_agents e primeiro protocolo,
+com construção eager (lazy=False) e lazy, nos modos mock e real.
+
+No modo real o primeiro protocolo chamaria a API da OpenAI; no lugar dele é medido o tempo até
+todos os agentes estarem construídos (o que o primeiro protocolo dispararia).
+
+    python -m benchmarks.bench_startup [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = r"""
+import json, logging, sys, time
+t0 = time.perf_counter()
+from app.orquestrador import init_agents, orquestrador
+t_import = time.perf_counter()
+logging.getLogger().setLevel(logging.WARNING)
+mock, lazy = sys.argv[1] == "mock", sys.argv[2] == "lazy"
+agents = init_agents(mock=mock, lazy=lazy)
+t_init = time.perf_counter()
+first_protocol = None
+if mock:
+    orquestrador("PROTO-STARTUP", agents)
+    first_protocol = time.perf_counter() - t_init
+agents.prewarm(background=False)
+print(json.dumps({
+    "import_s": t_import - t0,
+    "init_s": t_init - t_import,
+    "first_protocol_s": first_protocol,
+    "ready_s": time.perf_counter() - t0,
+    "langchain_imported": "langchain" in sys.modules,
+}))
+"""
+
+
+def probe(mode: str, strategy: str) -> dict:
+    env = dict(os.environ, OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY", "sk-bench"), TELEMETRY_ENABLED="1")
+    out = subprocess.run([sys.executable, "-c", PROBE, mode, strategy], capture_output=True, text=True,
+                         check=True, env=env).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def summarize(samples):
+    result = {}
+    for key in ("import_s", "init_s", "first_protocol_s", "ready_s"):
+        values = [s[key] for s in samples if s[key] is not None]
+        result[key] = round(statistics.median(values), 4) if values else None
+    result["langchain_imported"] = samples[0]["langchain_imported"]
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    for mode in ("mock", "real"):
+        for strategy in ("eager", "lazy"):
+            samples = [probe(mode, strategy) for _ in range(args.runs)]
+            print(json.dumps({"mode": mode, "strategy": strategy, "runs": args.runs, **summarize(samples)}))
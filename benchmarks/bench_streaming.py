@@ -0,0 +1,98 @@
+# benchmarks/bench_streaming.py
+"""
+Streaming dos agentes structured (STRUCTURED_STREAMING) contra benchmarks/fake_openai.py gerando
+a resposta token a token (`--tokens-per-s`) com textos longos de evidência (`--text-chars`).
+
+- agents: por agente, tempo até o primeiro campo útil (usable_fields, ex.: eligible) x tempo até
+  a resposta completa (histogramas "llm_stream" da telemetria).
+- protocol: latência do protocolo com o rules_agent real (LLM) e os demais agentes mock, com e sem
+  EARLY_START (inventory iniciada assim que rules emite eligible=true), nos dois orquestradores.
+
+    python -m benchmarks.bench_streaming [--calls 10] [--tokens-per-s 200] [--text-chars 200] [--latency 0.1]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+
+from app.telemetry import metrics
+from benchmarks.bench_structured_agents import build, stage_inputs
+from benchmarks.fake_openai import FakeOpenAI
+from benchmarks.mock_pipeline import build_bench_agents, configure, percentiles
+
+AGENTS = {"document": "document_agent", "rules": "rules_agent"}
+
+
+def measure_agent(stage: str, calls: int):
+    agent = build(stage, structured=True)
+    name = AGENTS[stage]
+    for n in range(calls):
+        agent.invoke(stage_inputs(stage, n))
+    report = {point: {key: snapshot[key] for key in ("count", "p50", "p95")}
+              for point in ("first_usable_field", "full_response")
+              for snapshot in [metrics.histogram("llm_stream", f"{name}:{point}").snapshot()]}
+    full = report["full_response"]["p50"]
+    report["usable_fraction_p50"] = round(report["first_usable_field"]["p50"] / full, 3) if full else None
+    return report
+
+
+def measure_protocol(calls: int, seed: int, early: bool, use_async: bool):
+    from app.agents.rules_agent import build_rules_agent
+    from app.orquestrador import EARLY_START, orquestrador, orquestrador_async
+
+    agents = build_bench_agents(seed=seed)
+    agents["rules_agent"] = build_rules_agent(mock=False, deterministic=False, structured=True)
+    options = {"speculator": None, "early_start": EARLY_START if early else {}}
+    latencies, overlaps = [], []
+    for n in range(calls):
+        protocol_id = f"PROTO-STREAM-{'A' if use_async else 'S'}{int(early)}-{n:04d}"
+        t0 = time.perf_counter()
+        if use_async:
+            result = asyncio.run(orquestrador_async(protocol_id, agents, **options))
+        else:
+            result = orquestrador(protocol_id, agents, **options)
+        latencies.append(time.perf_counter() - t0)
+        timings = result["timings"]
+        if "inventory" in timings:
+            overlaps.append(max(0.0, timings["rules"]["end"] - timings["inventory"]["start"]))
+    return {"latency_s": percentiles(latencies), "inventory_overlap_s": percentiles(overlaps)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Primeiro campo útil x resposta completa e início antecipado")
+    parser.add_argument("--calls", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.1, help="tempo até o primeiro token (s)")
+    parser.add_argument("--tokens-per-s", type=float, default=200)
+    parser.add_argument("--text-chars", type=int, default=200, help="tamanho das evidências/explicações")
+    parser.add_argument("--profile", default="fixed")
+    parser.add_argument("--time-scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    fake = FakeOpenAI(rpm=1_000_000, tpm=1_000_000_000, max_concurrency=1000, latency_s=args.latency,
+                      tokens_per_s=args.tokens_per_s, text_chars=args.text_chars).start()
+    os.environ.update({"OPENAI_BASE_URL": fake.url, "OPENAI_API_KEY": "fake"})
+    configure(args.profile, args.seed, args.time_scale)
+    report = {"config": vars(args), "agents": {}, "protocol": {}}
+    try:
+        for stage in AGENTS:
+            report["agents"][stage] = measure_agent(stage, args.calls)
+        for mode, use_async in (("sync", False), ("async", True)):
+            without = measure_protocol(args.calls, args.seed, False, use_async)
+            with_early = measure_protocol(args.calls, args.seed, True, use_async)
+            report["protocol"][mode] = {
+                "sequential": without,
+                "early_start": with_early,
+                "p50_saved_s": round(without["latency_s"]["p50"] - with_early["latency_s"]["p50"], 4),
+            }
+    finally:
+        fake.stop()
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# benchmarks/bench_structured_agents.py
+"""
+Agentes reais (document, OCR/visão, rules, inventory) nos dois modos, contra o endpoint local
+benchmarks/fake_openai.py (latência fixa por requisição):
+- executor:   AgentExecutor com function calling (o modelo pede a tool e depois responde)
+- structured: tools pré-executadas em Python e uma única chamada com response_format json_schema
+
+Reporta, por etapa, idas ao LLM por invocação e latência; no modo structured também confere se a
+saída passa pelo modelo tipado da etapa (app/models.py). As tools usam o perfil de latência mock.
+
+    python -m benchmarks.bench_structured_agents [--calls 20] [--latency 0.2] [--profile fixed] [--time-scale 0.1]
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import time
+
+from app.models import STAGE_MODELS, StageParseError
+from benchmarks.fake_openai import FakeOpenAI
+from benchmarks.mock_pipeline import configure, percentiles
+
+OCR = {"raw_text": "Nota fiscal ... ID_ITEM_PEDIDO: AAA111", "extracted": {"id_item_pedido": "AAA111"}}
+
+
+def stage_inputs(stage: str, n: int):
+    if stage == "document":
+        return {"input": f"PROTO-BENCH-{n:04d}"}
+    if stage == "ocr":
+        return {"input": {"invoice_image": "/path/to/invoice.jpg", "product_image": "/path/to/product.jpg"}}
+    if stage == "rules":
+        return {"input": {"id_item_pedido": "AAA111", "ocr": OCR, "document": {"customer_match": True}}}
+    return {"input": {"id_item_pedido": "AAA111", "qty": 1, "idempotency_key": f"BENCH-{n}-{time.time_ns()}"}}
+
+
+def build(stage: str, structured: bool):
+    from app.agents.document_agent import build_document_agent
+    from app.agents.inventory_agent import build_inventory_agent
+    from app.agents.ocr_agent import build_ocr_vision_agent
+    from app.agents.rules_agent import build_rules_agent
+
+    if stage == "rules":
+        # Sem o RulesEngine: o LLM avalia todas as regras nos dois modos
+        return build_rules_agent(mock=False, deterministic=False, structured=structured)
+    builders = {"document": build_document_agent, "ocr": build_ocr_vision_agent,
+                "inventory": build_inventory_agent}
+    return builders[stage](mock=False, structured=structured)
+
+
+def run(fake: FakeOpenAI, stage: str, structured: bool, calls: int):
+    agent = build(stage, structured)
+    with contextlib.redirect_stdout(io.StringIO()):  # verbose=True dos executores
+        agent.invoke(stage_inputs(stage, -1))  # aquecimento (pool de imagens, clientes HTTP)
+        before = fake.counters["requests"]
+        latencies, valid = [], 0
+        for n in range(calls):
+            t0 = time.perf_counter()
+            resp = agent.invoke(stage_inputs(stage, n))
+            latencies.append(time.perf_counter() - t0)
+            try:
+                STAGE_MODELS[stage].parse(resp)
+                valid += 1
+            except StageParseError:
+                pass
+    report = {
+        "llm_round_trips": round((fake.counters["requests"] - before) / calls, 2),
+        "latency_s": percentiles(latencies),
+    }
+    if structured:
+        report["schema_valid"] = valid
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AgentExecutor x tools pré-executadas + json_schema")
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2, help="latência de cada requisição ao LLM (s)")
+    parser.add_argument("--profile", default="fixed")
+    parser.add_argument("--time-scale", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--stages", default="document,ocr,rules,inventory")
+    args = parser.parse_args(argv)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    fake = FakeOpenAI(rpm=1_000_000, tpm=1_000_000_000, max_concurrency=1000, latency_s=args.latency).start()
+    os.environ.update({"OPENAI_BASE_URL": fake.url, "OPENAI_API_KEY": "fake"})
+    configure(args.profile, args.seed, args.time_scale)
+    report = {"config": vars(args), "stages": {}}
+    try:
+        for stage in args.stages.split(","):
+            executor = run(fake, stage, False, args.calls)
+            structured = run(fake, stage, True, args.calls)
+            report["stages"][stage] = {
+                "executor": executor,
+                "structured": structured,
+                "p50_speedup": round(executor["latency_s"]["p50"] / structured["latency_s"]["p50"], 2),
+            }
+    finally:
+        fake.stop()
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return report
+
+
+if __name__ == "__main__":
+    main()
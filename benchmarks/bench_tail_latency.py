@@ -0,0 +1,55 @@
+# benchmarks/bench_tail_latency.py
+"""
+Latência de cauda com o perfil "tail" (lognormal + picos de 10x + erros injetados nas tools):
+sem proteção, com hedging das leituras idempotentes, com prazo por protocolo e com ambos.
+
+    python -m benchmarks.bench_tail_latency [--protocols 400] [--deadline 0.5] [--time-scale 0.1]
+
+O prazo padrão (--deadline) deve ficar acima da latência típica do protocolo: protocolos que o
+estouram terminam com fallback nas etapas canceladas (contados em "deadline_exceeded").
+"""
+import argparse
+import json
+import logging
+
+from app.tools.hedging import hedger
+from benchmarks.load_suite import run_single
+from benchmarks.mock_pipeline import build_bench_agents, configure
+
+VARIANTS = {
+    "baseline": {"hedging": False, "deadline": False},
+    "hedging": {"hedging": True, "deadline": False},
+    "deadline": {"hedging": False, "deadline": True},
+    "hedging+deadline": {"hedging": True, "deadline": True},
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--protocols", type=int, default=400)
+    parser.add_argument("--deadline", type=float, default=0.5, help="prazo por protocolo, em segundos")
+    parser.add_argument("--time-scale", type=float, default=0.1)
+    parser.add_argument("--profile", default="tail")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    logging.getLogger().setLevel(logging.ERROR)
+
+    agents = build_bench_agents(seed=args.seed)
+    report = {"config": vars(args), "variants": {}}
+    for name, variant in VARIANTS.items():
+        configure(args.profile, args.seed, args.time_scale)
+        hedger.enabled = variant["hedging"]
+        deadline_s = args.deadline if variant["deadline"] else None
+        result = run_single(agents, args.protocols, prefix=name.upper(), deadline_s=deadline_s)
+        report["variants"][name] = {key: result[key] for key in ("latency_s", "degraded", "deadline_exceeded")}
+    report["hedger"] = hedger.stats()
+
+    base = report["variants"]["baseline"]["latency_s"]["p99"]
+    for name, data in report["variants"].items():
+        data["p99_vs_baseline"] = round(data["latency_s"]["p99"] / base, 3) if base else None
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# benchmarks/bench_workers.py
+"""
+Pool de workers sobre a fila durável (app/workers.py, app/job_queue.py).
+
+- scaling: vazão com 1, 2, 4... processos sobre os agentes mock. Para que o trabalho dependa de
+  CPU (e não só das esperas simuladas das tools), `--cpu-ms` gasta esse tempo de CPU em Python
+  puro por protocolo; a eficiência é vazão(N) / (N * vazão(1)) e só se aproxima de 1 com N
+  núcleos livres (ver cpu_count no relatório).
+- crash: mata (SIGKILL) um worker no meio do lote; os leases dele vencem, os jobs são
+  reentregues e o supervisor recria o processo. Confere que todos os protocolos terminam uma
+  única vez.
+
+    python -m benchmarks.bench_workers [--protocols 400] [--workers 1,2,4] [--cpu-ms 20] [--crash]
+"""
+import argparse
+import json
+import logging
+import os
+import signal
+import sqlite3
+import tempfile
+import threading
+import time
+
+from app.job_queue import JobQueue
+from app.workers import WorkerPool
+
+FACTORY = "benchmarks.bench_workers:bench_agents"
+
+
+def _burn(ms: float):
+    deadline = time.process_time() + ms / 1000
+    n = 0
+    while time.process_time() < deadline:
+        n += 1
+    return n
+
+
+class CpuBoundAgent:
+    """Gasta BENCH_CPU_MS de CPU antes do agente (ex.: parsing/pré-processamento de imagem)."""
+
+    def __init__(self, agent, cpu_ms: float):
+        self.agent = agent
+        self.cpu_ms = cpu_ms
+
+    def invoke(self, inputs):
+        _burn(self.cpu_ms)
+        return self.agent.invoke(inputs)
+
+
+def bench_agents():
+    """Fábrica executada em cada processo worker; configuração via variáveis BENCH_*."""
+    from benchmarks.mock_pipeline import build_bench_agents, configure
+
+    seed = int(os.getenv("BENCH_SEED", "42"))
+    configure(os.getenv("BENCH_PROFILE", "zero"), seed, float(os.getenv("BENCH_TIME_SCALE", "0.1")))
+    agents = build_bench_agents(seed=seed)
+    cpu_ms = float(os.getenv("BENCH_CPU_MS", "0"))
+    if cpu_ms > 0:
+        agents["ocr_agent"] = CpuBoundAgent(agents["ocr_agent"], cpu_ms)
+    return agents
+
+
+def _window(db_path: str):
+    """Intervalo entre o primeiro lease e o último término (exclui o spawn dos processos)."""
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute("SELECT MIN(leased_at), MAX(finished_at), COUNT(*) FROM jobs WHERE status = 'done'"
+                            ).fetchone()
+
+
+def run_pool(workers: int, protocols: int, threads: int, lease_s: float, prefix: str, crash_after: int = 0):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "fila.sqlite")
+        queue = JobQueue(db_path, lease_s=lease_s)
+        queue.enqueue(f"{prefix}-{n:06d}" for n in range(protocols))
+        pool = WorkerPool(workers, db_path, FACTORY, threads, lease_s,
+                          checkpoint_db=os.path.join(tmp, "checkpoints.sqlite"), until_empty=True,
+                          poll_s=0.05)
+        t0 = time.perf_counter()
+        pool.start()
+        killed = None
+        if crash_after:
+            def kill_one():
+                while queue.stats()["depth"]["done"] < crash_after:
+                    time.sleep(0.01)
+                process = pool._workers[0]
+                os.kill(process.pid, signal.SIGKILL)
+                return process.name
+
+            killer = threading.Thread(target=lambda: setattr(killer, "victim", kill_one()), daemon=True)
+            killer.start()
+        try:
+            pool.supervise(poll_s=0.05)
+        finally:
+            pool.stop()
+        wall = time.perf_counter() - t0
+        if crash_after:
+            killer.join()
+            killed = killer.victim
+        first, last, done = _window(db_path)
+        stats = queue.stats()
+        elapsed = (last - first) if done else 0.0
+        report = {
+            "workers": workers,
+            "protocols": protocols,
+            "done": done,
+            "failed": stats["depth"]["failed"],
+            "redelivered": stats["redelivered"],
+            "restarts": pool.restarts,
+            "elapsed_s": round(elapsed, 3),
+            "wall_s": round(wall, 3),
+            "throughput_per_s": round(done / elapsed, 2) if elapsed > 0 else 0.0,
+            "per_worker": [{k: w[k] for k in ("worker_id", "processed", "throughput_per_s")}
+                           for w in stats["workers"]],
+        }
+        if killed:
+            report["killed"] = killed
+        queue.close()
+        return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vazão do pool de workers e redelivery após crash")
+    parser.add_argument("--protocols", type=int, default=400)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--threads", type=int, default=4, help="protocolos em paralelo por processo")
+    parser.add_argument("--cpu-ms", type=float, default=20.0, help="CPU gasta por protocolo (0 = só esperas)")
+    parser.add_argument("--profile", default="zero")
+    parser.add_argument("--time-scale", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--crash", action="store_true", help="também roda o cenário de crash de um worker")
+    parser.add_argument("--lease", type=float, default=1.0, help="lease dos jobs no cenário de crash")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.ERROR)
+    os.environ.update({"BENCH_SEED": str(args.seed), "BENCH_PROFILE": args.profile,
+                       "BENCH_TIME_SCALE": str(args.time_scale), "BENCH_CPU_MS": str(args.cpu_ms)})
+    levels = [int(n) for n in args.workers.split(",")]
+
+    scaling = []
+    for workers in levels:
+        scaling.append(run_pool(workers, args.protocols, args.threads, 30.0, f"SCALE{workers}"))
+    base = scaling[0]["throughput_per_s"] / levels[0] if scaling[0]["throughput_per_s"] else 0
+    for point in scaling:
+        point["efficiency"] = round(point["throughput_per_s"] / (point["workers"] * base), 3) if base else None
+
+    report = {"cpu_count": os.cpu_count(), "cpu_ms": args.cpu_ms, "profile": args.profile, "scaling": scaling}
+    if args.crash:
+        workers = max(levels)
+        report["crash"] = run_pool(workers, args.protocols, args.threads, args.lease, "CRASH",
+                                   crash_after=args.protocols // 4)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return report
+
+
+if __name__ == "__main__":
+    main()
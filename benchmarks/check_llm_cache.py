@@ -0,0 +1,164 @@
+# benchmarks/check_llm_cache.py
+"""
+Verificação offline do cache de respostas do LLM (app/llm_cache.py) com o chat model fake do
+LangChain no lugar da OpenAI: nenhuma chamada de rede, só o SQLiteLLMCache num banco temporário.
+
+- key: mesma (modelo, mensagens, schema das tools) -> hit; mudar qualquer um dos três -> miss.
+  Também confere que o llm_string do ChatOpenAI real muda com o modelo e com as tools vinculadas.
+- ttl: a entrada expira após ttl_s (relógio injetado) e o modelo volta a ser chamado.
+- lru: acima de max_bytes sai a entrada acessada há mais tempo, não a mais antiga; o tamanho
+  mantido em memória confere com a soma da tabela.
+- per_agent: agente desabilitado em LLM_CACHE_AGENTS não recebe o cache no AgentRegistry e
+  cada chamada vai ao modelo; AgentRegistry.stats() expõe os contadores do cache.
+
+    python -m benchmarks.check_llm_cache
+"""
+import itertools
+import json
+import os
+import sys
+import tempfile
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from app.agents.registry import AgentRegistry
+from app.llm_cache import LLM_CACHE_AGENTS, SQLiteLLMCache
+
+TOOL_A = {"type": "function", "function": {"name": "rules_lookup", "parameters": {
+    "type": "object", "properties": {"id_item_pedido": {"type": "string"}}}}}
+TOOL_B = {"type": "function", "function": {"name": "rules_lookup", "parameters": {
+    "type": "object", "properties": {"id_item_pedido": {"type": "string"}, "qty": {"type": "integer"}}}}}
+
+
+class FakeChat(FakeListChatModel):
+    """Chat model fake com nome de modelo (entra no llm_string) e contagem de chamadas reais."""
+
+    model: str = "fake-model"
+    calls: int = 0
+
+    @property
+    def _identifying_params(self):
+        return {"model": self.model}
+
+    def _call(self, *args, **kwargs) -> str:
+        self.calls += 1
+        return super()._call(*args, **kwargs)
+
+
+def messages(text: str):
+    return [SystemMessage(content="Você é Rules Agent."), HumanMessage(content=text)]
+
+
+def fake(cache, model: str = "fake-model") -> FakeChat:
+    return FakeChat(model=model, responses=[f"resposta-{n}" for n in range(100)], cache=cache)
+
+
+def calls_for(llm, invoke) -> int:
+    """Chamadas que chegaram ao modelo durante invoke() (0 = servida pelo cache)."""
+    before = llm.calls
+    invoke()
+    return llm.calls - before
+
+
+def check_key(tmp: str):
+    cache = SQLiteLLMCache(os.path.join(tmp, "key.sqlite"))
+    llm, other_model = fake(cache), fake(cache, model="fake-model-2")
+    with_tool_a, with_tool_b = llm.bind(tools=[TOOL_A]), llm.bind(tools=[TOOL_B])
+    first = llm.invoke(messages("AAA111")).content
+    report = {
+        "same_request_hit": calls_for(llm, lambda: llm.invoke(messages("AAA111"))) == 0,
+        "same_request_same_answer": llm.invoke(messages("AAA111")).content == first,
+        "other_messages_miss": calls_for(llm, lambda: llm.invoke(messages("BBB222"))) == 1,
+        "other_model_miss": calls_for(other_model, lambda: other_model.invoke(messages("AAA111"))) == 1,
+        "tool_schema_miss": calls_for(llm, lambda: with_tool_a.invoke(messages("AAA111"))) == 1,
+        "same_tool_schema_hit": calls_for(llm, lambda: with_tool_a.invoke(messages("AAA111"))) == 0,
+        "changed_tool_schema_miss": calls_for(llm, lambda: with_tool_b.invoke(messages("AAA111"))) == 1,
+    }
+
+    from langchain_openai import ChatOpenAI
+
+    mini = ChatOpenAI(model="gpt-4o-mini", temperature=0, api_key="offline")
+    base = mini._get_llm_string()
+    report["openai_llm_string_has_model"] = base != ChatOpenAI(
+        model="gpt-4o", temperature=0, api_key="offline")._get_llm_string()
+    with_tools = mini._get_llm_string(tools=[TOOL_A])
+    report["openai_llm_string_has_tools"] = base != with_tools != mini._get_llm_string(tools=[TOOL_B]) != base
+    return report, cache.stats()
+
+
+def check_ttl(tmp: str):
+    now = [1000.0]
+    cache = SQLiteLLMCache(os.path.join(tmp, "ttl.sqlite"), ttl_s=60, clock=lambda: now[0])
+    llm = fake(cache)
+    llm.invoke(messages("AAA111"))
+    now[0] += 59
+    before_expiry = calls_for(llm, lambda: llm.invoke(messages("AAA111")))
+    now[0] += 2
+    after_expiry = calls_for(llm, lambda: llm.invoke(messages("AAA111")))
+    stats = cache.stats()
+    return {
+        "hit_before_ttl": before_expiry == 0,
+        "miss_after_ttl": after_expiry == 1,
+        "expired": stats["expirations"] == 1,
+    }, stats
+
+
+def check_lru(tmp: str):
+    ticks = itertools.count()
+    cache = SQLiteLLMCache(os.path.join(tmp, "lru.sqlite"), clock=lambda: float(next(ticks)))
+    llm = fake(cache)
+    llm.invoke(messages("A"))
+    # Limite para duas entradas: a terceira força uma remoção
+    cache.max_bytes = int(cache.stats()["size_bytes"] * 2.5)
+    llm.invoke(messages("B"))
+    llm.invoke(messages("A"))  # A passa a ser a mais recente
+    llm.invoke(messages("C"))
+    stats = cache.stats()
+    return {
+        "evicted_one": stats["evictions"] == 1,
+        "recent_kept": calls_for(llm, lambda: llm.invoke(messages("A"))) == 0,
+        "newest_kept": calls_for(llm, lambda: llm.invoke(messages("C"))) == 0,
+        "least_recent_evicted": calls_for(llm, lambda: llm.invoke(messages("B"))) == 1,
+        "within_max_bytes": stats["size_bytes"] <= cache.max_bytes,
+        "size_matches_table": stats["size_bytes"] == cache._db().execute(
+            "SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0],
+    }, stats
+
+
+def check_per_agent(tmp: str):
+    cache = SQLiteLLMCache(os.path.join(tmp, "agents.sqlite"))
+    registry = AgentRegistry(mock=False, llm_cache=cache)
+    previous = LLM_CACHE_AGENTS["decision_agent"]
+    LLM_CACHE_AGENTS["decision_agent"] = False
+    try:
+        enabled, disabled = registry._cache_for("rules_agent"), registry._cache_for("decision_agent")
+    finally:
+        LLM_CACHE_AGENTS["decision_agent"] = previous
+    # Como build_llm: sem cache do registro, cache=False (nem o cache global do LangChain é usado)
+    llm = fake(disabled if disabled is not None else False)
+    repeated = sum(calls_for(llm, lambda: llm.invoke(messages("AAA111"))) for _ in range(3))
+    stats = cache.stats()
+    return {
+        "enabled_agent_gets_cache": enabled is cache,
+        "disabled_agent_gets_none": disabled is None,
+        "disabled_agent_always_calls_model": repeated == 3,
+        "cache_untouched": stats["hits"] + stats["misses"] + stats["writes"] == 0,
+        "registry_stats_has_cache": registry.stats()["llm_cache"] == stats,
+    }, stats
+
+
+def main():
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, check in (("key", check_key), ("ttl", check_ttl), ("lru", check_lru),
+                            ("per_agent", check_per_agent)):
+            checks, stats = check(tmp)
+            report[name] = {"checks": checks, "cache": stats}
+    report["ok"] = all(all(section["checks"].values()) for section in report.values())
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return report
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main()["ok"] else 1)
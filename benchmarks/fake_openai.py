@@ -0,0 +1,245 @@
+# benchmarks/fake_openai.py
+"""
+Endpoint local compatível com POST /v1/chat/completions que simula os limites da OpenAI:
+RPM e TPM (token buckets com rajada de 1 s, como a aplicação de limites em janelas curtas)
+e capacidade de concorrência; acima deles responde 429 com retry-after-ms.
+Suporta respostas com e sem streaming (SSE, com o chunk de usage quando pedido).
+Com `functions`/`tools` na requisição, a primeira resposta chama a primeira função (argumentos
+tirados da mensagem do usuário), como um agente de tools; com response_format json_schema, a
+resposta é um JSON mínimo válido para o schema (com `text_chars`, strings longas e listas com
+itens, como a evidência/explicação de uma resposta real). Com `tokens_per_s`, o conteúdo em
+streaming sai em chunks de ~4 caracteres nesse ritmo, como a geração token a token.
+
+    python -m benchmarks.fake_openai [--port 8089] [--rpm 600] [--tpm 60000] [--max-concurrency 8]
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=fake MOCK_AGENTS=0 python main.py
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+import argparse
+import json
+import threading
+import time
+import uuid
+
+RESPONSE = json.dumps({"decision": "aprovado", "action_payload": None, "confidence": 0.95,
+                       "explanation": "Resposta simulada", "audit_refs": ["FAKE-OPENAI"]}, ensure_ascii=False)
+
+
+def example(schema: dict, text: str = "MOCK", items: int = 0):
+    """Instância válida de um JSON schema (os tipos usados pelos agentes); mínima com os padrões."""
+    kind = schema.get("type")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "null")
+    if "enum" in schema:
+        return schema["enum"][0]
+    if kind == "object":
+        return {key: example(prop, text, items) for key, prop in (schema.get("properties") or {}).items()}
+    if kind == "array":
+        return [example(schema.get("items") or {}, text, items) for _ in range(items)]
+    return {"string": text, "boolean": True, "number": 0.9, "integer": 1, "null": None}.get(kind)
+
+
+def function_call(body: dict):
+    """(nome, argumentos JSON) da chamada à primeira tool; None se a tool já respondeu."""
+    messages = body.get("messages", [])
+    if messages and messages[-1].get("role") in ("function", "tool"):
+        return None
+    if body.get("functions"):
+        function = body["functions"][0]
+    elif body.get("tools"):
+        function = body["tools"][0]["function"]
+    else:
+        return None
+    user = next((m.get("content") for m in reversed(messages) if m.get("role") == "user"), "") or ""
+    try:
+        data = json.loads(user)
+    except ValueError:
+        data = None
+    data = data if isinstance(data, dict) else {}
+    arguments = {}
+    for key, prop in (function.get("parameters") or {}).get("properties", {}).items():
+        if key in data:
+            arguments[key] = data[key]
+        elif prop.get("type") == "string" and not data:
+            arguments[key] = user
+        else:
+            arguments[key] = example(prop)
+    return function["name"], json.dumps(arguments, ensure_ascii=False)
+
+
+def reply(body: dict, text_chars: int = 0) -> dict:
+    """Campos da mensagem do assistente: content ou a chamada de função/tool."""
+    call = function_call(body)
+    if call is not None:
+        name, arguments = call
+        if body.get("functions"):
+            return {"content": None, "function_call": {"name": name, "arguments": arguments}}
+        return {"content": None, "tool_calls": [{"index": 0, "id": f"call_{uuid.uuid4().hex[:8]}",
+                                                 "type": "function",
+                                                 "function": {"name": name, "arguments": arguments}}]}
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        schema = response_format["json_schema"]["schema"]
+        if text_chars:
+            text = ("Evidência simulada da avaliação. " * (text_chars // 33 + 1))[:text_chars]
+            return {"content": json.dumps(example(schema, text, items=2), ensure_ascii=False)}
+        return {"content": json.dumps(example(schema), ensure_ascii=False)}
+    return {"content": RESPONSE}
+
+
+class FakeOpenAI:
+    def __init__(self, port: int = 0, rpm: float = 600, tpm: float = 60_000, max_concurrency: int = 8,
+                 latency_s: float = 0.2, completion_tokens: int = 60, tokens_per_s: float = 0,
+                 text_chars: int = 0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.latency_s = latency_s
+        self.completion_tokens = completion_tokens
+        self.tokens_per_s = tokens_per_s
+        self.text_chars = text_chars
+        self._requests = rpm / 60
+        self._tokens = tpm / 60
+        self._refilled_at = time.monotonic()
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "ok": 0, "429_requests": 0, "429_tokens": 0, "429_concurrency": 0}
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self.server.handle_error = lambda request, client_address: None  # conexões fechadas pelo cliente
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+    def start(self) -> "FakeOpenAI":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _admit(self, tokens: int):
+        """None se a requisição entra; senão (motivo, retry_after_s)."""
+        with self._lock:
+            now = time.monotonic()
+            elapsed, self._refilled_at = now - self._refilled_at, now
+            self._requests = min(self.rpm / 60, self._requests + elapsed * self.rpm / 60)
+            self._tokens = min(self.tpm / 60, self._tokens + elapsed * self.tpm / 60)
+            self.counters["requests"] += 1
+            if self._in_flight >= self.max_concurrency:
+                self.counters["429_concurrency"] += 1
+                return "concurrency", self.latency_s
+            if self._requests < 1:
+                self.counters["429_requests"] += 1
+                return "requests", (1 - self._requests) * 60 / self.rpm
+            cost = min(tokens, self.tpm / 60)
+            if self._tokens < cost:
+                self.counters["429_tokens"] += 1
+                return "tokens", (cost - self._tokens) * 60 / self.tpm
+            self._requests -= 1
+            self._tokens -= tokens
+            self._in_flight += 1
+            self.counters["ok"] += 1
+            return None
+
+    def _done(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: Dict, headers: Dict = None):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not self.path.endswith("/chat/completions"):
+                    return self._send(404, {"error": {"message": "not found"}})
+                prompt_tokens = len(json.dumps(body.get("messages", []))) // 4
+                total = prompt_tokens + fake.completion_tokens
+                rejected = fake._admit(total)
+                if rejected is not None:
+                    reason, retry_after = rejected
+                    return self._send(429, {"error": {"message": f"Rate limit reached ({reason})",
+                                                      "type": reason, "code": "rate_limit_exceeded"}},
+                                      {"retry-after-ms": str(int(retry_after * 1000) + 1)})
+                try:
+                    time.sleep(fake.latency_s)
+                    usage = {"prompt_tokens": prompt_tokens, "completion_tokens": fake.completion_tokens,
+                             "total_tokens": total}
+                    base = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "created": int(time.time()),
+                            "model": body.get("model", "gpt-4o-mini")}
+                    message = reply(body, fake.text_chars)
+                    finish = "function_call" if "function_call" in message else \
+                        "tool_calls" if "tool_calls" in message else "stop"
+                    if body.get("stream"):
+                        self._stream(base, usage, (body.get("stream_options") or {}).get("include_usage"),
+                                     message, finish)
+                    else:
+                        self._send(200, {**base, "object": "chat.completion", "usage": usage, "choices": [
+                            {"index": 0, "finish_reason": finish, "message": {"role": "assistant", **message}}]})
+                finally:
+                    fake._done()
+
+            def _stream(self, base: Dict, usage: Dict, include_usage: bool, message: Dict, finish: str):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                chunk = {**base, "object": "chat.completion.chunk"}
+                content = message.get("content")
+                pieces = [content[i:i + 4] for i in range(0, len(content), 4)] \
+                    if fake.tokens_per_s and content else [content]
+                first = {"role": "assistant", **message, "content": pieces[0]}
+                events = [{**chunk, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+                          for delta in [first] + [{"content": piece} for piece in pieces[1:]]]
+                events.append({**chunk, "choices": [{"index": 0, "delta": {}, "finish_reason": finish}]})
+                if include_usage:
+                    events.append({**chunk, "choices": [], "usage": usage})
+                for n, event in enumerate(events):
+                    if 0 < n < len(pieces):
+                        self.wfile.flush()
+                        time.sleep(1 / fake.tokens_per_s)
+                    self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--rpm", type=float, default=600)
+    parser.add_argument("--tpm", type=float, default=60_000)
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--tokens-per-s", type=float, default=0, help="ritmo do streaming (0 = um único chunk)")
+    parser.add_argument("--text-chars", type=int, default=0, help="tamanho das strings nas respostas json_schema")
+    args = parser.parse_args()
+    fake = FakeOpenAI(args.port, args.rpm, args.tpm, args.max_concurrency, args.latency,
+                      tokens_per_s=args.tokens_per_s, text_chars=args.text_chars)
+    print(f"Fake OpenAI em {fake.url}")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
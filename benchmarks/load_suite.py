@@ -0,0 +1,161 @@
+# benchmarks/load_suite.py
+"""
+Suíte de carga reproduzível sobre os agentes mock (ver benchmarks/mock_pipeline.py).
+
+Cenários:
+- single:     latência de ponta a ponta de protocolos processados um a um (p50/p95/p99)
+- overhead:   o mesmo com latência zero nas tools (custo do próprio orquestrador)
+- throughput: vazão e latência do lote em cada nível de concorrência
+- memory:     pico de memória alocada (tracemalloc) por protocolo em execução
+
+    python -m benchmarks.load_suite [--seed 42] [--profile lognormal] [--time-scale 0.1] \
+        [--concurrency 1,4,16,64] [--out relatorio.json]
+
+O relatório JSON inclui a configuração usada (semente, perfil, distribuições) para que a
+execução possa ser repetida e comparada entre versões.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from app.lote import orquestrar_lote
+from app.orquestrador import orquestrador
+from benchmarks.mock_pipeline import PROFILES, build_bench_agents, configure, degraded, percentiles
+
+
+def protocol_ids(prefix: str, count: int):
+    return [f"{prefix}-{n:06d}" for n in range(count)]
+
+
+def run_single(agents, count: int, prefix: str = "SINGLE", **options):
+    """`options` vão para o orquestrador (ex.: deadline_s)."""
+    latencies, decisions, errors, overruns = [], {}, 0, 0
+    for protocol_id in protocol_ids(prefix, count):
+        t0 = time.perf_counter()
+        result = orquestrador(protocol_id, agents, **options)
+        latencies.append(time.perf_counter() - t0)
+        decision = result["decision"]["decision"] or "indefinido"
+        decisions[decision] = decisions.get(decision, 0) + 1
+        errors += degraded(result)
+        overruns += bool(result.get("deadline_exceeded"))
+    return {"protocols": count, "latency_s": percentiles(latencies), "degraded": errors,
+            "deadline_exceeded": overruns, "decisions": decisions}
+
+
+def run_batch(agents, count: int, concurrency: int, prefix: str = "BATCH"):
+    resumo, latencies, errors = {}, [], 0
+    for result in orquestrar_lote(protocol_ids(f"{prefix}{concurrency}", count), agents,
+                                  max_concurrency=concurrency, resumo=resumo):
+        if "timings" in result:
+            latencies.append(max(t["end"] for t in result["timings"].values()))
+            errors += degraded(result)
+    return {
+        "concurrency": concurrency,
+        "protocols": count,
+        "throughput_per_s": resumo["throughput_per_s"],
+        "elapsed_s": resumo["elapsed_s"],
+        "latency_s": percentiles(latencies),
+        "errors": resumo["errors"],
+        "degraded": errors,
+    }
+
+
+def run_memory(agents, concurrency_levels, rounds: int = 2):
+    """Pico de memória Python durante um lote com C protocolos simultâneos; a inclinação entre níveis dá o custo por protocolo."""
+    points = []
+    for concurrency in concurrency_levels:
+        tracemalloc.start()
+        try:
+            base = tracemalloc.get_traced_memory()[0]
+            for _ in orquestrar_lote(protocol_ids(f"MEM{concurrency}", concurrency * rounds), agents,
+                                     max_concurrency=concurrency):
+                pass
+            peak = tracemalloc.get_traced_memory()[1] - base
+        finally:
+            tracemalloc.stop()
+        points.append({"concurrency": concurrency, "peak_bytes": peak, "bytes_per_inflight": peak // concurrency})
+
+    result = {"levels": points}
+    if len(points) > 1:
+        first, last = points[0], points[-1]
+        result["marginal_bytes_per_inflight"] = (last["peak_bytes"] - first["peak_bytes"]) // max(
+            1, last["concurrency"] - first["concurrency"])
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Suíte de carga sobre os agentes mock")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--profile", choices=PROFILES, default="lognormal")
+    parser.add_argument("--time-scale", type=float, default=0.1,
+                        help="Multiplica as latências padrão das tools (1.0 = valores do mock)")
+    parser.add_argument("--single", type=int, default=50, help="Protocolos do cenário single")
+    parser.add_argument("--batch", type=int, default=256, help="Protocolos por nível de concorrência")
+    parser.add_argument("--concurrency", default="1,4,16,64")
+    parser.add_argument("--memory-concurrency", default="1,16,64")
+    parser.add_argument("--scenarios", default="single,overhead,throughput,memory")
+    parser.add_argument("--out", help="Arquivo do relatório JSON (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    scenarios = set(args.scenarios.split(","))
+    concurrency = [int(c) for c in args.concurrency.split(",")]
+    agents = build_bench_agents(seed=args.seed)
+
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "git_commit": git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "profile": args.profile,
+            "time_scale": args.time_scale,
+            "latency_profile": configure(args.profile, args.seed, args.time_scale),
+        },
+        "scenarios": {},
+    }
+
+    if "single" in scenarios:
+        configure(args.profile, args.seed, args.time_scale)
+        report["scenarios"]["single"] = run_single(agents, args.single)
+    if "overhead" in scenarios:
+        configure("zero", args.seed)
+        report["scenarios"]["overhead"] = run_single(agents, args.single)
+    if "throughput" in scenarios:
+        report["scenarios"]["throughput"] = []
+        for level in concurrency:
+            configure(args.profile, args.seed, args.time_scale)
+            report["scenarios"]["throughput"].append(run_batch(agents, args.batch, level))
+    if "memory" in scenarios:
+        configure(args.profile, args.seed, args.time_scale)
+        report["scenarios"]["memory"] = run_memory(
+            agents, [int(c) for c in args.memory_concurrency.split(",")])
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return report
+
+
+if __name__ == "__main__":
+    main()
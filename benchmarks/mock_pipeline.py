@@ -0,0 +1,108 @@
+# benchmarks/mock_pipeline.py
+"""
+Pipeline mockado reproduzível para os benchmarks de carga.
+
+- Perfis de latência das tools (app.tools.latency): fixed, zero, lognormal e tail
+  (lognormal + picos de cauda + injeção de erros), escaláveis por `time_scale`.
+- Agentes mock com semente e, antes de cada agente, a chamada às tools que o agente
+  real faria (portal, OCR + visão, regras, estoque, operações), para que a latência
+  simulada entre no fluxo do orquestrador.
+"""
+from typing import Callable, Dict, List, Optional
+
+from app.orquestrador import init_agents
+from app.tools import latency
+from app.tools.inventory_api import ReservationService
+from app.tools.ocr_extract_text import ocr_extract_text
+from app.tools.operations_api import create_exchange
+from app.tools.portal_api import dados_protocolo
+from app.tools.rules_store import lookup_rules_for_id_item_pedido
+from app.tools.vision_service import classify_damage
+
+PROFILES = ("fixed", "zero", "lognormal", "tail")
+
+
+def latency_profile(name: str, time_scale: float = 1.0) -> Dict[str, Dict]:
+    """Distribuição por tool do perfil `name`, com medianas = DEFAULT_LATENCY_S * time_scale."""
+    profile = {}
+    for tool, base in latency.DEFAULT_LATENCY_S.items():
+        base *= time_scale
+        if name == "fixed":
+            profile[tool] = {"dist": "fixed", "value": base}
+        elif name == "zero":
+            profile[tool] = {"dist": "fixed", "value": 0.0}
+        elif name == "lognormal":
+            profile[tool] = {"dist": "lognormal", "median": base, "sigma": 0.4}
+        elif name == "tail":
+            profile[tool] = {"dist": "lognormal", "median": base, "sigma": 0.4,
+                             "tail_prob": 0.02, "tail_factor": 10, "error_rate": 0.01}
+        else:
+            raise ValueError(f"Perfil desconhecido: {name} (use {', '.join(PROFILES)})")
+    return profile
+
+
+def configure(profile: str, seed: Optional[int], time_scale: float = 1.0) -> Dict[str, Dict]:
+    spec = latency_profile(profile, time_scale)
+    latency.configure(spec, seed=seed)
+    return spec
+
+
+class ToolBackedAgent:
+    """Executa `tool_call(inputs)` (as tools que o agente real usaria) e depois o agente mock."""
+
+    def __init__(self, agent, tool_call: Callable[[Dict], None]):
+        self.agent = agent
+        self.tool_call = tool_call
+
+    def invoke(self, inputs):
+        self.tool_call(inputs)
+        return self.agent.invoke(inputs)
+
+
+def build_bench_agents(seed: Optional[int] = None, stock: int = 10 ** 9,
+                       service: Optional[ReservationService] = None) -> Dict:
+    """Agentes mock com semente, chamando as tools simuladas; o estoque é isolado do singleton do app."""
+    agents = init_agents(seed=seed)
+    service = service or ReservationService(stock={"ID_ITEM_PEDIDO-MOCK": stock, "AAA111": stock})
+
+    def inventory_call(inputs):
+        data = inputs["input"]
+        service.check_and_reserve(data["id_item_pedido"], data["qty"], data["idempotency_key"])
+
+    def decision_call(inputs):
+        data = inputs["input"]
+        create_exchange({"protocol_id": data["protocol_id"]}, data["idempotency_key"])
+
+    tool_calls = {
+        "document_agent": lambda inputs: dados_protocolo(inputs["input"]),
+        "ocr_agent": lambda inputs: (ocr_extract_text(inputs["input"]["invoice_image"] or ""),
+                                     classify_damage(inputs["input"]["product_image"] or "")),
+        "rules_agent": lambda inputs: lookup_rules_for_id_item_pedido(inputs["input"]["id_item_pedido"]),
+        "inventory_agent": inventory_call,
+        "decision_agent": decision_call,
+    }
+    return {name: ToolBackedAgent(agent, tool_calls[name]) for name, agent in agents.items()}
+
+
+def percentiles(values: List[float]) -> Dict:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 4)
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 4),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": round(ordered[-1], 4),
+    }
+
+
+def degraded(result: Dict) -> bool:
+    """True se alguma etapa caiu no fallback (ex.: erro injetado em uma tool)."""
+    return any(isinstance(out, dict) and out.get("raw") is not None
+               for out in list(result["audit"].values()) + [result["decision"]])
@@ -0,0 +1,78 @@
+# benchmarks/stress_inventory.py
+"""
+Teste de estresse das reservas de estoque: milhares de reservas concorrentes sobre
+poucos SKUs não podem vender acima do estoque, e replays da mesma idempotency_key
+devem devolver a reserva original.
+
+    python -m benchmarks.stress_inventory [--reservations 5000] [--threads 64]
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.tools.inventory_api import ReservationService
+
+
+def run(reservations: int, threads: int, skus: int, stock_per_sku: int, seed: int = 42):
+    rng = random.Random(seed)
+    stock = {f"SKU{n:03d}": stock_per_sku for n in range(skus)}
+    service = ReservationService(stock=dict(stock), latency_s=0)
+
+    # ~20% das requisições são replays de uma chave já usada
+    keys = [f"KEY-{n}" for n in range(reservations)]
+    calls = [(rng.choice(list(stock)), keys[n if rng.random() > 0.2 else rng.randrange(n + 1)])
+             for n in range(reservations)]
+    sku_by_key = {}
+    for sku, key in calls:
+        sku_by_key.setdefault(key, sku)
+    calls = [(sku_by_key[key], key) for _, key in calls]
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(lambda call: (call[1], service.check_and_reserve(call[0], 1, call[1])), calls))
+    elapsed = time.perf_counter() - t0
+
+    reserved_ids = {}
+    replay_mismatch = 0
+    for key, result in results:
+        if not result["available"]:
+            continue
+        if key in reserved_ids and reserved_ids[key] != result["reservation_id"]:
+            replay_mismatch += 1
+        reserved_ids.setdefault(key, result["reservation_id"])
+
+    reserved_per_sku = {sku: 0 for sku in stock}
+    for key in reserved_ids:
+        reserved_per_sku[sku_by_key[key]] += 1
+
+    oversold = {
+        sku: reserved for sku, reserved in reserved_per_sku.items()
+        if reserved > stock[sku] or service.available(sku) != stock[sku] - reserved
+    }
+    return {
+        "reservations": reservations,
+        "threads": threads,
+        "distinct_keys": len(sku_by_key),
+        "reserved": len(reserved_ids),
+        "stock_total": sum(stock.values()),
+        "oversold_skus": oversold,
+        "replay_mismatch": replay_mismatch,
+        "ops_per_s": round(reservations / elapsed, 1),
+        "ok": not oversold and replay_mismatch == 0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reservations", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--skus", type=int, default=8)
+    parser.add_argument("--stock-per-sku", type=int, default=200)
+    args = parser.parse_args()
+
+    report = run(args.reservations, args.threads, args.skus, args.stock_per_sku)
+    print(json.dumps(report))
+    sys.exit(0 if report["ok"] else 1)
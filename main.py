@@ -1,7 +1,57 @@
+import sys
+import json
+import argparse
+
+from app.checkpoint import open_checkpoint_store
 from app.orquestrador import init_agents, orquestrador
+from app.lote import orquestrar_lote, ler_protocolos, MAX_CONCURRENCY
+from app.models import to_jsonable
+from app.telemetry import export_metrics
+
+PROTOCOL_ID = "PROTO-20251003-0001"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Orquestrador de agentes de troca/exchange")
+    parser.add_argument("--lote", metavar="ARQUIVO",
+                        help="arquivo com um protocol_id por linha ('-' para ler de stdin)")
+    parser.add_argument("--max-concurrency", type=int, default=MAX_CONCURRENCY,
+                        help="protocolos processados em paralelo no modo lote")
+    parser.add_argument("--saida", metavar="ARQUIVO",
+                        help="arquivo JSONL de saída do modo lote (padrão: stdout)")
+    parser.add_argument("--resume", action="store_true",
+                        help="grava checkpoints por etapa e retoma protocolos já iniciados")
+    parser.add_argument("--checkpoint-db", metavar="ARQUIVO",
+                        help="arquivo SQLite de checkpoints (padrão: CHECKPOINT_DB ou checkpoints.sqlite)")
+    parser.add_argument("--metrics", choices=["json", "prometheus"],
+                        help="imprime as métricas agregadas (latências p50/p95/p99, tokens) no stderr ao final")
+    return parser.parse_args(argv)
+
+
+def run_lote(args, agents, checkpoint=None):
+    source = sys.stdin if args.lote == "-" else open(args.lote, encoding="utf-8")
+    out = sys.stdout if not args.saida else open(args.saida, "w", encoding="utf-8")
+    resumo = {}
+    try:
+        for result in orquestrar_lote(ler_protocolos(source), agents, args.max_concurrency, resumo,
+                                      checkpoint, args.resume):
+            out.write(json.dumps(result, ensure_ascii=False, default=to_jsonable) + "\n")
+            out.flush()
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+    print(json.dumps({"resumo": resumo}, ensure_ascii=False), file=sys.stderr)
 
 
 if __name__ == "__main__":
+    args = parse_args()
     agents = init_agents()
-    protocol_id = "PROTO-20251003-0001"
-    result = orquestrador(protocol_id, agents)
\ No newline at end of file
+    checkpoint = open_checkpoint_store(args.checkpoint_db) if args.resume or args.checkpoint_db else None
+    if args.lote:
+        run_lote(args, agents, checkpoint)
+    else:
+        result = orquestrador(PROTOCOL_ID, agents, checkpoint, args.resume)
+    if args.metrics:
+        print(export_metrics(args.metrics), file=sys.stderr)